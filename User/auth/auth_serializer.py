@@ -3,6 +3,13 @@ from rest_framework_simplejwt.tokens import Token
 from rest_framework_simplejwt.exceptions import AuthenticationFailed
 
 
+def add_user_claims(token, user):
+    token['is_user'] = user.is_user
+    token['is_owner'] = user.is_owner
+    token['ver'] = user.token_version
+    return token
+
+
 class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user) -> Token:
@@ -10,7 +17,7 @@ class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
             raise AuthenticationFailed("user is not register as user")
         token = super().get_token(user)
         token['user_type'] = 'vehicle_owner'
-        return token
+        return add_user_claims(token, user)
 
 
 class OwnerTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -20,4 +27,4 @@ class OwnerTokenObtainPairSerializer(TokenObtainPairSerializer):
             raise AuthenticationFailed("user is not register as shop owner")
         token = super().get_token(user)
         token['user_type'] = 'shop_owner'
-        return token
+        return add_user_claims(token, user)
@@ -0,0 +1,131 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from User.models import CustomUser
+from VeloService.timing import span
+
+CLAIMS = ('is_user', 'is_owner', 'ver')
+
+
+def token_version_cache_key(user_id):
+    return f"user:{user_id}:token_version"
+
+
+def user_cache_key(user_id):
+    return f"user:{user_id}"
+
+
+def get_token_version(user_id):
+    """
+    Current token version for ``user_id``, or -1 for inactive and deleted
+    users so that every token they hold is rejected.
+    """
+    key = token_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = CustomUser.objects.filter(pk=user_id, is_active=True).values_list(
+            'token_version', flat=True
+        ).first()
+        version = -1 if version is None else version
+        cache.set(key, version, settings.AUTH_USER_CACHE_TTL)
+    return version
+
+
+async def aget_token_version(user_id):
+    key = token_version_cache_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = await CustomUser.objects.filter(pk=user_id, is_active=True).values_list(
+            'token_version', flat=True
+        ).afirst()
+        version = -1 if version is None else version
+        await cache.aset(key, version, settings.AUTH_USER_CACHE_TTL)
+    return version
+
+
+def get_cached_user(user_id):
+    return cache.get_or_set(
+        user_cache_key(user_id),
+        lambda: CustomUser.objects.filter(pk=user_id).first(),
+        settings.AUTH_USER_CACHE_TTL,
+    )
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user built from the access token claims alone. Role checks read
+    the ``is_user``/``is_owner`` claims; anything else needs ``full_user``,
+    which is loaded through the short-TTL user cache.
+    """
+
+    def __str__(self):
+        return f"ClaimsUser {self.id}"
+
+    @cached_property
+    def is_user(self):
+        return self.token.get('is_user', False)
+
+    @cached_property
+    def is_owner(self):
+        return self.token.get('is_owner', False)
+
+    def is_vehicle_owner(self):
+        return self.is_user
+
+    def is_shop_owner(self):
+        return self.is_owner
+
+    @cached_property
+    def full_user(self):
+        return get_cached_user(self.id)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Authenticates without loading ``CustomUser`` on every request. The only
+    lookup is the user's token version, served from the cache and compared
+    with the ``ver`` claim so bumping ``CustomUser.token_version`` revokes
+    outstanding tokens within ``AUTH_USER_CACHE_TTL`` seconds. Tokens issued
+    before the claims existed fall back to the regular database lookup.
+    """
+
+    def authenticate(self, request):
+        with span("auth"):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIMS):
+            return super().get_user(validated_token)
+
+        user = ClaimsUser(validated_token)
+        if get_token_version(user.id) != validated_token['ver']:
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+        return user
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate`` for plain Django async views, which receive an
+        ``HttpRequest`` rather than a DRF ``Request``.
+        """
+        with span("auth"):
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+            validated_token = self.get_validated_token(raw_token)
+            return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIMS):
+            return await sync_to_async(super().get_user)(validated_token)
+
+        user = ClaimsUser(validated_token)
+        if await aget_token_version(user.id) != validated_token['ver']:
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+        return user
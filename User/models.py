@@ -23,6 +23,7 @@ class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
     is_user = models.BooleanField(default=False)
     is_owner = models.BooleanField(default=False)
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -40,6 +41,58 @@ class CustomUser(AbstractUser):
         blank=True
     )
 
+    ROLE_FIELDS = ('is_user', 'is_owner')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_roles = instance._roles()
+        return instance
+
+    def _roles(self):
+        return {field: getattr(self, field) for field in self.ROLE_FIELDS if field in self.__dict__}
+
+    def save(self, *args, **kwargs):
+        # Access tokens carry the role flags as claims, so changing either one
+        # has to invalidate them just like a password change does.
+        loaded = getattr(self, '_loaded_roles', {})
+        changed = getattr(self, '_password_changed', False) or any(
+            self.__dict__.get(field, value) != value for field, value in loaded.items()
+        )
+        if changed and not self._state.adding:
+            self.token_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'token_version'}
+        super().save(*args, **kwargs)
+        self._password_changed = False
+        self._loaded_roles = self._roles()
+
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        # Rehashing the same password on login is not a change.
+        self._password_changed = not getattr(self, '_rehashing', False)
+
+    def check_password(self, raw_password):
+        self._rehashing = True
+        try:
+            return super().check_password(raw_password)
+        finally:
+            self._rehashing = False
+
+    async def acheck_password(self, raw_password):
+        self._rehashing = True
+        try:
+            return await super().acheck_password(raw_password)
+        finally:
+            self._rehashing = False
+
+    def revoke_tokens(self):
+        # Access tokens carry the version they were issued under in their
+        # "ver" claim; ClaimsJWTAuthentication rejects any that don't match.
+        self.token_version += 1
+        self.save(update_fields=['token_version'])
+
     def is_vehicle_owner(self):
         return self.is_user
 
@@ -0,0 +1,11 @@
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from User.authentication import token_version_cache_key, user_cache_key
+from User.models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def drop_cached_user(sender, instance, **kwargs):
+    cache.delete_many([token_version_cache_key(instance.pk), user_cache_key(instance.pk)])
@@ -1,3 +1,115 @@
-from django.test import TestCase
+from unittest import mock
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from User.models import CustomUser
+from VeloService import throttling
+from VeloService.throttling import LocalBucketStore, bucket_store, make_store
 
-# Create your tests here.
+
+class ClaimsAuthenticationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = CustomUser.objects.create_user(email="shop@velo.test", password="secret-pass", is_owner=True)
+
+    def login(self):
+        response = self.client.post("/api/v1/user/owner/token", {"email": "shop@velo.test", "password": "secret-pass"})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_claims_token_skips_user_lookup(self):
+        self.login()
+        self.client.get("/api/v1/velocare/components/")  # caches the token version
+        with self.assertNumQueries(2):  # table versions and the page of component ids, no user row
+            response = self.client.get("/api/v1/velocare/components/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_revoked_token_is_rejected(self):
+        self.login()
+        self.assertEqual(self.client.get("/api/v1/user/").status_code, 200)
+        self.owner.revoke_tokens()
+        self.assertEqual(self.client.get("/api/v1/user/").status_code, 401)
+
+    def test_role_change_revokes_tokens(self):
+        self.login()
+        self.assertEqual(self.client.get("/api/v1/user/").status_code, 200)
+        owner = CustomUser.objects.get(pk=self.owner.pk)
+        owner.is_owner = False
+        owner.save(update_fields=['is_owner'])
+        self.assertEqual(self.client.get("/api/v1/user/").status_code, 401)
+
+    def test_login_that_upgrades_the_hash_keeps_the_new_token_valid(self):
+        CustomUser.objects.filter(pk=self.owner.pk).update(password=make_password("secret-pass", hasher="pbkdf2_sha1"))
+        self.login()
+        self.owner.refresh_from_db()
+        self.assertTrue(self.owner.password.startswith("pbkdf2_sha256$"))
+        self.assertEqual(self.client.get("/api/v1/user/").status_code, 200)
+
+    def test_password_change_revokes_tokens(self):
+        self.login()
+        owner = CustomUser.objects.get(pk=self.owner.pk)
+        owner.set_password("new-secret-pass")
+        owner.save(update_fields=['password'])
+        self.assertEqual(self.client.get("/api/v1/user/").status_code, 401)
+
+    def test_token_without_claims_falls_back_to_database_user(self):
+        token = AccessToken.for_user(self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(self.client.get("/api/v1/user/").status_code, 200)
+
+
+@override_settings(THROTTLE_BUCKETS={
+    'owner_token': {'ip': ('60/min', 3), 'account': ('1/hour', 2)},
+    'write': {'user': ('1/hour', 2)},
+})
+class TokenBucketThrottleTest(APITestCase):
+    def setUp(self):
+        bucket_store().clear()
+        self.owner = CustomUser.objects.create_user(email="shop@velo.test", password="secret-pass", is_owner=True)
+
+    def login(self, email, ip):
+        return self.client.post("/api/v1/user/owner/token", {"email": email, "password": "secret-pass"}, REMOTE_ADDR=ip)
+
+    def test_rejected_logins_skip_hashing_and_the_database(self):
+        for n in range(3):
+            self.assertNotEqual(self.login(f"nobody{n}@velo.test", "10.0.0.1").status_code, 429)
+        with mock.patch.object(CustomUser, "check_password") as check_password, self.assertNumQueries(0):
+            response = self.login("shop@velo.test", "10.0.0.1")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")  # one token a second
+        check_password.assert_not_called()
+        self.assertEqual(self.login("shop@velo.test", "10.0.0.2").status_code, 200)
+
+    def test_account_buckets_span_addresses(self):
+        self.assertEqual(self.login("shop@velo.test", "10.0.0.1").status_code, 200)
+        self.assertEqual(self.login(" Shop@velo.test", "10.0.0.2").status_code, 401)
+        response = self.login("shop@velo.test", "10.0.0.3")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 3000)
+        # The rejected request took no token from the address's bucket.
+        for n in range(3):
+            self.assertNotEqual(self.login(f"nobody{n}@velo.test", "10.0.0.3").status_code, 429)
+
+    def test_writes_are_limited_per_user(self):
+        self.client.force_authenticate(self.owner)
+        for n in range(2):
+            self.assertEqual(self.client.post("/api/v1/velocare/components/", {"name": f"Chain {n}"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/velocare/components/").status_code, 200)
+        self.assertEqual(self.client.post("/api/v1/velocare/components/", {"name": "Chain"}).status_code, 429)
+        with override_settings(THROTTLE=False):
+            self.assertEqual(self.client.post("/api/v1/velocare/components/", {"name": "Chain"}).status_code, 400)
+
+    def test_misconfigured_stores_are_rejected(self):
+        with override_settings(THROTTLE_STORE="local"):
+            self.assertIsInstance(make_store(), LocalBucketStore)
+        with override_settings(THROTTLE_STORE="memcached"), self.assertRaises(ImproperlyConfigured):
+            make_store()
+        with mock.patch.object(throttling, "redis", None), override_settings(THROTTLE_STORE="redis"):
+            with self.assertRaisesMessage(ImproperlyConfigured, "needs the redis package"):
+                make_store()
+        with mock.patch.object(throttling, "redis"), override_settings(THROTTLE_STORE="redis", THROTTLE_REDIS_URL=None):
+            with self.assertRaisesMessage(ImproperlyConfigured, "THROTTLE_REDIS_URL"):
+                make_store()
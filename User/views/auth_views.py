@@ -1,10 +1,16 @@
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from User.auth.auth_serializer import UserTokenObtainPairSerializer, OwnerTokenObtainPairSerializer
 
 
 class UserTokenObtainPairView(TokenObtainPairView):
     serializer_class = UserTokenObtainPairSerializer
+    throttle_scope = "user_token"
 
 
 class OwnerTokenObtainPairView(TokenObtainPairView):
     serializer_class = OwnerTokenObtainPairSerializer
+    throttle_scope = "owner_token"
+
+
+class ThrottledTokenRefreshView(TokenRefreshView):
+    throttle_scope = "token_refresh"
@@ -5,16 +5,21 @@ from rest_framework import generics
 from rest_framework.views import APIView
 from User.auth.user_serializers import UserSerializer, OwnerSerializer
 from User.permissions import IsShopOwner
+from VeloService.pagination import IdCursorPagination
 
 
 class UserListView(generics.ListAPIView):
-    queryset = CustomUser.objects.filter(is_user=True)
+    # The serializer lists group and permission ids for every user.
+    queryset = CustomUser.objects.filter(is_user=True).prefetch_related('groups', 'user_permissions')
     serializer_class = UserSerializer
     permission_classes = [IsShopOwner]
+    pagination_class = IdCursorPagination
+    max_page_size = 500
 
 
 class UserRegistrationView(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_scope = "user_register"
 
     def post(self, request):
         serializer = UserSerializer(data=request.data)
@@ -27,6 +32,7 @@ class UserRegistrationView(APIView):
 
 class OwnerRegistrationView(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_scope = "owner_register"
 
     def post(self, request):
         serializer = OwnerSerializer(data=request.data)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Vehicle, Component, Issue, Invoice
+from .models import Vehicle, Component, Issue, Invoice, DailyRevenue
 
 
 class IssueInline(admin.TabularInline):
@@ -12,6 +12,7 @@ class VehicleAdmin(admin.ModelAdmin):
     list_display = ("license_plate", "model")
     search_fields = (
         "license_plate",
+        "make",
         "model",
     )
     list_filter = ("model",)
@@ -28,7 +29,7 @@ class ComponentAdmin(admin.ModelAdmin):
 @admin.register(Issue)
 class IssueAdmin(admin.ModelAdmin):
     list_display = ("vehicle", "component", "is_repair")
-    search_fields = ("vehicle",)
+    search_fields = ("description",)
     list_filter = ("is_repair",)
 
 
@@ -38,3 +39,9 @@ class InvoiceAdmin(admin.ModelAdmin):
     search_fields = ("invoice_number",)
     list_filter = ("issue_date", "paid")
     date_hierarchy = "due_date"
+
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(admin.ModelAdmin):
+    list_display = ("day", "total", "service_count")
+    date_hierarchy = "day"
@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class VelocareConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "VeloCare"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from VeloService.metrics import register_collector
+        from VeloService.throttling import bucket_store
+        from VeloService.replicas import replica_set, REPLICA_METRICS
+        from .catalog import component_catalog, CATALOG_METRICS
+        from .conditional import response_cache, RESPONSE_CACHE_METRICS
+        register_collector(component_catalog.metrics, CATALOG_METRICS)
+        register_collector(response_cache.metrics, RESPONSE_CACHE_METRICS)
+        if settings.DATABASE_REPLICAS:
+            register_collector(replica_set.metrics, REPLICA_METRICS)
+        if settings.THROTTLE:
+            # A misconfigured store stops the server here, not at the first
+            # throttled request.
+            bucket_store()
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import async_views
+
+
+urlpatterns = [
+    path("components/", async_views.component_list, name="async-components-list"),
+    path("vehicles/", async_views.vehicle_list, name="async-vehicles-list"),
+    path("vehicles/<int:pk>/", async_views.vehicle_detail, name="async-vehicles-detail"),
+    path("vehicles/<int:vehicle_pk>/issues/", async_views.vehicle_issue_list, name="async-vehicle_issues-list"),
+    path("all_issues/", async_views.all_issue_list, name="async-all_issues-list"),
+    path("services/", async_views.service_list, name="async-services-list"),
+    path("services/revenue_dashboard/", async_views.revenue_dashboard, name="async-services-revenue-dashboard"),
+]
@@ -0,0 +1,133 @@
+from datetime import timedelta
+from functools import wraps
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from User.authentication import ClaimsJWTAuthentication
+from User.permissions import IsVehicleOwner, IsShopOwner
+from VeloService.filters import RankedSearchFilter
+from VeloService.pagination import CompositeCursorPagination, IdCursorPagination, ServiceCursorPagination
+from VeloService.sparse import sparse_queryset
+from .catalog import component_catalog
+from .models import Component, Vehicle, Issue, Service, DailyRevenue
+from .serializers import (
+    ComponentSerializer,
+    VehicleSerializer,
+    IssueSerializer,
+    ServiceSerializer,
+    RevenueDashboardQuerySerializer,
+)
+from .views import ComponentViewSet, VehicleViewSet, AllIssueViewSet, ServiceViewSet
+
+
+def api_response(data, status=200):
+    return JsonResponse(
+        data,
+        status=status,
+        safe=False,
+        encoder=JSONEncoder,
+        json_dumps_params={"separators": (",", ":"), "ensure_ascii": False},
+    )
+
+
+def async_read_view(*permission_classes):
+    """
+    Gives an async function view the JWT authentication, permission checks
+    and error payloads of the DRF viewsets it mirrors. Only GET is served.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return api_response({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+            try:
+                auth = await ClaimsJWTAuthentication().aauthenticate(request)
+                request.user = auth[0] if auth else AnonymousUser()
+                if not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                for permission in permission_classes:
+                    if not permission().has_permission(request, None):
+                        raise exceptions.PermissionDenied()
+                return await view(request, *args, **kwargs)
+            except (Component.DoesNotExist, Vehicle.DoesNotExist):
+                return api_response({"detail": "No object matches the given query."}, status=404)
+            except exceptions.APIException as exc:
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+                return api_response(data, status=exc.status_code)
+        return wrapper
+    return decorator
+
+
+async def paginated_response(paginator, queryset, request, view, serializer_class):
+    request = Request(request)
+    page = await paginator.apaginate_queryset(queryset, request, view)
+    serializer = serializer_class(page, many=True, context={"request": request})
+    return api_response(paginator.get_paginated_data(serializer.data))
+
+
+@async_read_view(IsShopOwner)
+async def component_list(request):
+    paginator = IdCursorPagination()
+    rows = await paginator.apaginate_queryset(Component.objects.values("id"), Request(request), ComponentViewSet)
+    components = await component_catalog.aget_many(row["id"] for row in rows)
+    page = [components[row["id"]] for row in rows if row["id"] in components]
+    serializer = ComponentSerializer(page, many=True, context={"request": request})
+    return api_response(paginator.get_paginated_data(serializer.data))
+
+
+@async_read_view(IsVehicleOwner, IsShopOwner)
+async def vehicle_list(request):
+    queryset = sparse_queryset(VehicleSerializer, Vehicle.objects.all(), request, CompositeCursorPagination)
+    queryset = RankedSearchFilter().filter_queryset(Request(request), queryset, VehicleViewSet)
+    return await paginated_response(CompositeCursorPagination(), queryset, request, VehicleViewSet, VehicleSerializer)
+
+
+@async_read_view(IsVehicleOwner, IsShopOwner)
+async def vehicle_detail(request, pk):
+    vehicle = await sparse_queryset(VehicleSerializer, Vehicle.objects.all(), request).aget(pk=pk)
+    return api_response(VehicleSerializer(vehicle, context={"request": request}).data)
+
+
+@async_read_view(IsVehicleOwner, IsShopOwner)
+async def all_issue_list(request):
+    queryset = sparse_queryset(
+        IssueSerializer, Issue.objects.all(), request, CompositeCursorPagination, with_components=True
+    )
+    queryset = RankedSearchFilter().filter_queryset(Request(request), queryset, AllIssueViewSet)
+    return await paginated_response(CompositeCursorPagination(), queryset, request, AllIssueViewSet, IssueSerializer)
+
+
+@async_read_view(IsVehicleOwner, IsShopOwner)
+async def vehicle_issue_list(request, vehicle_pk):
+    queryset = sparse_queryset(
+        IssueSerializer, Issue.objects.filter(vehicle_id=vehicle_pk).order_by("id"), request, with_components=True
+    )
+    issues = [issue async for issue in queryset.aiterator(chunk_size=500)]
+    return api_response(IssueSerializer(issues, many=True, context={"request": request}).data)
+
+
+@async_read_view(IsShopOwner)
+async def service_list(request):
+    queryset = sparse_queryset(ServiceSerializer, Service.objects.all(), request, ServiceCursorPagination, with_components=True)
+    return await paginated_response(ServiceCursorPagination(), queryset, request, ServiceViewSet, ServiceSerializer)
+
+
+@async_read_view(IsShopOwner)
+async def revenue_dashboard(request):
+    query = RevenueDashboardQuerySerializer(data=request.GET)
+    query.is_valid(raise_exception=True)
+    today = timezone.localdate()
+    end = query.validated_data.get('end', today)
+    start = query.validated_data.get('start', end - timedelta(days=29))
+    group_by = query.validated_data['group_by']
+
+    return api_response({
+        **await DailyRevenue.objects.atotals(today),
+        "start": start,
+        "end": end,
+        "group_by": group_by,
+        "series": [row async for row in DailyRevenue.objects.series(start, end, group_by)],
+    })
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+from .models import Component, TableVersion
+
+
+class ComponentCatalog:
+    """
+    Per-process LRU cache of ``Component`` rows keyed by id.
+
+    Every component write bumps the ``component`` TableVersion. The first
+    catalog read in a request compares that version with the one the cached
+    rows were loaded under and drops them all on a mismatch, so workers pick
+    up price changes without a shared cache service. Outside a request
+    (management commands, the shell) a check holds for at most
+    ``COMPONENT_CATALOG_CHECK_INTERVAL`` seconds, or for a ``scope()``.
+    Cached instances are shared between threads and must be treated as
+    read-only.
+    """
+    table = "component"
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def invalidate(self):
+        # Other workers see the new version; this one also drops its rows as
+        # soon as the write is committed.
+        TableVersion.objects.bump(self.table)
+        transaction.on_commit(self.clear)
+
+    def expire_check(self, **kwargs):
+        self._local.checked_at = None
+
+    @contextmanager
+    def scope(self):
+        """Checks the version again on entry and after the block, like a request does."""
+        self.expire_check()
+        try:
+            yield self
+        finally:
+            self.expire_check()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+        self._local.checked_at = None
+
+    def _set_version(self, version):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+    def _validate(self):
+        checked_at = getattr(self._local, "checked_at", None)
+        now = time.monotonic()
+        if checked_at is not None and now - checked_at < settings.COMPONENT_CATALOG_CHECK_INTERVAL:
+            return self._version
+        self._set_version(TableVersion.objects.current(self.table))
+        self._local.checked_at = now
+        return self._version
+
+    def _lookup(self, ids):
+        found, missing = {}, []
+        with self._lock:
+            for pk in dict.fromkeys(ids):
+                if pk is None:
+                    continue
+                if pk in self._entries:
+                    self._entries.move_to_end(pk)
+                    found[pk] = self._entries[pk]
+                else:
+                    missing.append(pk)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def _store(self, version, loaded):
+        with self._lock:
+            # Rows loaded under a version that has since been replaced are
+            # returned to the caller but not cached.
+            if version == self._version:
+                self._entries.update(loaded)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+    def get_many(self, ids):
+        ids = list(ids)
+        if not ids:
+            return {}
+        version = self._validate()
+        found, missing = self._lookup(ids)
+        if missing:
+            loaded = Component.objects.in_bulk(missing)
+            self._store(version, loaded)
+            found.update(loaded)
+        return found
+
+    async def aget_many(self, ids):
+        # request_started is not delivered to the event loop thread, so async
+        # callers re-check the version on every call.
+        ids = list(ids)
+        if not ids:
+            return {}
+        self._set_version(await TableVersion.objects.acurrent(self.table))
+        version = self._version
+        found, missing = self._lookup(ids)
+        if missing:
+            loaded = await Component.objects.ain_bulk(missing)
+            self._store(version, loaded)
+            found.update(loaded)
+        return found
+
+    def get(self, pk):
+        if pk is None:
+            return None
+        return self.get_many([pk]).get(pk)
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self._version,
+        }
+
+    def metrics(self):
+        """Samples for ``VeloService.metrics``."""
+        yield "velo_component_catalog_entries", {}, len(self._entries)
+        yield "velo_component_catalog_hits_total", {}, self.hits
+        yield "velo_component_catalog_misses_total", {}, self.misses
+
+
+component_catalog = ComponentCatalog(settings.COMPONENT_CATALOG_SIZE)
+
+CATALOG_METRICS = {
+    "velo_component_catalog_entries": ("gauge", "Components cached by the running workers."),
+    "velo_component_catalog_hits_total": ("counter", "Catalog lookups answered from the cache."),
+    "velo_component_catalog_misses_total": ("counter", "Catalog lookups that read the database."),
+}
@@ -0,0 +1,142 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, urlencode
+from .models import TableVersion
+
+
+class ResponseCache:
+    """
+    Rendered responses in the ``responses`` cache, with this worker's hit
+    and miss counts.
+    """
+    alias = "responses"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        cached = self.backend.get(key)
+        if cached is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cached
+
+    def set(self, key, response):
+        self.backend.set(key, (response.content, response["Content-Type"]))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.RESPONSE_CACHE,
+            "backend": settings.RESPONSE_CACHE_BACKEND,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0,
+        }
+
+    def metrics(self):
+        """Samples for ``VeloService.metrics``."""
+        yield "velo_response_cache_hits_total", {}, self.hits
+        yield "velo_response_cache_misses_total", {}, self.misses
+
+
+response_cache = ResponseCache()
+
+RESPONSE_CACHE_METRICS = {
+    "velo_response_cache_hits_total": ("counter", "Responses served from the response cache."),
+    "velo_response_cache_misses_total": ("counter", "Response cache lookups that ran the view."),
+}
+
+
+class ConditionalGetMixin:
+    """
+    ``ETag`` and ``Last-Modified`` for ``list`` and ``retrieve``.
+
+    Both validators come from the TableVersion rows named in
+    ``version_tables``, which must cover every table the payload is read
+    from, nested objects included. That is one indexed query per request; a
+    request whose ``If-None-Match`` or ``If-Modified-Since`` still matches is
+    answered with ``304 Not Modified`` before the queryset or the serializer
+    run. ``Cache-Control: private, no-cache`` makes browsers revalidate
+    instead of reusing responses unchecked.
+
+    With ``RESPONSE_CACHE`` on, other requests are answered from the
+    rendered responses of earlier ones. The key holds the ETag, so any write
+    to those tables moves readers on to new keys, plus the URL with its
+    sorted query string and the caller's ``get_cache_scope``.
+    """
+    version_tables = ()
+
+    def get_validators(self, request):
+        rows = list(
+            TableVersion.objects.filter(name__in=self.version_tables).values_list("name", "version", "updated_at")
+        )
+        versions = {name: version for name, version, _ in rows}
+        key = ";".join(f"{name}={versions.get(name, 0)}" for name in self.version_tables)
+        # The renderer is part of the tag: the JSON and browsable API
+        # representations of one URL differ.
+        digest = hashlib.md5(f"{request.accepted_renderer.format}:{key}".encode(), usedforsecurity=False)
+        last_modified = max((updated_at for _, _, updated_at in rows), default=None)
+        # HTTP dates have whole seconds.
+        return f'W/"{digest.hexdigest()}"', last_modified and int(last_modified.timestamp())
+
+    def get_cache_scope(self, request):
+        # Shop owners all see the same rows; anyone else gets their own entries.
+        return "shop" if request.user.is_shop_owner() else f"user:{request.user.pk}"
+
+    def get_cache_key(self, request, etag):
+        url = f"{request.build_absolute_uri(request.path)}?{urlencode(sorted(request.GET.lists()), doseq=True)}"
+        digest = hashlib.md5(f"{self.get_cache_scope(request)}:{etag}:{url}".encode(), usedforsecurity=False)
+        return f"velo:response:{digest.hexdigest()}"
+
+    def cached_response(self, handler, request, etag, *args, **kwargs):
+        if not settings.RESPONSE_CACHE:
+            return handler(request, *args, **kwargs)
+        key = self.get_cache_key(request, etag)
+        cached = response_cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            # Stored once finalize_response has picked the renderer.
+            response.response_cache_key = key
+        return response
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.cached_response(handler, request, etag, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(response, "response_cache_key", None)
+        if key is not None:
+            response.render()
+            response_cache.set(key, response)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
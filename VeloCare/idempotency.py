@@ -0,0 +1,47 @@
+import hashlib
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+
+def digest(value):
+    return hashlib.md5(value, usedforsecurity=False).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """
+    Makes ``create`` safe to retry with an ``Idempotency-Key`` header.
+
+    The key, scoped to the user, method and path, is claimed in the
+    transaction that creates the row and stored with the response, so a
+    retry gets the first response back (marked ``Idempotent-Replayed``)
+    instead of creating again. A duplicate that arrives while the first
+    request is still running waits on the key's row lock and then replays;
+    the work never runs twice. Requests that fail store nothing and can be
+    retried with the same key. Reusing a key for a different body is a 422.
+    """
+    def create(self, request, *args, **kwargs):
+        header = request.headers.get("Idempotency-Key")
+        if header is None:
+            return super().create(request, *args, **kwargs)
+        if not 0 < len(header) <= 255:
+            raise serializers.ValidationError({"Idempotency-Key": ["Must be 1 to 255 characters long."]})
+
+        key = digest(f"{request.user.pk}:{request.method}:{request.path}:{header}".encode())
+        fingerprint = digest(request.body)
+        with transaction.atomic():
+            record, created = IdempotencyKey.objects.claim(key, fingerprint)
+            if not created:
+                if record.fingerprint != fingerprint:
+                    return Response(
+                        {"detail": "This Idempotency-Key was used for a different request."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                return Response(record.response, status=record.status_code, headers={"Idempotent-Replayed": "true"})
+
+            response = super().create(request, *args, **kwargs)
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=["status_code", "response"])
+        return response
@@ -0,0 +1,250 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import date, timedelta
+from pathlib import Path
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+from User.auth.auth_serializer import OwnerTokenObtainPairSerializer
+from VeloCare.seeding import SCALES, PASSWORD, seed_data
+
+BUDGETS = Path(__file__).resolve().parents[2] / "benchmark_budgets.json"
+
+# ``path`` and ``data`` are called with the seeded ids and the number of the
+# request, so writes can use fresh values every time.
+Endpoint = namedtuple("Endpoint", "name path method data status", defaults=("get", None, 200))
+
+ENDPOINTS = [
+    Endpoint("health check", lambda ids, i: "/"),
+    Endpoint("readiness check", lambda ids, i: "/ready/"),
+    Endpoint("metrics", lambda ids, i: "/metrics"),
+    Endpoint("components list", lambda ids, i: "/api/v1/velocare/components/"),
+    Endpoint("component detail", lambda ids, i: f"/api/v1/velocare/components/{ids['component']}/"),
+    Endpoint(
+        "component create", lambda ids, i: "/api/v1/velocare/components/", "post",
+        lambda ids, i: {"name": f"Benchmark part {i}", "new_price": "400.00", "repair_price": "90.00"}, 201,
+    ),
+    Endpoint(
+        "components import", lambda ids, i: "/api/v1/velocare/components/import/", "post",
+        lambda ids, i: [{"name": f"Imported part {i}-{n}", "new_price": "10.00", "repair_price": "2.00"} for n in range(100)],
+        201,
+    ),
+    Endpoint("vehicles list", lambda ids, i: "/api/v1/velocare/vehicles/"),
+    Endpoint("vehicles search", lambda ids, i: "/api/v1/velocare/vehicles/?search=pulsar"),
+    Endpoint("vehicle detail", lambda ids, i: f"/api/v1/velocare/vehicles/{ids['vehicle']}/"),
+    Endpoint(
+        "vehicle update", lambda ids, i: f"/api/v1/velocare/vehicles/{ids['vehicle']}/", "patch",
+        lambda ids, i: {"model": f"Model {i}"},
+    ),
+    Endpoint(
+        "vehicles import", lambda ids, i: "/api/v1/velocare/vehicles/import/", "post",
+        lambda ids, i: [
+            {"owner_email": ids["rider"].email, "make": "Honda", "license_plate": f"BM{i:04d}{n:03d}", "model": "Shine", "year": 2020}
+            for n in range(100)
+        ],
+        201,
+    ),
+    Endpoint("vehicle issues list", lambda ids, i: f"/api/v1/velocare/vehicles/{ids['vehicle']}/issues/?expand=vehicle"),
+    Endpoint(
+        "vehicle issue create", lambda ids, i: f"/api/v1/velocare/vehicles/{ids['vehicle']}/issues/", "post",
+        lambda ids, i: {"description": f"rattle {i}", "component": ids["component"], "is_repair": True}, 201,
+    ),
+    Endpoint("issues list", lambda ids, i: "/api/v1/velocare/all_issues/?expand=vehicle"),
+    Endpoint("issues search", lambda ids, i: "/api/v1/velocare/all_issues/?search=clutch"),
+    Endpoint("issues export", lambda ids, i: "/api/v1/velocare/all_issues/export/"),
+    Endpoint(
+        "issues import", lambda ids, i: "/api/v1/velocare/all_issues/import/", "post",
+        lambda ids, i: [{"vehicle": ids["vehicle"], "description": f"imported {i}-{n}", "component": ids["component"]} for n in range(100)],
+        201,
+    ),
+    Endpoint("services list", lambda ids, i: "/api/v1/velocare/services/?expand=vehicle,issues"),
+    Endpoint("services list ids", lambda ids, i: "/api/v1/velocare/services/"),
+    Endpoint("service detail", lambda ids, i: f"/api/v1/velocare/services/{ids['service']}/?expand=vehicle,issues"),
+    Endpoint(
+        "service create", lambda ids, i: "/api/v1/velocare/services/", "post",
+        lambda ids, i: {"vehicle": ids["vehicle"], "issues": ids["issues"][:4]}, 201,
+    ),
+    Endpoint("services export", lambda ids, i: "/api/v1/velocare/services/export/"),
+    Endpoint("revenue dashboard", lambda ids, i: "/api/v1/velocare/services/revenue_dashboard/?group_by=week"),
+    Endpoint("invoices list", lambda ids, i: f"/api/v1/velocare/services/{ids['service']}/invoices/?expand=service.vehicle"),
+    Endpoint(
+        "invoice create", lambda ids, i: f"/api/v1/velocare/services/{ids['uninvoiced'][i]}/invoices/", "post",
+        lambda ids, i: {}, 201,
+    ),
+    Endpoint(
+        "invoice mark paid", lambda ids, i: f"/api/v1/velocare/services/{ids['service']}/invoices/{ids['invoice']}/mark_as_paid/",
+        "post",
+    ),
+    Endpoint(
+        "invoices bulk mark paid", lambda ids, i: "/api/v1/velocare/invoices/mark_as_paid/", "post",
+        # Each request pays the unpaid invoices of the next ten days.
+        lambda ids, i: {"due_before": (date.today() - timedelta(days=350 - 10 * i)).isoformat()},
+    ),
+    Endpoint("invoices unpaid", lambda ids, i: f"/api/v1/velocare/services/{ids['service']}/invoices/unpaid/"),
+    Endpoint("receivables", lambda ids, i: "/api/v1/velocare/receivables/?expand=service.vehicle"),
+    Endpoint("invoices export", lambda ids, i: "/api/v1/velocare/invoices/export/"),
+    Endpoint("async components list", lambda ids, i: "/api/v1/velocare/async/components/"),
+    Endpoint("async vehicles list", lambda ids, i: "/api/v1/velocare/async/vehicles/"),
+    Endpoint("async issues list", lambda ids, i: "/api/v1/velocare/async/all_issues/?expand=vehicle"),
+    Endpoint("async services list", lambda ids, i: "/api/v1/velocare/async/services/?expand=vehicle,issues"),
+    Endpoint("async revenue dashboard", lambda ids, i: "/api/v1/velocare/async/services/revenue_dashboard/"),
+    Endpoint("users list", lambda ids, i: "/api/v1/user/"),
+    Endpoint(
+        "user register", lambda ids, i: "/api/v1/user/register/", "post",
+        lambda ids, i: {"email": f"new-rider{i}@benchmark.velo.invalid", "password": PASSWORD}, 201,
+    ),
+    Endpoint(
+        "owner register", lambda ids, i: "/api/v1/user/owner/register/", "post",
+        lambda ids, i: {"email": f"new-shop{i}@benchmark.velo.invalid", "password": PASSWORD}, 201,
+    ),
+    Endpoint(
+        "user token", lambda ids, i: "/api/v1/user/token/", "post",
+        lambda ids, i: {"email": ids["rider"].email, "password": PASSWORD},
+    ),
+    Endpoint(
+        "owner token", lambda ids, i: "/api/v1/user/owner/token", "post",
+        lambda ids, i: {"email": ids["shop_owner"].email, "password": PASSWORD},
+    ),
+    Endpoint(
+        "token refresh", lambda ids, i: "/api/v1/user/token/refresh", "post",
+        lambda ids, i: {"refresh": str(RefreshToken.for_user(ids["rider"]))},
+    ),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a reproducible data set, drive every VeloCare and User endpoint "
+        "through the Django test client and record query counts, latency "
+        "percentiles and peak Python memory per endpoint. The results are "
+        "compared with the committed budgets and optionally written as JSON; "
+        "the run fails when a budget is exceeded. The seed data and every "
+        "write are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=list(SCALES), default="default")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--requests", type=int, default=30, help="Timed requests per endpoint.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--budgets", default=str(BUDGETS), help="Budgets JSON file, or 'none' to skip the check.")
+        parser.add_argument("endpoints", nargs="*", help="Names of the endpoints to run (default: all).")
+
+    def handle(self, *args, **options):
+        endpoints = [endpoint for endpoint in ENDPOINTS if not options["endpoints"] or endpoint.name in options["endpoints"]]
+        if not endpoints:
+            raise CommandError(f"Unknown endpoints; choose from: {', '.join(endpoint.name for endpoint in ENDPOINTS)}")
+        # Every endpoint is called once to warm up, --requests times timed
+        # and once more to count queries and memory.
+        calls = options["requests"] + 2
+
+        started = time.perf_counter()
+        results = {}
+        # Every request comes from one address and account, which the
+        # throttle would soon turn away.
+        test_settings = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"], THROTTLE=False)
+        with transaction.atomic(), test_settings:
+            ids = seed_data(**SCALES[options["scale"]], uninvoiced=calls, seed=options["seed"])
+            seed_seconds = time.perf_counter() - started
+            client = Client()
+            token = OwnerTokenObtainPairSerializer.get_token(ids["shop_owner"]).access_token
+            headers = {"Authorization": f"Bearer {token}"}
+
+            self.stdout.write(f"{'endpoint':<26}{'queries':>8}{'p50 ms':>10}{'p95 ms':>10}{'peak KiB':>10}")
+            for endpoint in endpoints:
+                results[endpoint.name] = result = self.measure(client, headers, endpoint, ids, options["requests"])
+                self.stdout.write(
+                    f"{endpoint.name:<26}{result['queries']:>8}{result['p50_ms']:>10.2f}"
+                    f"{result['p95_ms']:>10.2f}{result['peak_kib']:>10.0f}"
+                )
+            transaction.set_rollback(True)
+
+        report = {
+            "scale": options["scale"],
+            "rows": SCALES[options["scale"]],
+            "seed": options["seed"],
+            "requests": options["requests"],
+            "seed_seconds": round(seed_seconds, 2),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": f"{connection.vendor} {connection.pg_version if connection.vendor == 'postgresql' else ''}".strip(),
+            "endpoints": results,
+            "violations": [],
+        }
+        if options["budgets"] != "none":
+            report["violations"] = self.check_budgets(report, json.loads(Path(options["budgets"]).read_text()))
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2) + "\n")
+
+        for violation in report["violations"]:
+            self.stderr.write(violation)
+        if report["violations"]:
+            raise CommandError(f"{len(report['violations'])} budget(s) exceeded.")
+        if options["budgets"] != "none":
+            self.stdout.write(self.style.SUCCESS(f"{len(results)} endpoint(s) within budget."))
+
+    def request(self, client, headers, endpoint, ids, i):
+        path = endpoint.path(ids, i)
+        if endpoint.method == "get":
+            response = client.get(path, headers=headers)
+        else:
+            data = endpoint.data(ids, i) if endpoint.data else None
+            response = getattr(client, endpoint.method)(path, data, content_type="application/json", headers=headers)
+        if response.status_code != endpoint.status:
+            raise CommandError(f"{endpoint.name}: expected {endpoint.status}, got {response.status_code}")
+        # Exports stream; reading the body is part of the request.
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    def measure(self, client, headers, endpoint, ids, requests):
+        self.request(client, headers, endpoint, ids, 0)
+        timings = []
+        for i in range(1, requests + 1):
+            started = time.perf_counter()
+            self.request(client, headers, endpoint, ids, i)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                self.request(client, headers, endpoint, ids, requests + 1)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "method": endpoint.method.upper(),
+            "path": endpoint.path(ids, 0),
+            "queries": len(queries),
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0], 3),
+            "max_ms": round(max(timings), 3),
+            "peak_kib": round(peak / 1024, 1),
+        }
+
+    @staticmethod
+    def check_budgets(report, budgets):
+        """
+        Query budgets hold at every scale; latency and memory budgets only
+        for the scale they were recorded at.
+        """
+        violations = []
+        same_scale = budgets.get("scale") == report["scale"]
+        for name, result in report["endpoints"].items():
+            budget = budgets["endpoints"].get(name)
+            if budget is None:
+                violations.append(f"{name}: no budget")
+                continue
+            for key in ("queries", "p95_ms", "peak_kib") if same_scale else ("queries",):
+                if key in budget and result[key] > budget[key]:
+                    violations.append(f"{name}: {key} {result[key]} exceeds budget {budget[key]}")
+        return violations
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from User.auth.auth_serializer import OwnerTokenObtainPairSerializer
+from User.models import CustomUser
+
+PATHS = [
+    "components/",
+    "vehicles/",
+    "all_issues/",
+    "services/",
+    "services/revenue_dashboard/",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second of the sync DRF read endpoints and their "
+        "async counterparts at a fixed concurrency, served in-process through "
+        "Django's ASGI request handling against the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint and mode.")
+        parser.add_argument("--email", help="Shop owner to authenticate as (default: the first one).")
+        parser.add_argument("paths", nargs="*", default=PATHS, help="Paths below /api/v1/velocare/.")
+
+    def handle(self, *args, **options):
+        owners = CustomUser.objects.filter(is_owner=True, is_active=True)
+        if options["email"]:
+            owners = owners.filter(email=options["email"])
+        owner = owners.order_by("id").first()
+        if owner is None:
+            raise CommandError("No active shop owner to authenticate as.")
+        token = OwnerTokenObtainPairSerializer.get_token(owner).access_token
+
+        self.stdout.write(f"{'path':<32}{'sync rps':>12}{'async rps':>12}{'speedup':>10}")
+        # The test client always sends "Host: testserver".
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for path in options["paths"]:
+                sync_rps = asyncio.run(self.measure(f"/api/v1/velocare/{path}", token, options))
+                async_rps = asyncio.run(self.measure(f"/api/v1/velocare/async/{path}", token, options))
+                self.stdout.write(f"{path:<32}{sync_rps:>12.1f}{async_rps:>12.1f}{async_rps / sync_rps:>9.2f}x")
+
+    async def measure(self, url, token, options):
+        client = AsyncClient()
+        headers = {"Authorization": f"Bearer {token}"}
+        semaphore = asyncio.Semaphore(options["concurrency"])
+
+        async def fetch():
+            async with semaphore:
+                response = await client.get(url, headers=headers)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}")
+
+        await fetch()  # warm caches before timing
+        started = time.perf_counter()
+        await asyncio.gather(*(fetch() for _ in range(options["requests"])))
+        return options["requests"] / (time.perf_counter() - started)
@@ -0,0 +1,72 @@
+import io
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from VeloService import parsers, renderers
+from VeloService.parsers import FastJSONParser
+from VeloService.renderers import FastJSONRenderer
+from VeloCare.catalog import component_catalog
+from VeloCare.models import Service
+from VeloCare.seeding import seed_data
+from VeloCare.serializers import ServiceSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed services and time rendering their list payload (vehicle and "
+        "issues expanded) with DRF's JSONRenderer and with FastJSONRenderer, "
+        "and parsing it back with both parsers. Fails if the outputs differ. "
+        "The seed data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--services", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per renderer and parser.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None or parsers.orjson is None:
+            self.stderr.write("orjson is not installed; the fast renderer and parser fall back to DRF's.")
+
+        services = options["services"]
+        with transaction.atomic():
+            seed_data(
+                owners=max(services // 4, 1), vehicles=max(services // 2, 1), components=100,
+                issues=services * 3, services=services, seed=options["seed"],
+            )
+            expand = {"vehicle": {}, "issues": {}}
+            queryset = ServiceSerializer.setup_eager_loading(Service.objects.order_by("-date", "-id"), expand=expand)
+            started = time.perf_counter()
+            with component_catalog.scope():
+                data = ServiceSerializer(queryset, many=True, expand=expand).data
+            self.stdout.write(f"Serialized {len(data)} services in {(time.perf_counter() - started) * 1000:.0f} ms.")
+            transaction.set_rollback(True)
+
+        expected = JSONRenderer().render(data)
+        rendered = FastJSONRenderer().render(data)
+        if rendered != expected:
+            raise CommandError("FastJSONRenderer output differs from JSONRenderer's.")
+        parsed = JSONParser().parse(io.BytesIO(expected))
+        if FastJSONParser().parse(io.BytesIO(expected)) != parsed:
+            raise CommandError("FastJSONParser result differs from JSONParser's.")
+
+        self.stdout.write(f"Payload: {len(expected) / 1024:.0f} KiB, identical output.")
+        self.stdout.write(f"{'':<20}{'p50 ms':>10}{'min ms':>10}{'MiB/s':>10}")
+        for name, run in (
+            ("JSONRenderer", lambda: JSONRenderer().render(data)),
+            ("FastJSONRenderer", lambda: FastJSONRenderer().render(data)),
+            ("JSONParser", lambda: JSONParser().parse(io.BytesIO(expected))),
+            ("FastJSONParser", lambda: FastJSONParser().parse(io.BytesIO(expected))),
+        ):
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            median = statistics.median(timings)
+            self.stdout.write(
+                f"{name:<20}{median:>10.2f}{min(timings):>10.2f}{len(expected) / 1048576 / (median / 1000):>10.0f}"
+            )
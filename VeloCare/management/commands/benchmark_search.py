@@ -0,0 +1,136 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from User.models import CustomUser
+from VeloService.filters import RankedSearchFilter
+from VeloCare.models import Vehicle, Issue
+from VeloCare.views import VehicleViewSet, AllIssueViewSet
+
+STATES = ["KA", "MH", "DL", "TN", "KL", "AP", "TS", "GJ", "RJ", "UP", "WB", "HR", "PB", "MP"]
+MAKES = ["Honda", "Bajaj", "TVS", "Hero", "Yamaha", "Suzuki", "Royal Enfield", "KTM", "Ather", "Ola"]
+MODELS = [
+    "Activa", "Shine", "Unicorn", "Pulsar", "Platina", "Dominar", "Jupiter", "Apache", "Splendor", "Passion",
+    "FZ25", "R15", "Access", "Gixxer", "Classic 350", "Bullet", "Duke", "RC 390", "450X", "S1 Pro",
+]
+FAULTS = [
+    "front brake pads worn", "rear brake squeals", "chain slack", "clutch cable frayed", "battery not charging",
+    "headlight flickers", "engine misfires when cold", "oil leak near gasket", "horn not working",
+    "speedometer cable broken", "tyre puncture", "spark plug fouled", "carburettor flooding", "fork seal leaking",
+    "self start motor jams", "indicator relay clicking", "kick start slipping", "mirror loose", "seat lock stuck",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a reproducible set of vehicles and issues, then time the ranked "
+        "?search= queries of the vehicle and issue endpoints against it. The "
+        "seed data is rolled back afterwards unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vehicles", type=int, default=1_000_000)
+        parser.add_argument("--issues", type=int, default=3_000_000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--searches", type=int, default=200, help="Searches per kind of term.")
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--keep", action="store_true", help="Commit the seed data instead of rolling it back.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            first_vehicle, first_issue = self.seed(options)
+            rng = random.Random(options["seed"])
+            vehicles = [first_vehicle + rng.randrange(options["vehicles"]) for _ in range(options["searches"])]
+            issues = [first_issue + rng.randrange(options["issues"]) for _ in range(options["searches"])]
+            plates = Vehicle.objects.in_bulk(vehicles)
+            descriptions = Issue.objects.in_bulk(issues)
+
+            def plate_fragment(vehicle):
+                start = rng.randrange(len(vehicle.license_plate) - 3)
+                return vehicle.license_plate[start:start + 4]
+
+            kinds = [
+                ("plate fragment", VehicleViewSet, [plate_fragment(plates[pk]) for pk in vehicles]),
+                ("make/model", VehicleViewSet, [rng.choice(MODELS) for _ in vehicles]),
+                ("description", AllIssueViewSet, [rng.choice(descriptions[pk].description.split(", ")) for pk in issues]),
+            ]
+
+            self.stdout.write(f"{'search':<18}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'rows':>8}  index")
+            for kind, viewset, terms in kinds:
+                self.report(kind, viewset, terms, options["page_size"])
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def seed(self, options):
+        rider, _ = CustomUser.objects.get_or_create(
+            email="search-benchmark@velo.invalid", defaults={"is_user": True}
+        )
+        vehicle_table = connection.ops.quote_name(Vehicle._meta.db_table)
+        issue_table = connection.ops.quote_name(Issue._meta.db_table)
+        with connection.cursor() as cursor:
+            # setseed() makes random() repeat the same sequence on every run.
+            cursor.execute("SELECT setseed(%s)", [(options["seed"] % 1000) / 1000])
+            cursor.execute(
+                f"""
+                WITH seeded AS (
+                    INSERT INTO {vehicle_table} (owner_id, make, license_plate, model, year)
+                    SELECT %s,
+                           (%s::text[])[1 + floor(random() * cardinality(%s::text[]))::int],
+                           (%s::text[])[1 + floor(random() * cardinality(%s::text[]))::int]
+                               || lpad(floor(random() * 100)::int::text, 2, '0')
+                               || chr(65 + floor(random() * 26)::int) || chr(65 + floor(random() * 26)::int)
+                               || lpad(floor(random() * 10000)::int::text, 4, '0'),
+                           (%s::text[])[1 + floor(random() * cardinality(%s::text[]))::int],
+                           2000 + floor(random() * 25)::int
+                    FROM generate_series(1, %s)
+                    RETURNING id
+                )
+                SELECT min(id) FROM seeded
+                """,
+                [rider.id, MAKES, MAKES, STATES, STATES, MODELS, MODELS, options["vehicles"]],
+            )
+            # One INSERT draws its ids from the sequence back to back.
+            first_vehicle = cursor.fetchone()[0]
+            cursor.execute(
+                f"""
+                WITH seeded AS (
+                    INSERT INTO {issue_table} (vehicle_id, description, is_repair)
+                    SELECT %s + floor(random() * %s)::int,
+                           (%s::text[])[1 + floor(random() * cardinality(%s::text[]))::int] || ', '
+                               || (%s::text[])[1 + floor(random() * cardinality(%s::text[]))::int]
+                               || ', job card ' || lpad(floor(random() * 1000000)::int::text, 6, '0'),
+                           random() < 0.8
+                    FROM generate_series(1, %s)
+                    RETURNING id
+                )
+                SELECT min(id) FROM seeded
+                """,
+                [first_vehicle, options["vehicles"], FAULTS, FAULTS, FAULTS, FAULTS, options["issues"]],
+            )
+            first_issue = cursor.fetchone()[0]
+            cursor.execute(f"ANALYZE {vehicle_table}")
+            cursor.execute(f"ANALYZE {issue_table}")
+        return first_vehicle, first_issue
+
+    def report(self, kind, viewset, terms, page_size):
+        factory = APIRequestFactory()
+        timings, rows, plan = [], [], ""
+        for term in terms:
+            request = Request(factory.get("/", {"search": term}))
+            queryset = RankedSearchFilter().filter_queryset(request, viewset(request=request).get_queryset(), viewset)
+            # The same statement the first page of the endpoint runs.
+            queryset = queryset.order_by("-search_rank", "id")[:page_size + 1]
+            plan = plan or queryset.explain()
+            started = time.perf_counter()
+            rows.append(len(list(queryset)))
+            timings.append((time.perf_counter() - started) * 1000)
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        index = "trigram" if "trgm_idx" in plan else "none (sequential scan)"
+        self.stdout.write(
+            f"{kind:<18}{statistics.median(timings):>10.2f}{p95:>10.2f}{max(timings):>10.2f}"
+            f"{statistics.mean(rows):>8.0f}  {index}"
+        )
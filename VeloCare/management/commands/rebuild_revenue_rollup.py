@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+from VeloCare.models import DailyRevenue
+
+
+class Command(BaseCommand):
+    help = "Recompute the DailyRevenue rollup from the service history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=parse_date, help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument("--end", type=parse_date, help="Last day to rebuild (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        rows = DailyRevenue.objects.rebuild(start=options["start"], end=options["end"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt revenue rollup for {len(rows)} day(s)."))
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:30
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_revenue(apps, schema_editor):
+    Service = apps.get_model("VeloCare", "Service")
+    DailyRevenue = apps.get_model("VeloCare", "DailyRevenue")
+    days = (
+        Service.objects.annotate(day=TruncDate("date"))
+        .values("day")
+        .annotate(total=Sum("total_cost"), service_count=Count("id"))
+        .order_by("day")
+    )
+    DailyRevenue.objects.bulk_create(
+        [DailyRevenue(**day) for day in days], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("VeloCare", "0004_component_description_alter_invoice_due_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyRevenue",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(unique=True)),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("service_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_daily_revenue, migrations.RunPython.noop),
+    ]
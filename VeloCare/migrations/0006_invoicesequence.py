@@ -0,0 +1,46 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:52
+
+import re
+from django.db import migrations, models
+
+
+def seed_invoice_sequences(apps, schema_editor):
+    # Continue numbering after the INV-0001 style numbers that were derived
+    # from the invoice count before the counter table existed.
+    Invoice = apps.get_model("VeloCare", "Invoice")
+    InvoiceSequence = apps.get_model("VeloCare", "InvoiceSequence")
+    last_values = {}
+    for number in Invoice.objects.values_list("invoice_number", flat=True).iterator():
+        match = re.fullmatch(r"(.*?)(\d+)", number)
+        if match:
+            prefix, value = match.group(1), int(match.group(2))
+            last_values[prefix] = max(last_values.get(prefix, 0), value)
+    InvoiceSequence.objects.bulk_create(
+        [InvoiceSequence(prefix=prefix, last_value=value) for prefix, value in last_values.items()]
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("VeloCare", "0005_dailyrevenue"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InvoiceSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("prefix", models.CharField(max_length=20, unique=True)),
+                ("last_value", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_invoice_sequences, migrations.RunPython.noop),
+    ]
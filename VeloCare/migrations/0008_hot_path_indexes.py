@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The service and invoice tables are large; build the indexes without
+    # blocking writes.
+    atomic = False
+
+    dependencies = [
+        ("VeloCare", "0007_tableversion"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="invoice",
+            index=models.Index(fields=["due_date"], name="invoice_due_date_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="invoice",
+            index=models.Index(
+                condition=models.Q(("paid", False)),
+                fields=["due_date"],
+                name="invoice_unpaid_due_date_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="issue",
+            index=models.Index(fields=["vehicle", "id"], name="issue_vehicle_id_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="service",
+            index=models.Index(fields=["date", "id"], name="service_date_id_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="vehicle",
+            index=models.Index(fields=["license_plate"], name="vehicle_license_plate_idx"),
+        ),
+    ]
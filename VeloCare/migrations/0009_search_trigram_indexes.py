@@ -0,0 +1,36 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:40
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+from django.db.models.functions import Upper
+
+
+class Migration(migrations.Migration):
+    # Build the trigram indexes without blocking writes to the vehicle and
+    # issue tables.
+    atomic = False
+
+    dependencies = [
+        ("VeloCare", "0008_hot_path_indexes"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name="issue",
+            index=GinIndex(OpClass(Upper("description"), name="gin_trgm_ops"), name="issue_description_trgm_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="vehicle",
+            index=GinIndex(OpClass(Upper("license_plate"), name="gin_trgm_ops"), name="vehicle_plate_trgm_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="vehicle",
+            index=GinIndex(OpClass(Upper("make"), name="gin_trgm_ops"), name="vehicle_make_trgm_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="vehicle",
+            index=GinIndex(OpClass(Upper("model"), name="gin_trgm_ops"), name="vehicle_model_trgm_idx"),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Existing rows get the time of the migration; the column default is
+    # computed once, so no table is rewritten.
+
+    dependencies = [
+        ("VeloCare", "0009_search_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="component",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="invoice",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="issue",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="service",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="tableversion",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="vehicle",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
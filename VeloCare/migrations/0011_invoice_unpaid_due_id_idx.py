@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:28
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Replaces the unpaid due date index with one that also covers the id
+    # order of the receivables pages and the amounts the aging totals sum.
+    atomic = False
+
+    dependencies = [
+        ("VeloCare", "0010_updated_at"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="invoice",
+            index=models.Index(
+                condition=models.Q(("paid", False)),
+                fields=["due_date", "id"],
+                include=("total_amount",),
+                name="invoice_unpaid_due_id_idx",
+            ),
+        ),
+        RemoveIndexConcurrently(
+            model_name="invoice",
+            name="invoice_unpaid_due_date_idx",
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 17:46
+
+import VeloCare.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VeloCare', '0012_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoice',
+            name='due_date',
+            field=models.DateField(default=VeloCare.models.default_due_date),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.2 on 2026-10-18 21:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # ETag and Last-Modified come from TableVersion, which keeps its
+    # updated_at; the per-row columns were never read.
+
+    dependencies = [
+        ("VeloCare", "0013_invoice_due_date_default"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="component",
+            name="updated_at",
+        ),
+        migrations.RemoveField(
+            model_name="invoice",
+            name="updated_at",
+        ),
+        migrations.RemoveField(
+            model_name="issue",
+            name="updated_at",
+        ),
+        migrations.RemoveField(
+            model_name="service",
+            name="updated_at",
+        ),
+        migrations.RemoveField(
+            model_name="vehicle",
+            name="updated_at",
+        ),
+    ]
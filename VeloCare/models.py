@@ -1,6 +1,56 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+from django.db.models import F, Q, Sum, Count
+from django.db.models.functions import Trunc, TruncDate, Upper
+from django.utils import timezone
 from User.models import CustomUser
-from datetime import date, timedelta
+from datetime import datetime, time, timedelta
+
+
+def day_start(day):
+    """Aware datetime at which ``day`` starts, for index-friendly range filters."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def default_due_date():
+    """Invoices fall due 15 days after the day they are created."""
+    return timezone.localdate() + timedelta(days=15)
+
+
+class TableVersionManager(models.Manager):
+    def current(self, name):
+        return self.filter(name=name).values_list("version", flat=True).first() or 0
+
+    async def acurrent(self, name):
+        return await self.filter(name=name).values_list("version", flat=True).afirst() or 0
+
+    def bump(self, name):
+        changes = {"version": F("version") + 1, "updated_at": timezone.now()}
+        if not self.filter(name=name).update(**changes):
+            self.get_or_create(name=name)
+            self.filter(name=name).update(**changes)
+
+    def bump_on_commit(self, name):
+        # Bumping after the commit keeps the counter row from staying locked
+        # for the rest of the writing transaction.
+        transaction.on_commit(lambda: self.bump(name))
+
+
+class TableVersion(models.Model):
+    """
+    Monotonic change counter per logical table, bumped whenever the table is
+    written so readers can detect changes with a single indexed lookup.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TableVersionManager()
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
 
 
 class Component(models.Model):
@@ -20,6 +70,16 @@ class Vehicle(models.Model):
     model = models.CharField(max_length=100)
     year = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["license_plate"], name="vehicle_license_plate_idx"),
+            # Trigram indexes over UPPER(column) serve the ``icontains`` lookups
+            # of the API search and the admin search box.
+            GinIndex(OpClass(Upper("license_plate"), name="gin_trgm_ops"), name="vehicle_plate_trgm_idx"),
+            GinIndex(OpClass(Upper("make"), name="gin_trgm_ops"), name="vehicle_make_trgm_idx"),
+            GinIndex(OpClass(Upper("model"), name="gin_trgm_ops"), name="vehicle_model_trgm_idx"),
+        ]
+
     def __str__(self):
         return f"{self.license_plate} - {self.make} - {self.model} = {self.year}"
 
@@ -30,6 +90,13 @@ class Issue(models.Model):
     component = models.ForeignKey(Component, on_delete=models.SET_NULL, null=True, blank=True)
     is_repair = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Per-vehicle issue lists are read in id order.
+            models.Index(fields=["vehicle", "id"], name="issue_vehicle_id_idx"),
+            GinIndex(OpClass(Upper("description"), name="gin_trgm_ops"), name="issue_description_trgm_idx"),
+        ]
+
     def __str__(self):
         return f"{self.vehicle} - {self.description[:50]} - {self.component}"
 
@@ -40,17 +107,239 @@ class Service(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     total_cost = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Date range scans and the (-date, -id) cursor pagination order.
+            models.Index(fields=["date", "id"], name="service_date_id_idx"),
+        ]
+
     def __str__(self):
         return f"Service for {self.vehicle} on {self.date}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "date" in field_names and "total_cost" in field_names:
+            instance._saved_revenue = instance.revenue_entry()
+        return instance
+
+    def revenue_entry(self):
+        return timezone.localdate(self.date), self.total_cost
+
+    def save(self, *args, **kwargs):
+        # The rollup row is updated in the same transaction as the service so
+        # DailyRevenue never drifts from the services it summarises.
+        adding = self._state.adding
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            previous = None if adding else getattr(self, "_saved_revenue", None)
+            current = self.revenue_entry()
+            if adding or (previous is not None and previous != current):
+                if previous is not None:
+                    DailyRevenue.objects.record(previous[0], -previous[1], -1)
+                DailyRevenue.objects.record(current[0], current[1], 1)
+        self._saved_revenue = current
+
+
+class DailyRevenueManager(models.Manager):
+    def record(self, day, amount, count):
+        changes = {"total": F("total") + amount, "service_count": F("service_count") + count}
+        if not self.filter(day=day).update(**changes):
+            self.get_or_create(day=day)
+            self.filter(day=day).update(**changes)
+
+    def _totals_query(self, today):
+        month_start, year_start = today.replace(day=1), today.replace(month=1, day=1)
+        aggregates = {
+            "daily_revenue": Sum("total", filter=Q(day=today)),
+            "monthly_revenue": Sum("total", filter=Q(day__gte=month_start)),
+            "yearly_revenue": Sum("total"),
+        }
+        return self.filter(day__gte=year_start, day__lte=today), aggregates
+
+    def totals(self, today):
+        queryset, aggregates = self._totals_query(today)
+        return {key: value or 0 for key, value in queryset.aggregate(**aggregates).items()}
+
+    async def atotals(self, today):
+        queryset, aggregates = self._totals_query(today)
+        return {key: value or 0 for key, value in (await queryset.aaggregate(**aggregates)).items()}
+
+    def series(self, start, end, group_by="day"):
+        return (
+            self.filter(day__gte=start, day__lte=end)
+            .annotate(period=Trunc("day", group_by))
+            .values("period")
+            .annotate(revenue=Sum("total"), services=Sum("service_count"))
+            .order_by("period")
+        )
+
+    def rebuild(self, start=None, end=None):
+        days = Service.objects.annotate(day=TruncDate("date")).values("day").annotate(
+            total=Sum("total_cost"), service_count=Count("id")
+        ).order_by("day")
+        rows = self.all()
+        if start:
+            days, rows = days.filter(date__gte=day_start(start)), rows.filter(day__gte=start)
+        if end:
+            days, rows = days.filter(date__lt=day_start(end + timedelta(days=1))), rows.filter(day__lte=end)
+        with transaction.atomic():
+            rows.delete()
+            return self.bulk_create([self.model(**day) for day in days], batch_size=1000)
+
+
+class DailyRevenue(models.Model):
+    """
+    Per-day sum of ``Service.total_cost``, kept up to date by ``Service.save``
+    and the ``post_delete`` handler in ``VeloCare.signals``. Writes made with
+    ``QuerySet.update`` bypass both; run ``manage.py rebuild_revenue_rollup``
+    after those.
+    """
+    day = models.DateField(unique=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    service_count = models.PositiveIntegerField(default=0)
+
+    objects = DailyRevenueManager()
+
+    def __str__(self):
+        return f"Revenue on {self.day}: {self.total}"
+
+
+# Days past due covered by each receivables aging bucket; the first one
+# also holds invoices that are not due yet.
+AGING_BUCKETS = (("0-30", None, 30), ("31-60", 31, 60), ("61-90", 61, 90), ("90+", 91, None))
+
+
+class InvoiceManager(models.Manager):
+    def unpaid(self):
+        return self.filter(paid=False)
+
+    def mark_paid(self, invoices):
+        """
+        Marks the unpaid rows of ``invoices`` paid and returns their ids. The
+        rows are locked and collected first, then paid with one UPDATE by id.
+        ``QuerySet.update`` sends no signals, so the invoice TableVersion is
+        bumped here instead of by the post_save handler.
+        """
+        using = router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            # A row another request paid while this one waited for its lock
+            # no longer matches paid=False, so it is not counted twice.
+            ids = list(
+                invoices.using(using).filter(paid=False).select_for_update(of=("self",))
+                .order_by("id").values_list("id", flat=True)
+            )
+            if ids:
+                self.using(using).filter(id__in=ids).update(paid=True)
+                TableVersion.objects.bump_on_commit("invoice")
+        return ids
+
+    def aging(self, today):
+        """
+        Count and total of the unpaid invoices per aging bucket and overall,
+        in one query over the partial unpaid index.
+        """
+        aggregates = {"count": Count("id"), "total": Sum("total_amount")}
+        for position, (_, low, high) in enumerate(AGING_BUCKETS):
+            due = Q()
+            if low is not None:
+                due &= Q(due_date__lte=today - timedelta(days=low))
+            if high is not None:
+                due &= Q(due_date__gte=today - timedelta(days=high))
+            aggregates[f"count_{position}"] = Count("id", filter=due)
+            aggregates[f"total_{position}"] = Sum("total_amount", filter=due)
+        row = self.unpaid().aggregate(**aggregates)
+        return {
+            "as_of": today,
+            "count": row["count"],
+            "total": row["total"] or 0,
+            "buckets": [
+                {"days": name, "count": row[f"count_{position}"], "total": row[f"total_{position}"] or 0}
+                for position, (name, _, _) in enumerate(AGING_BUCKETS)
+            ],
+        }
+
 
 class Invoice(models.Model):
     service = models.OneToOneField(Service, on_delete=models.CASCADE)
     invoice_number = models.CharField(max_length=20, unique=True)
     issue_date = models.DateTimeField(auto_now_add=True)
-    due_date = models.DateField(default=date.today() + timedelta(days=15))
+    due_date = models.DateField(default=default_due_date)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     paid = models.BooleanField(default=False)
 
+    objects = InvoiceManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["due_date"], name="invoice_due_date_idx"),
+            # Pages of receivables in (due_date, id) order and the aging
+            # totals read only this index.
+            models.Index(
+                fields=["due_date", "id"],
+                include=["total_amount"],
+                condition=Q(paid=False),
+                name="invoice_unpaid_due_id_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Invoice {self.invoice_number} for {self.service}"
+
+
+class InvoiceSequenceManager(models.Manager):
+    def next_value(self, prefix):
+        # The UPDATE row-locks the counter until the surrounding transaction
+        # ends, so concurrent callers for one prefix are serialised and never
+        # see the same value.
+        with transaction.atomic():
+            counter = self.filter(prefix=prefix)
+            if not counter.update(last_value=F("last_value") + 1):
+                self.get_or_create(prefix=prefix)
+                counter.update(last_value=F("last_value") + 1)
+            return counter.values_list("last_value", flat=True).get()
+
+
+class InvoiceSequence(models.Model):
+    prefix = models.CharField(max_length=20, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    objects = InvoiceSequenceManager()
+
+    def __str__(self):
+        return f"{self.prefix}{self.last_value}"
+
+
+class IdempotencyKeyManager(models.Manager):
+    def expired(self):
+        return self.filter(created_at__lt=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL))
+
+    def claim(self, key, fingerprint):
+        """
+        ``(record, created)`` for ``key``; run it in the transaction that does
+        the work. A new row stays uncommitted until then, and its primary key
+        makes concurrent claims of the same key wait for the outcome: they get
+        the committed record, or a fresh one if the first claim rolled back.
+        """
+        self.expired().filter(key=key).delete()
+        return self.get_or_create(key=key, defaults={"fingerprint": fingerprint})
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response to a create request sent with an ``Idempotency-Key`` header,
+    replayed to retries with the same key until it is
+    ``IDEMPOTENCY_KEY_TTL`` seconds old.
+    """
+    # MD5 of the user, method, path and header value.
+    key = models.CharField(max_length=32, primary_key=True)
+    # MD5 of the request body, to reject a key reused for another request.
+    fingerprint = models.CharField(max_length=32)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = IdempotencyKeyManager()
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code})"
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.utils import timezone
+from .models import InvoiceSequence
+
+
+def invoice_prefix(shop=None, on=None):
+    config = settings.INVOICE_NUMBERING
+    on = on or timezone.localdate()
+    return config["PREFIX"].format(year=on.year, shop=shop or config["SHOP_CODE"])
+
+
+def allocate_invoice_number(shop=None, on=None):
+    """
+    Return the next invoice number for the configured prefix, e.g.
+    ``INV-0042`` or ``INV-2026-0042`` with ``PREFIX = "INV-{year}-"``.
+
+    When ``INVOICE_NUMBERING["GAPLESS"]`` is set, call this inside the
+    transaction that inserts the invoice: a rollback then returns the number.
+    """
+    prefix = invoice_prefix(shop, on)
+    value = InvoiceSequence.objects.next_value(prefix)
+    return f"{prefix}{value:0{settings.INVOICE_NUMBERING['PADDING']}d}"
@@ -0,0 +1,153 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from User.models import CustomUser
+from .catalog import component_catalog
+from .models import Component, Vehicle, Issue, Service, Invoice, DailyRevenue, TableVersion
+
+SCALES = {
+    "small": {"owners": 20, "vehicles": 40, "components": 20, "issues": 200, "services": 80},
+    "default": {"owners": 500, "vehicles": 1_000, "components": 100, "issues": 6_000, "services": 2_000},
+    "large": {"owners": 10_000, "vehicles": 20_000, "components": 300, "issues": 120_000, "services": 40_000},
+}
+
+MAKES = {
+    "Honda": ["Activa", "Shine", "Unicorn"],
+    "Bajaj": ["Pulsar", "Platina", "Dominar"],
+    "TVS": ["Jupiter", "Apache", "Ntorq"],
+    "Hero": ["Splendor", "Passion", "Glamour"],
+    "Royal Enfield": ["Classic 350", "Bullet", "Meteor 350"],
+    "KTM": ["Duke", "RC 390"],
+}
+PARTS = ["Brake pad", "Chain", "Clutch plate", "Spark plug", "Battery", "Headlight", "Tyre", "Fork seal", "Horn"]
+FAULTS = [
+    "brakes squeal", "chain slack", "clutch slipping", "battery not charging", "headlight flickers",
+    "engine misfires when cold", "oil leak near gasket", "horn not working", "tyre puncture", "fork seal leaking",
+]
+PASSWORD = "velo-benchmark"
+
+
+def seed_data(owners, vehicles, components, issues, services, uninvoiced=0, seed=42, days=365):
+    """
+    Insert a reproducible workshop history: riders with vehicles, a component
+    catalogue, issues spread over the vehicles, services of one to four
+    issues of a vehicle dated over the last ``days`` days, and an invoice for
+    every service but the ``uninvoiced`` newest ones (at least a fifth are
+    left without one).
+
+    Rows are written with ``bulk_create``, so the revenue rollup is rebuilt
+    and the TableVersion counters are bumped at the end. Every rider has
+    the password ``PASSWORD``. Returns the ids the benchmark requests use.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    tag = f"seed{seed}"
+    password = make_password(PASSWORD)
+
+    with transaction.atomic():
+        shop_owner, _ = CustomUser.objects.get_or_create(
+            email=f"shop@{tag}.velo.invalid", defaults={"is_owner": True, "password": password}
+        )
+        riders = CustomUser.objects.bulk_create(
+            [CustomUser(email=f"rider{i}@{tag}.velo.invalid", password=password, is_user=True) for i in range(owners)],
+            batch_size=1000,
+        )
+        parts = Component.objects.bulk_create(
+            [
+                Component(
+                    name=f"{rng.choice(PARTS)} {i}",
+                    new_price=Decimal(rng.randrange(200, 5000)),
+                    repair_price=Decimal(rng.randrange(50, 1500)),
+                )
+                for i in range(components)
+            ],
+            batch_size=1000,
+        )
+        fleet = []
+        for i in range(vehicles):
+            make = rng.choice(list(MAKES))
+            fleet.append(Vehicle(
+                owner=riders[i % len(riders)],
+                make=make,
+                model=rng.choice(MAKES[make]),
+                license_plate=f"KA{rng.randrange(1, 70):02d}{chr(65 + rng.randrange(26))}{chr(65 + rng.randrange(26))}{i:04d}",
+                year=rng.randrange(2005, 2025),
+            ))
+        fleet = Vehicle.objects.bulk_create(fleet, batch_size=1000)
+        reported = Issue.objects.bulk_create(
+            [
+                Issue(
+                    vehicle=fleet[i % len(fleet)],
+                    description=f"{rng.choice(FAULTS)}, job card {i:06d}",
+                    component=rng.choice(parts),
+                    is_repair=rng.random() < 0.8,
+                )
+                for i in range(issues)
+            ],
+            batch_size=1000,
+        )
+        issues_by_vehicle = {}
+        for issue in reported:
+            issues_by_vehicle.setdefault(issue.vehicle_id, []).append(issue)
+
+        history, links = [], []
+        for i in range(services):
+            vehicle = fleet[i % len(fleet)]
+            candidates = issues_by_vehicle.get(vehicle.id, [])
+            chosen = rng.sample(candidates, min(rng.randint(1, 4), len(candidates)))
+            total = sum(
+                (issue.component.repair_price if issue.is_repair else issue.component.new_price) for issue in chosen
+            )
+            history.append(Service(vehicle=vehicle, total_cost=Decimal(total)))
+            links.append(chosen)
+        history = Service.objects.bulk_create(history, batch_size=1000)
+        # auto_now_add overwrote the dates on insert; bulk_update leaves them.
+        for service in history:
+            service.date = now - timedelta(days=rng.randrange(days), seconds=rng.randrange(86400))
+        Service.objects.bulk_update(history, ["date"], batch_size=1000)
+        Service.issues.through.objects.bulk_create(
+            [
+                Service.issues.through(service_id=service.id, issue_id=issue.id)
+                for service, chosen in zip(history, links) for issue in chosen
+            ],
+            batch_size=1000,
+        )
+
+        history.sort(key=lambda service: (service.date, service.id))
+        invoiced = history[:len(history) - max(uninvoiced, len(history) // 5)]
+        invoices = Invoice.objects.bulk_create(
+            [
+                Invoice(
+                    service=service,
+                    invoice_number=f"{tag.upper()}-{i:06d}",
+                    total_amount=service.total_cost,
+                    due_date=(service.date + timedelta(days=15)).date(),
+                    paid=rng.random() < 0.7,
+                )
+                for i, service in enumerate(invoiced)
+            ],
+            batch_size=1000,
+        )
+        for invoice, service in zip(invoices, invoiced):
+            invoice.issue_date = service.date
+        Invoice.objects.bulk_update(invoices, ["issue_date"], batch_size=1000)
+
+        DailyRevenue.objects.rebuild()
+        for name in ("user", "component", "vehicle", "issue", "service", "invoice"):
+            TableVersion.objects.bump(name)
+    component_catalog.clear()
+
+    busiest = max(issues_by_vehicle, key=lambda vehicle_id: len(issues_by_vehicle[vehicle_id]))
+    return {
+        "shop_owner": shop_owner,
+        "rider": riders[0],
+        "component": parts[0].id,
+        "vehicle": busiest,
+        "issues": [issue.id for issue in issues_by_vehicle[busiest]],
+        "service": invoiced[-1].id,
+        "invoice": invoices[-1].id,
+        "uninvoiced": [service.id for service in history[len(invoiced):]],
+    }
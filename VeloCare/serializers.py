@@ -1,16 +1,23 @@
+from decimal import Decimal
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
 from rest_framework import serializers
 from .models import Component, Vehicle, Issue, Invoice, Service
+from .catalog import component_catalog
+from .numbering import allocate_invoice_number
 from User.models import CustomUser
 from User.auth.user_serializers import UserSerializer
+from VeloService.fields import BulkPrimaryKeyRelatedField
+from VeloService.sparse import SparseFieldsMixin
 
 
-class ComponentSerializer(serializers.ModelSerializer):
+class ComponentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Component
         fields = "__all__"
 
 
-class VehicleSerializer(serializers.ModelSerializer):
+class VehicleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     owner = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all())
     owner_email = serializers.EmailField(source='owner.email', read_only=True)
 
@@ -24,27 +31,94 @@ class VehicleSerializer(serializers.ModelSerializer):
         return vehicle
 
 
-class IssueSerializer(serializers.ModelSerializer):
-    vehicle = VehicleSerializer(read_only=True)
+class VehicleImportSerializer(serializers.ModelSerializer):
+    owner_email = serializers.EmailField()
+
+    class Meta:
+        model = Vehicle
+        fields = ['owner_email', 'make', 'license_plate', 'model', 'year']
+
+
+def warm_component_catalog(issues):
+    component_catalog.get_many(
+        issue.component_id for issue in issues if not Issue.component.is_cached(issue)
+    )
+
+
+class IssueListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        issues = data.all() if isinstance(data, models.manager.BaseManager) else data
+        if self.child.renders('component_name'):
+            warm_component_catalog(issues)
+        return super().to_representation(issues)
+
+
+class IssueSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    vehicle = serializers.PrimaryKeyRelatedField(read_only=True)
     component = serializers.PrimaryKeyRelatedField(queryset=Component.objects.all())
     component_name = serializers.SerializerMethodField()
+    expandable_fields = {'vehicle': VehicleSerializer, 'component': ComponentSerializer}
+    field_lookups = {'component_name': ('component',)}
 
     class Meta:
         model = Issue
         fields = "__all__"
+        list_serializer_class = IssueListSerializer
 
     def get_component_name(self, obj):
-        return obj.component.name if obj.component else None
+        if Issue.component.is_cached(obj):
+            component = obj.component
+        else:
+            component = component_catalog.get(obj.component_id)
+        return component.name if component else None
+
+    @classmethod
+    def eager_loading(cls, fields, expand, prefix, with_components=False, **options):
+        only, select, prefetch = super().eager_loading(fields, expand, prefix, with_components=with_components, **options)
+        # Component names normally come from the per-process catalog; async
+        # views cannot call it lazily, so they join the component instead.
+        if with_components and (fields is None or 'component_name' in fields):
+            select.add(f'{prefix}component')
+            only.add(f'{prefix}component__name')
+        return only, select, prefetch
+
+
+class IssueImportSerializer(serializers.ModelSerializer):
+    # Foreign keys are checked for a whole chunk at once by the view.
+    vehicle = serializers.IntegerField(required=False)
+    license_plate = serializers.CharField(max_length=20, required=False)
+    component = serializers.IntegerField(required=False, allow_null=True)
 
+    class Meta:
+        model = Issue
+        fields = ['vehicle', 'license_plate', 'description', 'component', 'is_repair']
+
+    def validate(self, attrs):
+        if ('vehicle' in attrs) == ('license_plate' in attrs):
+            raise serializers.ValidationError("Give either vehicle or license_plate.")
+        return attrs
+
+
+class ServiceListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        services = data.all() if isinstance(data, models.manager.BaseManager) else data
+        issues = self.child.expanded_fields.get('issues')
+        if issues is not None and issues.child.renders('component_name'):
+            # One catalog lookup for the whole page instead of one per service.
+            warm_component_catalog(issue for service in services for issue in service.issues.all())
+        return super().to_representation(services)
 
-class ServiceSerializer(serializers.ModelSerializer):
+
+class ServiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     vehicle = serializers.PrimaryKeyRelatedField(queryset=Vehicle.objects.all())
-    issues = serializers.PrimaryKeyRelatedField(queryset=Issue.objects.all(), many=True)
+    issues = BulkPrimaryKeyRelatedField(queryset=Issue.objects.all(), many=True)
+    expandable_fields = {'vehicle': VehicleSerializer, 'issues': IssueSerializer}
 
     class Meta:
         model = Service
         fields = '__all__'
         read_only_fields = ['total_cost']
+        list_serializer_class = ServiceListSerializer
 
     def create(self, validated_data):
         issues_data = validated_data.pop('issues', [])
@@ -52,27 +126,23 @@ class ServiceSerializer(serializers.ModelSerializer):
         service.total_cost = self.calculate_service_cost(service, issues_data)
         service.save()
         service.issues.set(issues_data)
-        return service
+        return self.setup_eager_loading(Service.objects.all(), expand=self.sparse[1]).get(pk=service.pk)
 
     def calculate_service_cost(self, service, issue_data):
-        total_cost = 0
+        components = component_catalog.get_many(issue.component_id for issue in issue_data)
+        total_cost = Decimal(0)
         for issue in issue_data:
-            if issue.is_repair:
-                total_cost += issue.component.repair_price
-            else:
-                total_cost += issue.component.new_price
+            component = components.get(issue.component_id)
+            if component is None:
+                continue
+            total_cost += component.repair_price if issue.is_repair else component.new_price
 
         return total_cost
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['vehicle'] = VehicleSerializer(instance.vehicle).data
-        representation['issues'] = IssueSerializer(instance.issues.all(), many=True).data
-        return representation
-
 
-class InvoiceSerializer(serializers.ModelSerializer):
-    service = ServiceSerializer(read_only=True)
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    service = serializers.PrimaryKeyRelatedField(read_only=True)
+    expandable_fields = {'service': ServiceSerializer}
 
     class Meta:
         model = Invoice
@@ -80,13 +150,53 @@ class InvoiceSerializer(serializers.ModelSerializer):
         read_only_fields = ['invoice_number', 'issue_date', 'total_amount']
 
     def create(self, validated_data):
-        invoice_number = f"INV-{Invoice.objects.count() + 1:04d}"
         service = validated_data.get('service')
         total_amount = service.total_cost
 
-        invoice = Invoice.objects.create(
-            invoice_number=invoice_number,
-            total_amount=total_amount,
-            **validated_data
-        )
+        # Without GAPLESS the number is committed before the insert, so the
+        # counter lock is held only briefly but a failed insert burns a number.
+        invoice_number = None if settings.INVOICE_NUMBERING['GAPLESS'] else allocate_invoice_number()
+        try:
+            with transaction.atomic():
+                invoice = Invoice.objects.create(
+                    invoice_number=invoice_number or allocate_invoice_number(),
+                    total_amount=total_amount,
+                    **validated_data
+                )
+        except IntegrityError:
+            if Invoice.objects.filter(service=service).exists():
+                raise serializers.ValidationError({"service": ["This service already has an invoice."]})
+            raise
         return invoice
+
+
+class BulkMarkPaidSerializer(serializers.Serializer):
+    """Which invoices to mark paid; the given filters are combined."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    due_before = serializers.DateField(required=False)
+    services = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError("Give ids, due_before or services.")
+        return attrs
+
+    def filter_queryset(self, queryset):
+        if 'ids' in self.validated_data:
+            queryset = queryset.filter(id__in=self.validated_data['ids'])
+        if 'due_before' in self.validated_data:
+            queryset = queryset.filter(due_date__lt=self.validated_data['due_before'])
+        if 'services' in self.validated_data:
+            queryset = queryset.filter(service_id__in=self.validated_data['services'])
+        return queryset
+
+
+class RevenueDashboardQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    group_by = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("start must be on or before end")
+        return attrs
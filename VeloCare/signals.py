@@ -0,0 +1,54 @@
+from django.core.signals import request_started
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from User.models import CustomUser
+from .catalog import component_catalog
+from .models import Component, Vehicle, Issue, Service, Invoice, DailyRevenue, TableVersion
+
+# TableVersion names of the tables the conditional GET views depend on. The
+# component table is versioned by the catalog.
+VERSIONED_MODELS = {
+    Vehicle: "vehicle",
+    Issue: "issue",
+    Service: "service",
+    Invoice: "invoice",
+}
+
+
+@receiver(post_delete, sender=Service)
+def remove_service_revenue(sender, instance, **kwargs):
+    day, amount = getattr(instance, "_saved_revenue", None) or instance.revenue_entry()
+    DailyRevenue.objects.record(day, -amount, -1)
+
+
+@receiver(post_save, sender=Component)
+@receiver(post_delete, sender=Component)
+def bump_component_version(sender, **kwargs):
+    component_catalog.invalidate()
+
+
+def bump_model_version(sender, **kwargs):
+    TableVersion.objects.bump_on_commit(VERSIONED_MODELS[sender])
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model)
+    post_delete.connect(bump_model_version, sender=model)
+
+
+@receiver(m2m_changed, sender=Service.issues.through)
+def bump_service_issues_version(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        TableVersion.objects.bump_on_commit("service")
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def bump_user_version(sender, update_fields=None, **kwargs):
+    # Vehicle payloads show the owner's email; logins only touch last_login.
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    TableVersion.objects.bump_on_commit("user")
+
+
+request_started.connect(component_catalog.expire_check)
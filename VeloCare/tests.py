@@ -1,11 +1,1480 @@
-from django.test import TestCase
-from .models import Vehicle
+import csv
+import io
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import QuerySet
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from User.models import CustomUser
+from .models import (
+    Component, Vehicle, Issue, Service, Invoice, DailyRevenue, IdempotencyKey, InvoiceSequence, TableVersion,
+)
+from .catalog import ComponentCatalog, component_catalog
+from .conditional import response_cache
+from .numbering import allocate_invoice_number
+from .serializers import ComponentSerializer, InvoiceSerializer
+from User.auth.auth_serializer import OwnerTokenObtainPairSerializer
+from .views import AllIssueViewSet, ServiceViewSet
+from VeloService.metrics import MetricFile
+from VeloService.parsers import FastJSONParser
+from VeloService.renderers import FastJSONRenderer
+from VeloService.replicas import ReplicaMiddleware, ReplicaRouter, replica_alias, replica_set
+
+
+class ShopOwnerMixin:
+    """
+    Creates ``self.shop_owner`` in ``setUp``. The client is logged in with
+    ``force_authenticate``; with ``use_token`` requests authenticate like
+    real clients, with the access token in ``self.headers``.
+    """
+    use_token = False
+
+    def setUp(self):
+        super().setUp()
+        self.shop_owner = CustomUser.objects.create_user(email="shop@velo.test", password="pass", is_owner=True)
+        if self.use_token:
+            self.headers = self.token_headers(self.shop_owner)
+        else:
+            self.client.force_authenticate(self.shop_owner)
+
+    @staticmethod
+    def token_headers(user):
+        return {"Authorization": f"Bearer {OwnerTokenObtainPairSerializer.get_token(user).access_token}"}
 
 
 class VehicleTest(TestCase):
     def setUp(self):
-        Vehicle.objects.create(license_plate="RJ14QD3193", model="Royal Enfield Meteor 350")
+        owner = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        Vehicle.objects.create(owner=owner, license_plate="RJ14QD3193", model="Royal Enfield Meteor 350", make="Royal Enfield", year=2022)
 
     def test_model_creation(self):
         vehicle = Vehicle.objects.get(license_plate="RJ14QD3193")
         self.assertEqual(vehicle.model, "Royal Enfield Meteor 350")
+
+
+class CursorPaginationTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        component = Component.objects.create(name="Brake pad", new_price=500, repair_price=150)
+        self.vehicle = Vehicle.objects.create(owner=rider, make="Honda", license_plate="KA01AB1234", model="Shine", year=2020)
+        for i in range(7):
+            issue = Issue.objects.create(vehicle=self.vehicle, description=f"issue {i}", component=component)
+            service = Service.objects.create(vehicle=self.vehicle, total_cost=150)
+            service.issues.set([issue])
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row["id"] for row in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_services_are_walked_newest_first_without_gaps(self):
+        ids = self.walk("/api/v1/velocare/services/?page_size=3")
+        expected = list(Service.objects.order_by("-date", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_services_sharing_a_date_are_paged_without_offsets(self):
+        Service.objects.update(date=timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            ids = self.walk("/api/v1/velocare/services/?page_size=2")
+        self.assertEqual(ids, list(Service.objects.order_by("-id").values_list("id", flat=True)))
+        self.assertFalse([query["sql"] for query in queries if "OFFSET" in query["sql"]])
+
+    def test_page_size_is_capped_by_viewset_limit(self):
+        with mock.patch.object(AllIssueViewSet, "max_page_size", 4):
+            response = self.client.get("/api/v1/velocare/all_issues/?page_size=10000")
+        self.assertEqual(len(response.data["results"]), 4)
+        with mock.patch.object(AllIssueViewSet, "max_page_size", None):
+            response = self.client.get("/api/v1/velocare/all_issues/?page_size=2")
+        self.assertEqual(len(response.data["results"]), 7)
+
+    def test_user_list_is_paginated(self):
+        response = self.client.get("/api/v1/user/")
+        self.assertEqual([row["email"] for row in response.data["results"]], ["rider@velo.test"])
+
+
+class ListQueryCountTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.component = Component.objects.create(name="Chain", new_price=900, repair_price=200)
+
+    def seed(self, count):
+        for i in range(count):
+            rider = CustomUser.objects.create_user(email=f"rider{i}-{Vehicle.objects.count()}@velo.test", password="pass", is_user=True)
+            vehicle = Vehicle.objects.create(owner=rider, make="Bajaj", license_plate=f"MH12{i:04d}", model="Pulsar", year=2019)
+            issues = [Issue.objects.create(vehicle=vehicle, description="noise", component=self.component) for _ in range(3)]
+            service = Service.objects.create(vehicle=vehicle, total_cost=600)
+            service.issues.set(issues)
+            Invoice.objects.create(service=service, invoice_number=f"T-{service.id}", total_amount=600)
+
+    def test_service_list_query_count_does_not_grow_with_rows(self):
+        self.seed(2)
+        url = "/api/v1/velocare/services/?expand=vehicle,issues"
+        self.client.get(url)  # warms the component catalog
+        with self.assertNumQueries(4):
+            self.client.get(url)
+        self.seed(8)
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(len(response.data["results"][0]["issues"]), 3)
+        self.assertEqual(response.data["results"][0]["issues"][0]["component_name"], "Chain")
+
+    def test_invoice_list_query_count(self):
+        self.seed(1)
+        service = Service.objects.get()
+        # Outside a request the catalog trusts the last check of this thread.
+        component_catalog.clear()
+        component_catalog.get(self.component.id)
+        # Versions, invoices with service and vehicle, issues, catalog check.
+        with self.assertNumQueries(4):
+            response = self.client.get(f"/api/v1/velocare/services/{service.id}/invoices/?expand=service.vehicle,service.issues")
+        self.assertEqual(response.data[0]["service"]["vehicle"]["owner_email"], service.vehicle.owner.email)
+
+    def test_issue_list_query_count(self):
+        self.seed(5)
+        component_catalog.clear()
+        with self.assertNumQueries(4):
+            self.client.get("/api/v1/velocare/all_issues/")
+        with self.assertNumQueries(3):
+            self.client.get("/api/v1/velocare/all_issues/")
+
+
+class SparseFieldsTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        self.vehicle = Vehicle.objects.create(owner=rider, make="Hero", license_plate="DL3SAB1234", model="Splendor", year=2018)
+        self.component = Component.objects.create(name="Clutch cable", new_price=300, repair_price=80)
+        self.issue = Issue.objects.create(vehicle=self.vehicle, description="clutch slipping", component=self.component)
+        self.service = Service.objects.create(vehicle=self.vehicle, total_cost=80)
+        self.service.issues.set([self.issue])
+        self.invoice = Invoice.objects.create(service=self.service, invoice_number="T-1", total_amount=80)
+        self.invoices_url = f"/api/v1/velocare/services/{self.service.id}/invoices/"
+
+    def test_relations_are_ids_by_default(self):
+        invoice = self.client.get(self.invoices_url).data[0]
+        self.assertEqual(invoice["service"], self.service.id)
+        service = self.client.get("/api/v1/velocare/services/").data["results"][0]
+        self.assertEqual((service["vehicle"], service["issues"]), (self.vehicle.id, [self.issue.id]))
+        issue = self.client.get("/api/v1/velocare/all_issues/").data["results"][0]
+        self.assertEqual((issue["vehicle"], issue["component"]), (self.vehicle.id, self.component.id))
+
+    def test_nested_expansion(self):
+        invoice = self.client.get(self.invoices_url, {"expand": "service.vehicle,service.issues.component"}).data[0]
+        self.assertEqual(invoice["service"]["vehicle"]["license_plate"], "DL3SAB1234")
+        self.assertEqual(invoice["service"]["issues"][0]["vehicle"], self.vehicle.id)
+        self.assertEqual(invoice["service"]["issues"][0]["component"]["name"], "Clutch cable")
+
+    def test_fields_limit_payload_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.invoices_url, {
+                "fields": "id,total_amount,service.id,service.vehicle.license_plate",
+                "expand": "service.vehicle",
+            })
+        self.assertEqual(response.data[0], {
+            "id": self.invoice.id,
+            "total_amount": "80.00",
+            "service": {"id": self.service.id, "vehicle": {"license_plate": "DL3SAB1234"}},
+        })
+        # The TableVersion lookup, then the invoices.
+        self.assertEqual(len(queries), 2)
+        select = queries[1]["sql"].split(" FROM ")[0]
+        self.assertIn('"VeloCare_vehicle"."license_plate"', select)
+        for column in ('"VeloCare_invoice"."due_date"', '"VeloCare_service"."total_cost"', '"VeloCare_vehicle"."make"'):
+            self.assertNotIn(column, select)
+
+    def test_unrequested_relations_are_not_loaded(self):
+        component_catalog.clear()
+        # The validators and the page; no issue prefetch and no catalog lookup.
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/v1/velocare/services/", {"fields": "id,total_cost"})
+        self.assertEqual(response.data["results"], [{"id": self.service.id, "total_cost": "80.00"}])
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/v1/velocare/all_issues/", {"fields": "id,description"})
+        self.assertEqual(response.data["results"], [{"id": self.issue.id, "description": "clutch slipping"}])
+
+    def test_writes_still_accept_ids(self):
+        response = self.client.post(
+            "/api/v1/velocare/services/?expand=vehicle",
+            {"vehicle": self.vehicle.id, "issues": [self.issue.id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["vehicle"]["make"], "Hero")
+        self.assertEqual(response.data["issues"], [self.issue.id])
+        response = self.client.patch(
+            f"/api/v1/velocare/vehicles/{self.vehicle.id}/?fields=id,model", {"model": "Splendor Plus"}, format="json"
+        )
+        self.assertEqual(response.data, {"id": self.vehicle.id, "model": "Splendor Plus"})
+        self.vehicle.refresh_from_db()
+        self.assertEqual((self.vehicle.model, self.vehicle.make), ("Splendor Plus", "Hero"))
+
+
+class RequestTimingTest(ShopOwnerMixin, APITestCase):
+    use_token = True
+
+    def setUp(self):
+        super().setUp()
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        vehicle = Vehicle.objects.create(owner=rider, make="TVS", license_plate="TN09AP1234", model="Apache", year=2021)
+        service = Service.objects.create(vehicle=vehicle, total_cost=0)
+        service.issues.set([Issue.objects.create(vehicle=vehicle, description="chain slack")])
+
+    def timings(self, response):
+        return {metric.split(";")[0]: metric for metric in response["Server-Timing"].split(", ")}
+
+    def test_disabled_by_default(self):
+        response = self.client.get("/api/v1/velocare/services/", headers=self.headers)
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(REQUEST_TIMING=True, SLOW_REQUEST_MS=60_000)
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/velocare/services/?expand=issues", headers=self.headers)
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {"db", "auth", "serialize", "view"})
+        self.assertIn(f'desc="{len(queries)} queries"', timings["db"])
+
+    @override_settings(REQUEST_TIMING=True, SLOW_REQUEST_MS=0, SLOW_REQUEST_STATEMENTS=2)
+    def test_slow_requests_are_logged_with_their_worst_statements(self):
+        with self.assertLogs("velo.requests", "WARNING") as logs:
+            self.client.get("/api/v1/velocare/services/", headers=self.headers)
+        record = logs.records[0].timing
+        self.assertEqual((record["route"], record["status"]), ("services-list", 200))
+        self.assertEqual(len(record["statements"]), 2)
+        self.assertGreaterEqual(record["statements"][0]["ms"], record["statements"][1]["ms"])
+        self.assertIn("SELECT", record["statements"][0]["sql"])
+
+    @override_settings(REQUEST_TIMING=True, SLOW_REQUEST_MS=60_000)
+    async def test_async_views_are_measured(self):
+        response = await self.async_client.get("/api/v1/velocare/async/services/", headers=self.headers)
+        timings = self.timings(response)
+        self.assertNotIn('desc="0 queries"', timings["db"])
+        self.assertIn("auth", timings)
+
+
+@override_settings(RESPONSE_CACHE=True)
+class ResponseCacheTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        response_cache.clear()
+        super().setUp()
+        self.rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vehicle = Vehicle.objects.create(owner=self.rider, make="Bajaj", license_plate="KA01AB1234", model="Pulsar", year=2019)
+            Issue.objects.create(vehicle=self.vehicle, description="chain slack")
+
+    def test_repeated_reads_skip_queries_and_serializers(self):
+        url = "/api/v1/velocare/all_issues/"
+        first = self.client.get(url, {"expand": "vehicle", "fields": "id,vehicle"})
+        hits = response_cache.hits
+        # Only the TableVersion lookup; the parameters may come in any order.
+        with self.assertNumQueries(1):
+            second = self.client.get(url, {"fields": "id,vehicle", "expand": "vehicle"})
+        self.assertEqual(response_cache.hits, hits + 1)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(json.loads(second.content)["results"][0]["vehicle"]["license_plate"], "KA01AB1234")
+
+    def test_writes_move_readers_to_new_entries(self):
+        url = f"/api/v1/velocare/vehicles/{self.vehicle.id}/"
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {"model": "Pulsar NS"})
+        misses = response_cache.misses
+        self.assertEqual(self.client.get(url).json()["model"], "Pulsar NS")
+        self.assertEqual(response_cache.misses, misses + 1)
+
+        url = "/api/v1/velocare/services/"
+        self.assertEqual(self.client.get(url).json()["results"], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {"vehicle": self.vehicle.id, "issues": [Issue.objects.get().id]})
+        self.assertEqual(len(self.client.get(url).json()["results"]), 1)
+
+    def test_entries_are_scoped_to_the_role(self):
+        url = "/api/v1/velocare/vehicles/"
+        self.client.get(url)
+        self.client.force_authenticate(CustomUser.objects.create_user(email="shop2@velo.test", password="pass", is_owner=True))
+        hits = response_cache.hits
+        self.client.get(url)
+        self.assertEqual(response_cache.hits, hits + 1)
+
+        view = AllIssueViewSet()
+        request = mock.Mock(path="/api/v1/velocare/all_issues/", GET=QueryDict("expand=vehicle"))
+        request.build_absolute_uri.side_effect = lambda path: f"http://testserver{path}"
+        keys = set()
+        for user in (self.shop_owner, self.rider, CustomUser.objects.create_user(email="r2@velo.test", password="pass")):
+            request.user = user
+            keys.add(view.get_cache_key(request, 'W/"1"'))
+        self.assertEqual(len(keys), 3)
+
+    def test_hit_ratio_is_reported(self):
+        self.client.get("/api/v1/velocare/vehicles/")
+        self.client.get("/api/v1/velocare/vehicles/")
+        stats = self.client.get("/").json()["response_cache"]
+        self.assertEqual((stats["enabled"], stats["backend"]), (True, "locmem"))
+        self.assertGreater(stats["hit_ratio"], 0)
+
+    @override_settings(RESPONSE_CACHE=False)
+    def test_disabled_by_default(self):
+        self.client.get("/api/v1/velocare/vehicles/")
+        with self.assertNumQueries(2):
+            self.client.get("/api/v1/velocare/vehicles/")
+
+
+class ReceivablesTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        vehicle = Vehicle.objects.create(owner=rider, make="TVS", license_plate="TN09R1", model="Apache", year=2021)
+        today = timezone.localdate()
+        # Days past due and amount of each invoice; negative is not due yet.
+        for i, (overdue, amount, paid) in enumerate([
+            (-10, 100, False), (30, 50, False), (31, 20, False), (75, 10, False), (91, 5, False), (400, 1, False),
+            (200, 999, True),
+        ]):
+            service = Service.objects.create(vehicle=vehicle, total_cost=amount)
+            Invoice.objects.create(
+                service=service, invoice_number=f"AR-{i}", total_amount=amount, paid=paid,
+                due_date=today - timedelta(days=overdue),
+            )
+
+    def test_aging_buckets_and_totals(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/velocare/receivables/")
+        self.assertEqual(len(queries), 3)
+        aging = response.data["aging"]
+        self.assertEqual((aging["count"], aging["total"]), (6, Decimal("186.00")))
+        self.assertEqual(
+            [(bucket["days"], bucket["count"], bucket["total"]) for bucket in aging["buckets"]],
+            [("0-30", 2, Decimal("150.00")), ("31-60", 1, Decimal("20.00")), ("61-90", 1, Decimal("10.00")),
+             ("90+", 2, Decimal("6.00"))],
+        )
+
+    def test_unpaid_invoices_are_paged_longest_overdue_first(self):
+        response = self.client.get("/api/v1/velocare/receivables/?page_size=4&expand=service.vehicle")
+        self.assertEqual([row["invoice_number"] for row in response.data["results"]], ["AR-5", "AR-4", "AR-3", "AR-2"])
+        self.assertEqual(response.data["results"][0]["service"]["vehicle"]["license_plate"], "TN09R1")
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual([row["invoice_number"] for row in response.data["results"]], ["AR-1", "AR-0"])
+        self.assertEqual(response.data["aging"]["count"], 6)
+
+    def test_invoices_sharing_a_due_date_are_paged_by_id(self):
+        Invoice.objects.update(due_date=timezone.localdate())
+        url, numbers = "/api/v1/velocare/receivables/?page_size=2", []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = self.client.get(url)
+                numbers.extend(row["invoice_number"] for row in response.data["results"])
+                url = response.data["next"]
+        self.assertEqual(numbers, [f"AR-{i}" for i in range(6)])
+        self.assertFalse([query["sql"] for query in queries if "OFFSET" in query["sql"]])
+
+        response = self.client.get(response.data["previous"])
+        self.assertEqual([row["invoice_number"] for row in response.data["results"]], ["AR-2", "AR-3"])
+
+    def test_created_invoices_fall_due_15_days_after_their_day(self):
+        Invoice.objects.all().delete()
+        vehicle = Vehicle.objects.get()
+        today = timezone.localdate()
+        for days_ago in (0, 60, 100):
+            service = Service.objects.create(vehicle=vehicle, total_cost=days_ago + 1)
+            with mock.patch("django.utils.timezone.localdate", return_value=today - timedelta(days=days_ago)):
+                response = self.client.post(f"/api/v1/velocare/services/{service.id}/invoices/", {}, format="json")
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.data["due_date"], (today - timedelta(days=days_ago - 15)).isoformat())
+
+        aging = self.client.get("/api/v1/velocare/receivables/").data["aging"]
+        self.assertEqual(
+            [(bucket["days"], bucket["count"]) for bucket in aging["buckets"]],
+            [("0-30", 1), ("31-60", 1), ("61-90", 1), ("90+", 0)],
+        )
+
+    def test_shop_owners_only(self):
+        self.client.force_authenticate(CustomUser.objects.get(email="rider@velo.test"))
+        self.assertEqual(self.client.get("/api/v1/velocare/receivables/").status_code, 403)
+
+
+class BulkMarkPaidTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        vehicle = Vehicle.objects.create(owner=rider, make="TVS", license_plate="TN09R1", model="Apache", year=2021)
+        self.services = [Service.objects.create(vehicle=vehicle, total_cost=10) for _ in range(4)]
+        today = timezone.localdate()
+        self.invoices = [
+            Invoice.objects.create(
+                service=self.services[i], invoice_number=f"BP-{i}", total_amount=10, paid=i == 3,
+                due_date=today + timedelta(days=i * 10),
+            )
+            for i in range(4)
+        ]
+
+    def paid_numbers(self):
+        return sorted(Invoice.objects.filter(paid=True).values_list("invoice_number", flat=True))
+
+    def test_one_update_returns_the_invoices_it_paid(self):
+        ids = [invoice.id for invoice in self.invoices]
+        version = TableVersion.objects.current("invoice")
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/v1/velocare/invoices/mark_as_paid/", {"ids": ids}, format="json")
+        self.assertEqual(response.data, {"updated": 3, "ids": ids[:3]})
+        updates = [query["sql"] for query in queries if query["sql"].startswith('UPDATE "VeloCare_invoice"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.paid_numbers(), ["BP-0", "BP-1", "BP-2", "BP-3"])
+        self.assertEqual(TableVersion.objects.current("invoice"), version + 1)
+
+    def test_filters_are_combined(self):
+        due_before = (timezone.localdate() + timedelta(days=15)).isoformat()
+        response = self.client.post(
+            "/api/v1/velocare/invoices/mark_as_paid/",
+            {"due_before": due_before, "services": [service.id for service in self.services[1:]]}, format="json",
+        )
+        self.assertEqual(response.data["ids"], [self.invoices[1].id])
+
+        response = self.client.post(
+            f"/api/v1/velocare/services/{self.services[2].id}/invoices/mark_as_paid/",
+            {"ids": [invoice.id for invoice in self.invoices]}, format="json",
+        )
+        self.assertEqual(response.data["ids"], [self.invoices[2].id])
+        self.assertEqual(self.paid_numbers(), ["BP-1", "BP-2", "BP-3"])
+
+    def test_filters_through_joins(self):
+        response = self.client.post(
+            f"/api/v1/velocare/services/{self.services[0].id}/invoices/mark_as_paid/",
+            {"services": [self.services[0].id, self.services[1].id]}, format="json",
+        )
+        self.assertEqual(response.data["ids"], [self.invoices[0].id])
+
+        rider = CustomUser.objects.get(email="rider@velo.test")
+        with CaptureQueriesContext(connection) as queries:
+            ids = Invoice.objects.mark_paid(
+                Invoice.objects.filter(service__vehicle__owner=rider, due_date__gt=timezone.localdate())
+            )
+        self.assertEqual(ids, [self.invoices[1].id, self.invoices[2].id])
+        # Only the invoices are locked, not the services and vehicles joined in.
+        self.assertTrue(any('FOR UPDATE OF "VeloCare_invoice"' in query["sql"] for query in queries))
+        self.assertEqual(self.paid_numbers(), ["BP-0", "BP-1", "BP-2", "BP-3"])
+
+    def test_needs_a_selection_and_a_shop_owner(self):
+        response = self.client.post("/api/v1/velocare/invoices/mark_as_paid/", {}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/v1/velocare/invoices/mark_as_paid/", {"ids": ["x"]}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(CustomUser.objects.get(email="rider@velo.test"))
+        response = self.client.post("/api/v1/velocare/invoices/mark_as_paid/", {"ids": [1]}, format="json")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.paid_numbers(), ["BP-3"])
+
+
+class FastJSONTest(ShopOwnerMixin, APITestCase):
+    payload = {
+        "total_cost": Decimal("1234.50"),
+        "date": datetime(2024, 9, 1, 10, 30, 15, 120000, tzinfo=dt_timezone.utc),
+        "local": datetime(2024, 9, 1, 10, 30),
+        "due_date": date(2024, 9, 16),
+        "opens": time(9, 0),
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "label": gettext_lazy("Brake pad"),
+        "text": "café \u2028 line\u2029 \x00\n\"quoted\" 😀",
+        "nested": [{"paid": False, "amount": 0.25, "none": None}, (1, 2)],
+    }
+
+    def assertSameOutput(self, data, media_type=None):
+        self.assertEqual(FastJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+
+    def test_output_is_byte_identical(self):
+        self.assertSameOutput(self.payload)
+        self.assertSameOutput([self.payload, Service.objects.none()])
+        self.assertSameOutput(None)
+
+    def test_falls_back_for_what_orjson_refuses(self):
+        self.assertSameOutput({"big": 2 ** 70, 1: "int key"})
+        self.assertSameOutput(self.payload, "application/json; indent=4")
+        with mock.patch("VeloService.renderers.orjson", None):
+            self.assertSameOutput(self.payload)
+
+    def test_non_finite_floats_are_refused(self):
+        for value in (float("nan"), float("inf"), -float("inf")):
+            data = {"nested": [{"amount": value}]}
+            with self.assertRaises(ValueError) as expected:
+                JSONRenderer().render(data)
+            with self.assertRaises(ValueError) as fast:
+                FastJSONRenderer().render(data)
+            self.assertEqual(str(fast.exception), str(expected.exception))
+        self.assertSameOutput({"amount": 1.5, "none": None})
+
+    def test_api_responses_match_the_stdlib_renderer(self):
+        vehicle = Vehicle.objects.create(owner=self.shop_owner, make="TVS", license_plate="TN09J1", model="Apache", year=2021)
+        Service.objects.create(vehicle=vehicle, total_cost=Decimal("99.90")).issues.set(
+            [Issue.objects.create(vehicle=vehicle, description="chain \u2028 slack")]
+        )
+        response = self.client.get("/api/v1/velocare/services/?expand=vehicle,issues")
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_parser_matches_the_stdlib_parser(self):
+        def parse(parser, body):
+            return parser.parse(io.BytesIO(body), parser_context={"encoding": "utf-8"})
+
+        for body in (JSONRenderer().render(self.payload), b'{"a": 1, "a": 2}', b"[1e400, 123456789012345678901234567890]"):
+            self.assertEqual(parse(FastJSONParser(), body), parse(JSONParser(), body))
+        for body in (b'{"a": NaN}', b"{", b"\xff"):
+            with self.assertRaises(ParseError) as expected:
+                parse(JSONParser(), body)
+            with self.assertRaises(ParseError) as fast:
+                parse(FastJSONParser(), body)
+            self.assertEqual(str(fast.exception), str(expected.exception))
+
+
+class MetricsTest(ShopOwnerMixin, APITestCase):
+    use_token = True
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def scrape(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return dict(line.rsplit(" ", 1) for line in response.content.decode().splitlines() if not line.startswith("#"))
+
+    def test_requests_are_counted_and_timed_by_route(self):
+        self.client.get("/api/v1/velocare/services/", headers=self.headers)
+        self.client.get("/api/v1/velocare/services/", headers=self.headers)
+        self.client.get("/api/v1/velocare/services/999/", headers=self.headers)
+        self.client.get("/no-such-page/")
+        samples = self.scrape()
+
+        route = 'route="services-list",method="GET"'
+        self.assertEqual(samples[f'velo_http_requests_total{{{route},status="200"}}'], "2")
+        self.assertEqual(samples[f'velo_http_request_duration_seconds_bucket{{{route},le="+Inf"}}'], "2")
+        self.assertEqual(samples[f"velo_http_request_duration_seconds_count{{{route}}}"], "2")
+        self.assertGreater(float(samples[f"velo_http_request_duration_seconds_sum{{{route}}}"]), 0)
+        self.assertEqual(samples['velo_http_requests_total{route="services-detail",method="GET",status="404"}'], "1")
+        self.assertEqual(samples['velo_http_requests_total{route="unmatched",method="GET",status="404"}'], "1")
+        # The scrape itself is in flight.
+        self.assertEqual(samples["velo_http_requests_in_flight"], "1")
+        self.assertIn("velo_component_catalog_entries", samples)
+
+    def test_files_of_all_worker_processes_are_added_up(self):
+        self.client.get("/api/v1/velocare/services/", headers=self.headers)
+        finished = subprocess.Popen(["true"])
+        finished.wait()
+        key = 'velo_http_requests_total{route="services-list",method="GET",status="200"}'
+        MetricFile(os.path.join(self.directory, f"counter_{finished.pid}.db")).add(key, 5)
+        MetricFile(os.path.join(self.directory, f"live_{finished.pid}.db")).add("velo_http_requests_in_flight", 3)
+
+        samples = self.scrape()
+        # Counters outlive their worker, its gauges do not.
+        self.assertEqual(samples[key], "6")
+        self.assertEqual(samples["velo_http_requests_in_flight"], "1")
+
+    def test_readiness_checks_the_database(self):
+        response = self.client.get("/ready/")
+        self.assertEqual((response.status_code, response.json()["status"]), (200, "Ready"))
+        with mock.patch("django.db.backends.utils.CursorWrapper.execute", side_effect=OperationalError("down")):
+            response = self.client.get("/ready/")
+        self.assertEqual((response.status_code, response.json()["database"]), (503, "down"))
+
+    def test_readiness_does_not_wait_on_a_saturated_pool(self):
+        saturated = {"default": {"saturation": 1.0}}
+        with mock.patch("VeloCare.views.pool_stats", return_value=saturated), \
+                mock.patch("django.db.backends.utils.CursorWrapper.execute") as execute:
+            response = self.client.get("/ready/")
+        self.assertEqual((response.status_code, response.json()["database"]), (503, "default pool is saturated"))
+        execute.assert_not_called()
+
+    def test_cache_hits_and_misses_are_counters(self):
+        self.client.get("/api/v1/velocare/components/", headers=self.headers)
+        response = self.client.get("/metrics")
+        lines = response.content.decode().splitlines()
+        self.assertIn("# TYPE velo_component_catalog_misses_total counter", lines)
+        self.assertIn("# TYPE velo_response_cache_hits_total counter", lines)
+        # Kept in the counter file, so they outlive the worker.
+        with open(os.path.join(self.directory, f"counter_{os.getpid()}.db"), "rb") as metric_file:
+            self.assertIn(b"velo_component_catalog_misses_total", metric_file.read())
+
+
+class RevenueRollupTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        self.vehicle = Vehicle.objects.create(owner=rider, make="TVS", license_plate="TN09X1", model="Apache", year=2021)
+        self.today = timezone.localdate()
+
+    def revenue(self, day):
+        return DailyRevenue.objects.filter(day=day).values_list("total", "service_count").first()
+
+    def test_rollup_follows_service_writes(self):
+        service = Service.objects.create(vehicle=self.vehicle, total_cost=100)
+        Service.objects.create(vehicle=self.vehicle, total_cost=50)
+        self.assertEqual(self.revenue(self.today), (Decimal("150.00"), 2))
+
+        service = Service.objects.get(pk=service.pk)
+        service.total_cost = 300
+        service.save()
+        self.assertEqual(self.revenue(self.today), (Decimal("350.00"), 2))
+
+        yesterday = timezone.now() - timedelta(days=1)
+        service.date = yesterday
+        service.save()
+        self.assertEqual(self.revenue(self.today), (Decimal("50.00"), 1))
+        self.assertEqual(self.revenue(yesterday.date()), (Decimal("300.00"), 1))
+
+        self.vehicle.delete()
+        self.assertEqual(self.revenue(self.today), (Decimal("0.00"), 0))
+        self.assertEqual(self.revenue(yesterday.date()), (Decimal("0.00"), 0))
+
+    def test_rebuild_command_matches_history(self):
+        Service.objects.create(vehicle=self.vehicle, total_cost=80)
+        Service.objects.create(vehicle=self.vehicle, total_cost=20)
+        Service.objects.update(total_cost=10)
+        call_command("rebuild_revenue_rollup", stdout=mock.Mock())
+        self.assertEqual(self.revenue(self.today), (Decimal("20.00"), 2))
+
+    def test_dashboard_reads_totals_and_grouped_series(self):
+        Service.objects.create(vehicle=self.vehicle, total_cost=100)
+        old = Service.objects.create(vehicle=self.vehicle, total_cost=40)
+        old.date = timezone.now() - timedelta(days=40)
+        old.save()
+
+        start = self.today - timedelta(days=60)
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/v1/velocare/services/revenue_dashboard/?start={start}&group_by=month")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["daily_revenue"], Decimal("100.00"))
+        self.assertEqual(sum(row["revenue"] for row in response.data["series"]), Decimal("140.00"))
+
+        response = self.client.get("/api/v1/velocare/services/revenue_dashboard/?group_by=year")
+        self.assertEqual(response.status_code, 400)
+
+
+class InvoiceNumberTest(TestCase):
+    def test_numbers_are_sequential_per_prefix(self):
+        self.assertEqual(allocate_invoice_number(), "INV-0001")
+        self.assertEqual(allocate_invoice_number(), "INV-0002")
+        with override_settings(INVOICE_NUMBERING={"PREFIX": "{shop}-{year}-", "SHOP_CODE": "BLR", "PADDING": 5, "GAPLESS": True}):
+            self.assertEqual(allocate_invoice_number(on=date(2026, 3, 1)), "BLR-2026-00001")
+            self.assertEqual(allocate_invoice_number(on=date(2027, 1, 1)), "BLR-2027-00001")
+            self.assertEqual(allocate_invoice_number(shop="PNQ", on=date(2027, 1, 1)), "PNQ-2027-00001")
+        self.assertEqual(allocate_invoice_number(), "INV-0003")
+
+    def test_rolled_back_number_is_reused(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            allocate_invoice_number()
+            raise RuntimeError
+        self.assertEqual(allocate_invoice_number(), "INV-0001")
+
+
+class ConcurrentInvoiceNumberTest(TransactionTestCase):
+    threads = 8
+    invoices_per_thread = 5
+
+    def setUp(self):
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        vehicle = Vehicle.objects.create(owner=rider, make="Hero", license_plate="DL3C0001", model="Splendor", year=2018)
+        self.services = [
+            Service.objects.create(vehicle=vehicle, total_cost=100)
+            for _ in range(self.threads * self.invoices_per_thread)
+        ]
+
+    def create_invoices(self, services, errors):
+        try:
+            for service in services:
+                serializer = InvoiceSerializer(data={})
+                serializer.is_valid(raise_exception=True)
+                serializer.save(service=service)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_concurrent_creation_never_duplicates_numbers(self):
+        errors = []
+        step = self.invoices_per_thread
+        workers = [
+            threading.Thread(target=self.create_invoices, args=(self.services[i * step:(i + 1) * step], errors))
+            for i in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        total = self.threads * self.invoices_per_thread
+        numbers = sorted(Invoice.objects.values_list("invoice_number", flat=True))
+        self.assertEqual(numbers, [f"INV-{i:04d}" for i in range(1, total + 1)])
+        self.assertEqual(InvoiceSequence.objects.get(prefix="INV-").last_value, total)
+
+
+class ServiceCreationTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        self.vehicle = Vehicle.objects.create(owner=rider, make="Yamaha", license_plate="GJ01R15", model="R15", year=2023)
+        self.clutch = Component.objects.create(name="Clutch plate", new_price=1200, repair_price=300)
+
+    def create_issues(self, count):
+        return [
+            Issue.objects.create(vehicle=self.vehicle, description=f"issue {i}", component=self.clutch, is_repair=i % 2 == 0).id
+            for i in range(count)
+        ]
+
+    def test_issue_resolution_and_pricing_use_constant_queries(self):
+        few, many = self.create_issues(2), self.create_issues(20)
+        Service.objects.create(vehicle=self.vehicle, total_cost=0)  # creates today's rollup row
+        component_catalog.get(self.clutch.id)
+        with self.assertNumQueries(12):
+            response = self.client.post("/api/v1/velocare/services/", {"vehicle": self.vehicle.id, "issues": few}, format="json")
+        self.assertEqual(response.data["total_cost"], "1500.00")
+        with self.assertNumQueries(12):
+            response = self.client.post("/api/v1/velocare/services/", {"vehicle": self.vehicle.id, "issues": many}, format="json")
+        self.assertEqual(response.data["total_cost"], "15000.00")
+        self.assertEqual(len(response.data["issues"]), 20)
+
+    def test_unknown_issue_is_rejected(self):
+        response = self.client.post("/api/v1/velocare/services/", {"vehicle": self.vehicle.id, "issues": [self.create_issues(1)[0], 999999]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("999999", str(response.data["issues"]))
+        response = self.client.post("/api/v1/velocare/services/", {"vehicle": self.vehicle.id, "issues": ["x"]}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class IdempotencyKeyTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        self.vehicle = Vehicle.objects.create(owner=rider, make="Yamaha", license_plate="GJ01R15", model="R15", year=2023)
+
+    def create_service(self, key, **data):
+        return self.client.post(
+            "/api/v1/velocare/services/", {"vehicle": self.vehicle.id, "issues": [], **data}, format="json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.create_service("retry-1")
+        self.assertEqual(first.status_code, 201)
+        retry = self.create_service("retry-1")
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertEqual(Service.objects.count(), 1)
+
+        self.assertEqual(self.create_service("retry-2").status_code, 201)
+        self.assertEqual(Service.objects.count(), 2)
+
+    def test_reused_key_and_failed_requests(self):
+        self.assertEqual(self.create_service("key", vehicle=999999).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.create_service("key").status_code, 201)
+        self.assertEqual(self.create_service("key", issues=[999999]).status_code, 422)
+        self.assertEqual(Service.objects.count(), 1)
+
+    def test_expired_keys_run_again(self):
+        self.create_service("old")
+        with override_settings(IDEMPOTENCY_KEY_TTL=-1):
+            self.assertNotIn("Idempotent-Replayed", self.create_service("old"))
+            call_command("purge_idempotency_keys", stdout=io.StringIO())
+        self.assertEqual(Service.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_second_invoice_for_a_service_is_a_400(self):
+        service = Service.objects.create(vehicle=self.vehicle, total_cost=100)
+        url = f"/api/v1/velocare/services/{service.id}/invoices/"
+        first = self.client.post(url, {}, format="json", headers={"Idempotency-Key": "invoice"})
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(self.client.post(url, {}, format="json", headers={"Idempotency-Key": "invoice"}).data, first.data)
+        response = self.client.post(url, {}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("service", response.data)
+
+
+class ConcurrentIdempotencyKeyTest(TransactionTestCase):
+    threads = 6
+
+    def setUp(self):
+        self.shop_owner = CustomUser.objects.create_user(email="shop@velo.test", password="pass", is_owner=True)
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        self.vehicle = Vehicle.objects.create(owner=rider, make="Hero", license_plate="DL3C0001", model="Splendor", year=2018)
+
+    def create_service(self, start, responses):
+        client = APIClient()
+        client.force_authenticate(self.shop_owner)
+        try:
+            start.wait()
+            responses.append(client.post(
+                "/api/v1/velocare/services/", {"vehicle": self.vehicle.id, "issues": []}, format="json",
+                headers={"Idempotency-Key": "concurrent"},
+            ))
+        finally:
+            connection.close()
+
+    def test_concurrent_duplicates_create_once(self):
+        start, responses = threading.Barrier(self.threads), []
+        workers = [threading.Thread(target=self.create_service, args=(start, responses)) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(Service.objects.count(), 1)
+        self.assertEqual({(response.status_code, response.data["id"]) for response in responses}, {(201, Service.objects.get().id)})
+        self.assertEqual(sum("Idempotent-Replayed" in response for response in responses), self.threads - 1)
+
+
+class ComponentCatalogTest(TestCase):
+    def setUp(self):
+        self.catalog = ComponentCatalog(max_size=2)
+        self.components = [Component.objects.create(name=f"Part {i}", new_price=10, repair_price=5) for i in range(3)]
+
+    def test_hits_misses_and_size_limit(self):
+        ids = [component.id for component in self.components]
+        self.assertEqual(set(self.catalog.get_many(ids[:2])), set(ids[:2]))
+        self.catalog.expire_check()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.catalog.get(ids[0]).name, "Part 0")
+        self.assertEqual(self.catalog.get(ids[2]).name, "Part 2")
+        self.assertEqual(self.catalog.stats()["size"], 2)
+        self.assertEqual((self.catalog.hits, self.catalog.misses), (1, 3))
+
+    def test_component_write_invalidates_other_workers(self):
+        component = self.components[0]
+        self.assertEqual(self.catalog.get(component.id).repair_price, 5)
+        component.repair_price = 7
+        component.save()
+        self.assertEqual(self.catalog.get(component.id).repair_price, 5)
+        self.catalog.expire_check()  # next request in this worker
+        self.assertEqual(self.catalog.get(component.id).repair_price, 7)
+
+    def test_checks_expire_outside_requests(self):
+        component = self.components[0]
+        self.assertEqual(self.catalog.get(component.id).repair_price, 5)
+        Component.objects.filter(pk=component.pk).update(repair_price=7)
+        TableVersion.objects.bump(self.catalog.table)
+        with mock.patch("VeloCare.catalog.time.monotonic", return_value=float("inf")):  # long after the check
+            self.assertEqual(self.catalog.get(component.id).repair_price, 7)
+
+        Component.objects.filter(pk=component.pk).update(repair_price=9)
+        TableVersion.objects.bump(self.catalog.table)
+        with self.catalog.scope():
+            self.assertEqual(self.catalog.get(component.id).repair_price, 9)
+
+
+class AsyncReadViewTest(ShopOwnerMixin, TestCase):
+    use_token = True
+
+    def setUp(self):
+        super().setUp()
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        self.vehicle = Vehicle.objects.create(owner=rider, make="KTM", license_plate="KA05DK390", model="Duke", year=2022)
+        component = Component.objects.create(name="Spark plug", new_price=250, repair_price=50)
+        for i in range(3):
+            issue = Issue.objects.create(vehicle=self.vehicle, description=f"misfire {i}", component=component)
+            service = Service.objects.create(vehicle=self.vehicle, total_cost=50)
+            service.issues.set([issue])
+
+    async def test_async_reads_match_sync_views(self):
+        for path in [
+            "components/",
+            "vehicles/?page_size=1",
+            "vehicles/?search=390",
+            f"vehicles/{self.vehicle.id}/",
+            f"vehicles/{self.vehicle.id}/issues/",
+            "all_issues/",
+            "all_issues/?search=misfire",
+            "all_issues/?fields=id,component_name,vehicle.license_plate&expand=vehicle",
+            "services/",
+            "services/?expand=vehicle,issues.component",
+            "services/revenue_dashboard/?group_by=week",
+        ]:
+            sync_response = await self.async_client.get(f"/api/v1/velocare/{path}", headers=self.headers)
+            async_response = await self.async_client.get(f"/api/v1/velocare/async/{path}", headers=self.headers)
+            self.assertEqual(async_response.status_code, 200, path)
+            expected = sync_response.json()
+            if isinstance(expected, dict) and "next" in expected:
+                expected["next"] = expected["next"] and expected["next"].replace("/velocare/", "/velocare/async/")
+            self.assertEqual(async_response.json(), expected, path)
+
+    async def test_async_reads_require_authentication(self):
+        response = await self.async_client.get("/api/v1/velocare/async/services/")
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get("/api/v1/velocare/async/vehicles/999999/", headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchTest(ShopOwnerMixin, APITestCase):
+    use_token = True
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers["Authorization"])
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        self.pulsar = Vehicle.objects.create(owner=rider, make="Bajaj", license_plate="KA01AB1234", model="Pulsar", year=2019)
+        self.activa = Vehicle.objects.create(owner=rider, make="Honda", license_plate="KA02CD5678", model="Activa", year=2020)
+        self.pulsar_ns = Vehicle.objects.create(owner=rider, make="Bajaj", license_plate="MH12PU1234", model="Pulsar NS", year=2021)
+        Issue.objects.create(vehicle=self.activa, description="Brakes feel spongy")
+        Issue.objects.create(vehicle=self.pulsar, description="Front brake pads worn out")
+        Issue.objects.create(vehicle=self.activa, description="Rear brake squeals")
+        Issue.objects.create(vehicle=self.activa, description="Chain needs lubrication")
+
+    def search(self, path, term, **params):
+        response = self.client.get(path, {"search": term, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_partial_license_plate(self):
+        data = self.search("/api/v1/velocare/vehicles/", "1234")
+        self.assertEqual({row["id"] for row in data["results"]}, {self.pulsar.id, self.pulsar_ns.id})
+        data = self.search("/api/v1/velocare/vehicles/", "cd56")
+        self.assertEqual([row["id"] for row in data["results"]], [self.activa.id])
+
+    def test_vehicle_results_are_ranked(self):
+        # A plate that starts with the term beats one that only contains it.
+        prefixed = Vehicle.objects.create(owner=self.pulsar.owner, make="TVS", license_plate="AB12XY0001", model="Jupiter", year=2022)
+        data = self.search("/api/v1/velocare/vehicles/", "ab12")
+        self.assertEqual([row["id"] for row in data["results"]], [prefixed.id, self.pulsar.id])
+        data = self.search("/api/v1/velocare/vehicles/", "pulsar ns")
+        self.assertEqual([row["id"] for row in data["results"]], [self.pulsar_ns.id])
+        data = self.search("/api/v1/velocare/vehicles/", "bajaj")
+        self.assertEqual([row["id"] for row in data["results"]], [self.pulsar.id, self.pulsar_ns.id])
+
+    def test_ranked_results_page_with_cursor(self):
+        for i in range(5):
+            Vehicle.objects.create(owner=self.pulsar.owner, make="Bajaj", license_plate=f"DL{i}BJ0001", model="Platina", year=2018)
+        seen = []
+        with CaptureQueriesContext(connection) as queries:
+            data = self.search("/api/v1/velocare/vehicles/", "bajaj", page_size=2)
+            while True:
+                seen.extend(row["id"] for row in data["results"])
+                if not data["next"]:
+                    break
+                data = self.client.get(data["next"]).data
+        # Every make matches exactly, so the ranks tie and the ids decide.
+        self.assertEqual(seen, sorted(Vehicle.objects.filter(make="Bajaj").values_list("id", flat=True)))
+        self.assertFalse([query["sql"] for query in queries if "OFFSET" in query["sql"]])
+        data = self.client.get(data["previous"]).data
+        self.assertEqual([row["id"] for row in data["results"]], seen[4:6])
+
+    def test_issue_description(self):
+        data = self.search("/api/v1/velocare/all_issues/", "brake")
+        self.assertEqual(
+            [row["description"] for row in data["results"]],
+            ["Front brake pads worn out", "Rear brake squeals", "Brakes feel spongy"],
+        )
+        data = self.search("/api/v1/velocare/all_issues/", "brake front")
+        self.assertEqual([row["description"] for row in data["results"]], ["Front brake pads worn out"])
+
+    def test_short_terms_are_rejected(self):
+        response = self.client.get("/api/v1/velocare/vehicles/", {"search": "ka"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("search", response.data)
+
+
+class ExportTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        self.vehicle = Vehicle.objects.create(owner=rider, make="Bajaj", license_plate="KA01AB1234", model="Pulsar", year=2019)
+        component = Component.objects.create(name="Brake pad", new_price=400, repair_price=120)
+        self.services = []
+        for i in range(3):
+            issues = [
+                Issue.objects.create(vehicle=self.vehicle, description=f'Brake, "squeal" {i}', component=component),
+                Issue.objects.create(vehicle=self.vehicle, description="Chain slack", is_repair=False),
+            ]
+            service = Service.objects.create(vehicle=self.vehicle, total_cost=Decimal("520.50"))
+            service.issues.set(issues)
+            Invoice.objects.create(service=service, invoice_number=f"EX-{i}", total_amount=Decimal("520.50"))
+            self.services.append(service)
+        Service.objects.filter(pk=self.services[0].pk).update(date=timezone.now() - timedelta(days=40))
+
+    def export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_services_csv(self):
+        content = self.export("/api/v1/velocare/services/export/")
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([int(row["id"]) for row in rows], [service.id for service in self.services])
+        first = self.services[0]
+        self.assertEqual(rows[0]["license_plate"], "KA01AB1234")
+        self.assertEqual(rows[0]["total_cost"], "520.50")
+        self.assertEqual(rows[0]["issue_ids"], ";".join(str(pk) for pk in sorted(first.issues.values_list("id", flat=True))))
+
+    def test_services_date_range(self):
+        start = timezone.localdate() - timedelta(days=1)
+        content = self.export("/api/v1/velocare/services/export/", start=start.isoformat())
+        ids = [int(row["id"]) for row in csv.DictReader(io.StringIO(content))]
+        self.assertEqual(ids, [service.id for service in self.services[1:]])
+        response = self.client.get("/api/v1/velocare/services/export/", {"start": "2026-02-01", "end": "2026-01-01"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_issues_ndjson(self):
+        content = self.export("/api/v1/velocare/all_issues/export/", format="ndjson")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]["description"], 'Brake, "squeal" 0')
+        self.assertEqual(rows[0]["component"], "Brake pad")
+        self.assertIsNone(rows[1]["component"])
+        self.assertIs(rows[1]["is_repair"], False)
+
+    def test_csv_quotes_values(self):
+        content = self.export("/api/v1/velocare/all_issues/export/", format="csv")
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(rows[0]["description"], 'Brake, "squeal" 0')
+        self.assertEqual(rows[1]["component"], "")
+        self.assertEqual(rows[1]["is_repair"], "false")
+
+    def test_csv_neutralizes_formulas(self):
+        Issue.objects.filter(description="Chain slack").update(description='=HYPERLINK("http://evil.test","x")')
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(license_plate="+KA01")
+        Service.objects.filter(pk=self.services[1].pk).update(total_cost=Decimal("-5.00"))
+        rows = list(csv.DictReader(io.StringIO(self.export("/api/v1/velocare/all_issues/export/", format="csv"))))
+        self.assertEqual(rows[1]["description"], '\'=HYPERLINK("http://evil.test","x")')
+        self.assertEqual(rows[0]["description"], 'Brake, "squeal" 0')
+        rows = list(csv.DictReader(io.StringIO(self.export("/api/v1/velocare/services/export/"))))
+        self.assertEqual(rows[1]["license_plate"], "'+KA01")
+        self.assertEqual(rows[1]["total_cost"], "-5.00")
+        content = self.export("/api/v1/velocare/all_issues/export/", format="ndjson")
+        self.assertEqual(json.loads(content.splitlines()[1])["description"], '=HYPERLINK("http://evil.test","x")')
+
+    def test_invoices_full_and_per_service(self):
+        content = self.export("/api/v1/velocare/invoices/export/", format="ndjson")
+        self.assertEqual([json.loads(line)["invoice_number"] for line in content.splitlines()], ["EX-0", "EX-1", "EX-2"])
+        content = self.export(f"/api/v1/velocare/services/{self.services[1].id}/invoices/export/", format="ndjson")
+        self.assertEqual([json.loads(line)["invoice_number"] for line in content.splitlines()], ["EX-1"])
+
+    def test_invoice_export_requires_shop_owner(self):
+        self.client.force_authenticate(self.vehicle.owner)
+        response = self.client.get("/api/v1/velocare/invoices/export/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_header_is_sent_before_the_query_runs(self):
+        response = self.client.get("/api/v1/velocare/services/export/")
+        content = iter(response.streaming_content)
+        with self.assertNumQueries(0):
+            header = next(content)
+        self.assertEqual(header, b"id,date,vehicle_id,license_plate,total_cost,issue_ids\r\n")
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(content)), 3)
+
+    async def test_asgi_export_streams_rows_as_they_are_read(self):
+        consumed = []
+        iterator = QuerySet.iterator
+
+        def counting_iterator(queryset, *args, **kwargs):
+            for row in iterator(queryset, *args, **kwargs):
+                consumed.append(row)
+                yield row
+
+        with mock.patch.object(ServiceViewSet, "export_chunk_size", 1), \
+                mock.patch.object(QuerySet, "iterator", counting_iterator):
+            response = await self.async_client.get(
+                "/api/v1/velocare/services/export/", headers=self.token_headers(self.shop_owner)
+            )
+            self.assertTrue(response.is_async)
+            content = aiter(response.streaming_content)
+            self.assertEqual(await anext(content), b"id,date,vehicle_id,license_plate,total_cost,issue_ids\r\n")
+            self.assertEqual(consumed, [])
+            self.assertTrue((await anext(content)).startswith(str(self.services[0].id).encode()))
+            self.assertEqual(len(consumed), 1)
+            self.assertEqual(len([chunk async for chunk in content]), 2)
+
+
+class BulkImportTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.riders = [
+            CustomUser.objects.create_user(email=f"rider{i}@velo.test", password="pass", is_user=True) for i in range(3)
+        ]
+
+    def test_components_from_list(self):
+        version = TableVersion.objects.current(component_catalog.table)
+        rows = [{"name": f"Part {i}", "new_price": "10.00", "repair_price": "2.50"} for i in range(5)]
+        response = self.client.post("/api/v1/velocare/components/import/?chunk_size=2", rows, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data, {"created": 5})
+        self.assertEqual(Component.objects.count(), 5)
+        self.assertEqual(TableVersion.objects.current(component_catalog.table), version + 1)
+
+    def test_components_from_ndjson(self):
+        body = "\n".join(json.dumps({"name": f"Part {i}", "new_price": 10, "repair_price": 2}) for i in range(3))
+        response = self.client.post(
+            "/api/v1/velocare/components/import/", body + "\n\n", content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Component.objects.count(), 3)
+
+    def test_invalid_rows_are_reported_and_nothing_is_saved(self):
+        rows = [
+            {"name": "Chain", "new_price": "900", "repair_price": "200"},
+            {"name": "Brake", "new_price": "not a price", "repair_price": "200"},
+            ["not", "a", "row"],
+        ]
+        response = self.client.post("/api/v1/velocare/components/import/?chunk_size=1", rows, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [1, 2])
+        self.assertIn("new_price", response.data["errors"][0]["errors"])
+        self.assertFalse(Component.objects.exists())
+
+    def test_vehicles_resolve_owners_by_email_in_one_query_per_chunk(self):
+        rows = [
+            {"owner_email": self.riders[i % 3].email, "make": "Honda", "license_plate": f"KA01{i:04d}", "model": "Shine", "year": 2020}
+            for i in range(30)
+        ]
+        # One owner lookup and one INSERT per chunk, plus the savepoints.
+        with self.assertNumQueries(2 * 3 + 2):
+            response = self.client.post("/api/v1/velocare/vehicles/import/?chunk_size=10", rows, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Vehicle.objects.filter(owner=self.riders[1]).count(), 10)
+
+    def test_vehicle_with_unknown_owner(self):
+        rows = [{"owner_email": "nobody@velo.test", "make": "Honda", "license_plate": "KA01", "model": "Shine", "year": 2020}]
+        response = self.client.post("/api/v1/velocare/vehicles/import/", rows, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"], [{"row": 0, "errors": {"owner_email": ["No user with this email."]}}])
+
+    def test_issues_by_plate_or_vehicle(self):
+        vehicle = Vehicle.objects.create(owner=self.riders[0], make="Bajaj", license_plate="MH12AB0001", model="Pulsar", year=2019)
+        twin = [
+            Vehicle.objects.create(owner=self.riders[i], make="TVS", license_plate="DL01ZZ0001", model="Apache", year=2019)
+            for i in (1, 2)
+        ]
+        component = Component.objects.create(name="Clutch plate", new_price=800, repair_price=150)
+        rows = [
+            {"license_plate": "MH12AB0001", "description": "Clutch slips", "component": component.id},
+            {"vehicle": twin[0].id, "description": "Noisy chain", "is_repair": False},
+        ]
+        response = self.client.post("/api/v1/velocare/all_issues/import/", rows, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Issue.objects.get(vehicle=vehicle).component, component)
+        self.assertFalse(Issue.objects.get(vehicle=twin[0]).is_repair)
+
+        rows = [
+            {"license_plate": "DL01ZZ0001", "description": "Which one?"},
+            {"vehicle": 999999, "description": "Ghost", "component": 999999},
+            {"description": "No vehicle"},
+        ]
+        response = self.client.post("/api/v1/velocare/all_issues/import/", rows, format="json")
+        self.assertEqual(response.status_code, 400)
+        errors = {error["row"]: error["errors"] for error in response.data["errors"]}
+        self.assertEqual(set(errors[0]), {"license_plate"})
+        self.assertEqual(set(errors[1]), {"vehicle", "component"})
+        self.assertIn("non_field_errors", errors[2])
+        self.assertEqual(Issue.objects.count(), 2)
+
+    def test_import_requires_shop_owner(self):
+        self.client.force_authenticate(self.riders[0])
+        response = self.client.post("/api/v1/velocare/components/import/", [], format="json")
+        self.assertEqual(response.status_code, 403)
+
+
+class ConditionalGetTest(ShopOwnerMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vehicle = Vehicle.objects.create(owner=self.rider, make="Bajaj", license_plate="KA01AB1234", model="Pulsar", year=2019)
+            Component.objects.create(name="Chain", new_price=900, repair_price=200)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_list_is_not_modified(self):
+        url = "/api/v1/velocare/components/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertIn("Last-Modified", response)
+        self.assertIn("no-cache", response["Cache-Control"])
+        with self.assertNumQueries(1), mock.patch.object(ComponentSerializer, "to_representation") as serialize:
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+        serialize.assert_not_called()
+        not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        url = f"/api/v1/velocare/vehicles/{self.vehicle.id}/"
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vehicle.model = "Pulsar NS"
+            self.vehicle.save()
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data["model"], "Pulsar NS")
+
+        url = "/api/v1/velocare/vehicles/"
+        response = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rider.email = "rider@new.test"
+            self.rider.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_service_issues_change_the_service_etag(self):
+        url = "/api/v1/velocare/services/"
+        with self.captureOnCommitCallbacks(execute=True):
+            issue = Issue.objects.create(vehicle=self.vehicle, description="Noise")
+            service = Service.objects.create(vehicle=self.vehicle, total_cost=0)
+        response = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            service.issues.add(issue)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_logins_do_not_change_the_etag(self):
+        url = "/api/v1/velocare/vehicles/"
+        response = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rider.last_login = timezone.now()
+            self.rider.save(update_fields=["last_login"])
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_etag_depends_on_the_representation(self):
+        url = "/api/v1/velocare/components/"
+        response = self.client.get(url)
+        browsable = self.client.get(url, HTTP_ACCEPT="text/html")
+        self.assertNotEqual(browsable["ETag"], response["ETag"])
+
+
+@skipUnless(connection.settings_dict["OPTIONS"].get("pool"), "database pooling is disabled")
+class ConnectionPoolTest(TransactionTestCase):
+    databases = {"default", *settings.DATABASE_REPLICAS}
+
+    def backend_pid(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            return cursor.fetchone()[0]
+
+    def test_connections_are_reused_across_requests(self):
+        pool = connection.pool
+        self.client.get("/")
+        connection.close()
+        opened = pool.get_stats().get("connections_num", 0)
+        pids = set()
+        for _ in range(10):
+            # Each request checks a connection out and returns it when the
+            # request finishes (the test client skips that, so close here).
+            self.assertEqual(self.client.get("/").status_code, 200)
+            pids.add(self.backend_pid())
+            connection.close()
+        self.assertEqual(pool.get_stats().get("connections_num", 0), opened)
+        self.assertLessEqual(len(pids), pool.max_size)
+
+    def test_health_check_reports_pool_usage(self):
+        stats = self.client.get("/").json()["database_pools"]["default"]
+        self.assertEqual(stats["pool_max"], connections["default"].pool.max_size)
+        self.assertIn("saturation", stats)
+
+
+def tearDownModule():
+    # Replicas mirror the test database in tests; their pools have to let go
+    # of it before it is dropped.
+    for alias in settings.DATABASE_REPLICAS:
+        if getattr(connections[alias], "pool", None) is not None:
+            connections[alias].close_pool()
+
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"], DB_REPLICA_MAX_LAG=5)
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        replica_set.checked_at.clear()
+        cache.clear()
+        self.middleware = ReplicaMiddleware(lambda request: HttpResponse(status=201))
+        self.factory = RequestFactory()
+        self.lags = {"replica1": 0.0, "replica2": 0.5}
+        patcher = mock.patch.object(replica_set, "check", side_effect=lambda alias: self.lags[alias])
+        self.check = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def choose(self, method="get", **headers):
+        return self.middleware.choose_replica(getattr(self.factory, method)("/", headers=headers))
+
+    def test_reads_go_to_replicas_that_keep_up(self):
+        self.assertIn(self.choose(), ("replica1", "replica2"))
+        self.assertIsNone(self.choose("post"))
+
+        self.lags.update(replica1=60.0, replica2=None)
+        self.assertIn(self.choose(), ("replica1", "replica2"))  # checked at most once a second
+        replica_set.checked_at.clear()
+        self.assertIsNone(self.choose())
+        self.lags["replica2"] = 1.0
+        replica_set.checked_at.clear()
+        self.assertEqual({self.choose() for _ in range(10)}, {"replica2"})
+        self.assertEqual(replica_set.stats()["replica1"], {"lag_seconds": 60.0, "in_use": False})
+
+    def test_router_follows_the_chosen_replica(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Service))
+        token = replica_alias.set("replica2")
+        try:
+            self.assertEqual(router.db_for_read(Service), "replica2")
+            self.assertEqual(router.db_for_write(Service), "default")
+        finally:
+            replica_alias.reset(token)
+        self.assertFalse(router.allow_migrate("replica1", "VeloCare"))
+        self.assertTrue(router.allow_migrate("default", "VeloCare"))
+
+    def test_writers_stick_to_the_primary(self):
+        shop_owner = CustomUser(pk=41, email="shop@velo.test", is_owner=True)
+        token = f"Bearer {OwnerTokenObtainPairSerializer.get_token(shop_owner).access_token}"
+        self.assertIsNotNone(self.choose(Authorization=token))
+        write = self.factory.post("/", headers={"Authorization": token})
+        write.user = shop_owner
+        self.middleware(write)
+        self.assertIsNone(self.choose(Authorization=token))
+        self.assertIsNotNone(self.choose())
+        self.assertIsNotNone(self.choose(Authorization="Bearer forged"))
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "no read replicas configured (DB_REPLICAS)")
+class ReplicaReadTest(ShopOwnerMixin, TransactionTestCase):
+    databases = {"default", *settings.DATABASE_REPLICAS}
+    use_token = True
+
+    def setUp(self):
+        replica_set.checked_at.clear()
+        replica_set.lag.clear()
+        cache.clear()
+        response_cache.clear()
+        super().setUp()
+        self.replica = connections[settings.DATABASE_REPLICAS[0]]
+
+    def get_components(self):
+        with CaptureQueriesContext(connection) as primary, CaptureQueriesContext(self.replica) as replica:
+            response = self.client.get("/api/v1/velocare/components/", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    @override_settings(DATABASE_REPLICAS=settings.DATABASE_REPLICAS[:1])
+    def test_reads_use_the_replica_until_the_user_writes(self):
+        primary, replica = self.get_components()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 1)  # the lag check and the reads
+
+        response = self.client.post("/api/v1/velocare/components/", {"name": "Chain"}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_components()[0], 0)  # failed writes do not stick
+        response = self.client.post(
+            "/api/v1/velocare/components/", {"name": "Chain", "new_price": 900, "repair_price": 100}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 201)
+        primary, replica = self.get_components()
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+    @override_settings(DATABASE_REPLICAS=settings.DATABASE_REPLICAS[:1], DB_REPLICA_MAX_LAG=-1)
+    def test_lagging_replica_is_skipped(self):
+        primary, replica = self.get_components()
+        self.assertEqual(replica, 1)  # only the lag check
+        self.assertGreater(primary, 0)
+
+
+class IndexUsageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rider = CustomUser.objects.create_user(email="rider@velo.test", password="pass", is_user=True)
+        cls.vehicles = Vehicle.objects.bulk_create(
+            Vehicle(owner=rider, make="Honda", license_plate=f"KA{i:06d}", model="Activa", year=2015) for i in range(400)
+        )
+        Issue.objects.bulk_create(
+            Issue(vehicle=cls.vehicles[i % 400], description="noise") for i in range(4000)
+        )
+        services = Service.objects.bulk_create(
+            Service(vehicle=cls.vehicles[i % 400], total_cost=100) for i in range(4000)
+        )
+        Invoice.objects.bulk_create(
+            Invoice(service=service, invoice_number=f"IX-{service.id}", total_amount=100, paid=i % 50 != 0)
+            for i, service in enumerate(services)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE "VeloCare_service" SET "date" = now() - "id" * interval \'1 hour\'')
+            cursor.execute('UPDATE "VeloCare_invoice" SET "due_date" = current_date - ("id" % 365)::int')
+            cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_service_date_range_and_cursor_order(self):
+        since = timezone.now() - timedelta(days=2)
+        self.assertUsesIndex(Service.objects.filter(date__gte=since, date__lt=timezone.now()), "service_date_id_idx")
+        self.assertUsesIndex(Service.objects.order_by("-date", "-id")[:51], "service_date_id_idx")
+
+    def test_unpaid_invoices_by_due_date(self):
+        self.assertUsesIndex(Invoice.objects.unpaid().order_by("due_date", "id")[:51], "invoice_unpaid_due_id_idx")
+        self.assertUsesIndex(Invoice.objects.filter(due_date=timezone.localdate()), "invoice_due_date_idx")
+
+    def test_vehicle_and_issue_lookups(self):
+        self.assertUsesIndex(Vehicle.objects.filter(license_plate="KA000123"), "vehicle_license_plate_idx")
+        self.assertUsesIndex(Issue.objects.filter(vehicle=self.vehicles[7]).order_by("id"), "issue_vehicle_id_idx")
+
+    def test_search_uses_trigram_indexes(self):
+        # A few hundred rows are cheaper to scan; only check that the
+        # UPPER(column) LIKE of icontains matches the index expressions.
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        self.assertUsesIndex(Vehicle.objects.filter(license_plate__icontains="00123"), "vehicle_plate_trgm_idx")
+        self.assertUsesIndex(Vehicle.objects.filter(model__icontains="pulsar"), "vehicle_model_trgm_idx")
+        self.assertUsesIndex(Issue.objects.filter(description__icontains="brake"), "issue_description_trgm_idx")
+
+
+class BenchmarkCommandTest(TestCase):
+    def test_small_run_stays_within_query_budgets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = f"{directory}/results.json"
+            call_command("benchmark", "--scale", "small", "--requests", "2", "--output", output, stdout=io.StringIO())
+            with open(output) as results:
+                report = json.load(results)
+        self.assertEqual(report["violations"], [])
+        self.assertEqual(report["rows"]["services"], 80)
+        self.assertEqual(report["endpoints"]["services list"]["queries"], 4)
+        self.assertEqual(set(report["endpoints"]["users list"]), {"method", "path", "queries", "p50_ms", "p95_ms", "max_ms", "peak_kib"})
+        # Everything the run wrote was rolled back.
+        self.assertFalse(Service.objects.exists())
+
+    def test_exceeded_budget_fails_the_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            budgets = f"{directory}/budgets.json"
+            with open(budgets, "w") as file:
+                json.dump({"scale": "small", "endpoints": {"components list": {"queries": 1}}}, file)
+            with self.assertRaisesMessage(CommandError, "1 budget(s) exceeded"):
+                call_command(
+                    "benchmark", "components list", "--scale", "small", "--requests", "1", "--budgets", budgets,
+                    stdout=io.StringIO(), stderr=io.StringIO(),
+                )
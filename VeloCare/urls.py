@@ -1,7 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
-from .views import ComponentViewSet, VehicleViewSet, IssueViewSet, InvoiceViewSet, ServiceViewSet, AllIssueViewSet
+from .views import (
+    ComponentViewSet, VehicleViewSet, IssueViewSet, InvoiceViewSet, ServiceViewSet, AllIssueViewSet, ReceivableViewSet,
+)
 
 
 router = DefaultRouter()
@@ -9,6 +11,7 @@ router.register(r"components", ComponentViewSet, basename='components')
 router.register(r"vehicles", VehicleViewSet, basename='vehicles')
 router.register(r"all_issues", AllIssueViewSet, basename='all_issues')
 router.register(r"services", ServiceViewSet, basename='services')
+router.register(r"receivables", ReceivableViewSet, basename='receivables')
 
 vehicle_router = routers.NestedDefaultRouter(router, r"vehicles", lookup="vehicle")
 vehicle_router.register(r"issues", IssueViewSet, basename='vehicle_issues')
@@ -18,6 +21,16 @@ service_router.register(r"invoices", InvoiceViewSet, basename='service_invoices'
 
 
 urlpatterns = [
+    path(
+        "invoices/export/",
+        InvoiceViewSet.as_view({"get": "export"}, **InvoiceViewSet.export.kwargs),
+        name="invoices-export",
+    ),
+    path(
+        "invoices/mark_as_paid/",
+        InvoiceViewSet.as_view({"post": "bulk_mark_as_paid"}, **InvoiceViewSet.bulk_mark_as_paid.kwargs),
+        name="invoices-bulk-mark-as-paid",
+    ),
     path("", include(router.urls)),
     path("", include(vehicle_router.urls)),
     path("", include(service_router.urls))
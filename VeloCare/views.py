@@ -1,12 +1,29 @@
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import DatabaseError, connections
+from django.db.models import OuterRef
 from django.http import JsonResponse
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from datetime import timedelta
 from django.utils import timezone
-from django.db.models import Sum
-from rest_framework import viewsets, permissions
+from rest_framework import mixins, viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Component, Vehicle, Issue, Service, Invoice
+from .catalog import component_catalog
+from .conditional import ConditionalGetMixin, response_cache
+from .idempotency import IdempotentCreateMixin
+from .models import Component, Vehicle, Issue, Service, Invoice, DailyRevenue, TableVersion, day_start
+from VeloService.db import pool_stats
+from VeloService.replicas import replica_set
+from VeloService.export import ExportMixin
+from VeloService.imports import ImportMixin
+from VeloService.filters import RankedSearchFilter
+from VeloService.pagination import (
+    CompositeCursorPagination, DueDateCursorPagination, IdCursorPagination, ServiceCursorPagination,
+)
+from VeloService.sparse import SparseQuerysetMixin
+from User.models import CustomUser
 from User.permissions import (
     IsVehicleOwner,
     IsShopOwner,
@@ -15,44 +32,149 @@ from User.permissions import (
 from .serializers import (
     ComponentSerializer,
     VehicleSerializer,
+    VehicleImportSerializer,
     IssueSerializer,
+    IssueImportSerializer,
     ServiceSerializer,
     InvoiceSerializer,
+    BulkMarkPaidSerializer,
+    RevenueDashboardQuerySerializer,
 )
 
 
-class ComponentViewSet(viewsets.ModelViewSet):
+class ComponentViewSet(IdempotentCreateMixin, ConditionalGetMixin, ImportMixin, viewsets.ModelViewSet):
     queryset = Component.objects.all()
     serializer_class = ComponentSerializer
     permission_classes = [IsShopOwner]
-
-
-class VehicleViewSet(viewsets.ModelViewSet):
+    pagination_class = IdCursorPagination
+    max_page_size = 500
+    import_serializer_class = ComponentSerializer
+    version_tables = ("component",)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(self.list_from_catalog, request, *args, **kwargs)
+
+    def list_from_catalog(self, request, *args, **kwargs):
+        # Only the page of ids comes from the database; the rows themselves
+        # are served from the per-process component catalog.
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()).values('id'))
+        components = component_catalog.get_many(row['id'] for row in page)
+        rows = [components[row['id']] for row in page if row['id'] in components]
+        serializer = self.get_serializer(rows, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def after_import(self, objects):
+        # bulk_create sends no post_save, so invalidate the catalog here.
+        component_catalog.invalidate()
+
+
+class VehicleViewSet(
+    IdempotentCreateMixin, ConditionalGetMixin, ImportMixin, SparseQuerysetMixin, viewsets.ModelViewSet
+):
     serializer_class = VehicleSerializer
     permission_classes = [IsVehicleOwner, IsShopOwner]
+    pagination_class = CompositeCursorPagination
+    max_page_size = 200
+    filter_backends = [RankedSearchFilter]
+    search_fields = ("license_plate", "make", "model")
+    import_serializer_class = VehicleImportSerializer
+    version_tables = ("vehicle", "user")
 
     def get_queryset(self):
-        return Vehicle.objects.select_related('owner').all()
+        return self.get_sparse_queryset(Vehicle.objects.all())
+
+    def build_import_objects(self, rows):
+        emails = {data['owner_email'] for _, data in rows}
+        owners = dict(CustomUser.objects.filter(email__in=emails).values_list('email', 'id'))
+        objects, errors = [], []
+        for position, data in rows:
+            owner_id = owners.get(data.pop('owner_email'))
+            if owner_id is None:
+                errors.append({"row": position, "errors": {"owner_email": ["No user with this email."]}})
+                continue
+            objects.append(Vehicle(owner_id=owner_id, **data))
+        return objects, errors
+
+    def after_import(self, objects):
+        TableVersion.objects.bump_on_commit("vehicle")
 
     def perform_create(self, serializer):
         serializer.save()
 
 
-class AllIssueViewSet(viewsets.ModelViewSet):
+class AllIssueViewSet(
+    IdempotentCreateMixin, ConditionalGetMixin, ImportMixin, ExportMixin, SparseQuerysetMixin, viewsets.ModelViewSet
+):
     serializer_class = IssueSerializer
     permission_classes = [IsVehicleOwner, IsShopOwner]
+    pagination_class = CompositeCursorPagination
+    max_page_size = 200
+    filter_backends = [RankedSearchFilter]
+    search_fields = ("description",)
+    export_filename = "issues"
+    export_fields = {
+        "id": "id",
+        "vehicle_id": "vehicle_id",
+        "license_plate": "vehicle__license_plate",
+        "description": "description",
+        "component_id": "component_id",
+        "component": "component__name",
+        "is_repair": "is_repair",
+    }
+    import_serializer_class = IssueImportSerializer
+    version_tables = ("issue", "vehicle", "user", "component")
 
     def get_queryset(self):
-        return Issue.objects.select_related('vehicle').prefetch_related('component')
-
-
-class IssueViewSet(viewsets.ModelViewSet):
+        return self.get_sparse_queryset(Issue.objects.all())
+
+    def get_export_queryset(self):
+        return Issue.objects.all()
+
+    def build_import_objects(self, rows):
+        vehicle_ids = {data['vehicle'] for _, data in rows if 'vehicle' in data}
+        plates = {data['license_plate'] for _, data in rows if 'license_plate' in data}
+        known_vehicles = set(Vehicle.objects.filter(id__in=vehicle_ids).values_list('id', flat=True))
+        vehicles_by_plate = {}
+        for plate, vehicle_id in Vehicle.objects.filter(license_plate__in=plates).values_list('license_plate', 'id'):
+            vehicles_by_plate.setdefault(plate, []).append(vehicle_id)
+        components = component_catalog.get_many(data.get('component') for _, data in rows)
+
+        objects, errors = [], []
+        for position, data in rows:
+            row_errors = {}
+            if 'license_plate' in data:
+                matches = vehicles_by_plate.get(data.pop('license_plate'), [])
+                if len(matches) != 1:
+                    row_errors['license_plate'] = [
+                        "No vehicle with this license plate." if not matches
+                        else "Several vehicles have this license plate; give vehicle instead."
+                    ]
+                vehicle_id = matches[0] if matches else None
+            else:
+                vehicle_id = data.pop('vehicle')
+                if vehicle_id not in known_vehicles:
+                    row_errors['vehicle'] = [f'Invalid pk "{vehicle_id}" - object does not exist.']
+            component_id = data.pop('component', None)
+            if component_id is not None and component_id not in components:
+                row_errors['component'] = [f'Invalid pk "{component_id}" - object does not exist.']
+            if row_errors:
+                errors.append({"row": position, "errors": row_errors})
+                continue
+            objects.append(Issue(vehicle_id=vehicle_id, component_id=component_id, **data))
+        return objects, errors
+
+    def after_import(self, objects):
+        TableVersion.objects.bump_on_commit("issue")
+
+
+class IssueViewSet(IdempotentCreateMixin, ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = IssueSerializer
     permission_classes = [IsVehicleOwner, IsShopOwner]
+    version_tables = ("issue", "vehicle", "user", "component")
 
     def get_queryset(self):
         vehicle_id = self.kwargs.get('vehicle_pk')
-        return Issue.objects.filter(vehicle_id=vehicle_id).select_related('vehicle').prefetch_related('component')
+        return self.get_sparse_queryset(Issue.objects.filter(vehicle_id=vehicle_id).order_by('id'))
 
     def perform_create(self, serializer):
         vehicle_id = self.kwargs.get('vehicle_pk')
@@ -79,14 +201,45 @@ class IssueViewSet(viewsets.ModelViewSet):
         instance.delete()
 
 
-class ServiceViewSet(viewsets.ModelViewSet):
+def filter_date_range(queryset, field, start, end):
+    # Whole days in the current time zone, as ranges the date indexes can use.
+    if start:
+        queryset = queryset.filter(**{f"{field}__gte": day_start(start)})
+    if end:
+        queryset = queryset.filter(**{f"{field}__lt": day_start(end + timedelta(days=1))})
+    return queryset
+
+
+class ServiceViewSet(
+    IdempotentCreateMixin, ConditionalGetMixin, ExportMixin, SparseQuerysetMixin, viewsets.ModelViewSet
+):
     serializer_class = ServiceSerializer
     permission_classes = [IsShopOwner]
+    pagination_class = ServiceCursorPagination
+    max_page_size = 200
+    export_filename = "services"
+    export_fields = {
+        "id": "id",
+        "date": "date",
+        "vehicle_id": "vehicle_id",
+        "license_plate": "vehicle__license_plate",
+        "total_cost": "total_cost",
+        "issue_ids": "issue_ids",
+    }
+    export_ordering = ("date", "id")
+    version_tables = ("service", "issue", "vehicle", "user", "component")
 
     def get_queryset(self):
-        if self.request.user.is_shop_owner():
-            return Service.objects.all()
-        return Service.objects.all()
+        return self.get_sparse_queryset(Service.objects.all())
+
+    def get_export_queryset(self):
+        # A correlated subquery per row keeps the export streaming; a join
+        # with GROUP BY would aggregate the whole table before the first row.
+        issue_ids = Service.issues.through.objects.filter(service_id=OuterRef("id")).order_by("issue_id")
+        return Service.objects.annotate(issue_ids=ArraySubquery(issue_ids.values("issue_id")))
+
+    def filter_export_dates(self, queryset, start, end):
+        return filter_date_range(queryset, "date", start, end)
 
     def perform_create(self, serializer):
         serializer.save()
@@ -95,27 +248,58 @@ class ServiceViewSet(viewsets.ModelViewSet):
     def revenue_dashboard(self, request):
         if not request.user.is_shop_owner():
             return Response({"detail": "you do not have permission to perform this action"})
-        today = timezone.now().date()
-        daily_revenue = Service.objects.filter(date__date=today).aggregate(Sum('total_cost'))['total_cost__sum'] or 0
-        monthly_revenue = Service.objects.filter(date__month=today.month, date__year=today.year).aggregate(Sum('total_cost'))['total_cost__sum'] or 0
-        yearly_revenue = Service.objects.filter(date__year=today.year).aggregate(Sum('total_cost'))['total_cost__sum'] or 0
+        query = RevenueDashboardQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        today = timezone.localdate()
+        end = query.validated_data.get('end', today)
+        start = query.validated_data.get('start', end - timedelta(days=29))
+        group_by = query.validated_data['group_by']
 
         return Response({
-            "daily_revenue": daily_revenue,
-            "monthly_revenue": monthly_revenue,
-            "yearly_revenue": yearly_revenue,
+            **DailyRevenue.objects.totals(today),
+            "start": start,
+            "end": end,
+            "group_by": group_by,
+            "series": DailyRevenue.objects.series(start, end, group_by),
         })
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(
+    IdempotentCreateMixin, ConditionalGetMixin, ExportMixin, SparseQuerysetMixin, viewsets.ModelViewSet
+):
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_tables = ("invoice", "service", "issue", "vehicle", "user", "component")
+    export_filename = "invoices"
+    export_fields = {
+        "id": "id",
+        "invoice_number": "invoice_number",
+        "service_id": "service_id",
+        "license_plate": "service__vehicle__license_plate",
+        "issue_date": "issue_date",
+        "due_date": "due_date",
+        "total_amount": "total_amount",
+        "paid": "paid",
+    }
 
     def get_queryset(self):
         service_id = self.kwargs.get('service_pk')
 
         if self.request.user.is_shop_owner() and service_id:
-            return Invoice.objects.filter(service_id=service_id).select_related('service')
+            return self.get_sparse_queryset(Invoice.objects.filter(service_id=service_id))
+
+    def get_export_queryset(self):
+        # Also routed without a service as invoices/export/ for full exports.
+        service_id = self.kwargs.get('service_pk')
+        if service_id:
+            return Invoice.objects.filter(service_id=service_id)
+        return Invoice.objects.all()
+
+    def has_export_permission(self, request):
+        return request.user.is_shop_owner()
+
+    def filter_export_dates(self, queryset, start, end):
+        return filter_date_range(queryset, "issue_date", start, end)
 
     def perform_create(self, serializer):
         service_id = self.kwargs.get("service_pk")
@@ -148,6 +332,23 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         invoice.save()
         return Response({"status": "invoice marked as paid"})
 
+    @action(detail=False, methods=['post'], url_path='mark_as_paid')
+    def bulk_mark_as_paid(self, request, service_pk=None):
+        """
+        Marks the unpaid invoices picked by ``ids``, ``due_before`` and
+        ``services`` paid in one statement. Also routed without a service as
+        invoices/mark_as_paid/.
+        """
+        if not request.user.is_shop_owner():
+            return Response(
+                {"detail": "you do not have permission to perform this action"}, status=status.HTTP_403_FORBIDDEN
+            )
+        selection = BulkMarkPaidSerializer(data=request.data)
+        selection.is_valid(raise_exception=True)
+        invoices = Invoice.objects.filter(service_id=service_pk) if service_pk else Invoice.objects.all()
+        ids = Invoice.objects.mark_paid(selection.filter_queryset(invoices))
+        return Response({"updated": len(ids), "ids": ids})
+
     @action(detail=False, methods=['get'])
     def unpaid(self, request, service_pk=None):
         if not request.user.is_shop_owner():
@@ -157,5 +358,59 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+class ReceivableViewSet(ConditionalGetMixin, SparseQuerysetMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Unpaid invoices of every service, longest overdue first, with the aging
+    summary of all of them on each page.
+    """
+    serializer_class = InvoiceSerializer
+    permission_classes = [IsShopOwner]
+    pagination_class = DueDateCursorPagination
+    max_page_size = 500
+    version_tables = ("invoice", "service", "issue", "vehicle", "user", "component")
+
+    def get_validators(self, request):
+        # The aging buckets also move on with the calendar.
+        etag, last_modified = super().get_validators(request)
+        today = timezone.localdate()
+        midnight = int(day_start(today).timestamp())
+        return f'{etag[:-1]}-{today.isoformat()}"', max(last_modified or 0, midnight)
+
+    def get_queryset(self):
+        return self.get_sparse_queryset(Invoice.objects.unpaid())
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data = {"aging": Invoice.objects.aging(timezone.localdate()), **response.data}
+        return response
+
+
 def health_check(request):
-    return JsonResponse({"status": "Health Check Ok"}, status=200)
+    return JsonResponse({
+        "status": "Health Check Ok",
+        "component_catalog": component_catalog.stats(),
+        "response_cache": response_cache.stats(),
+        "database_pools": pool_stats(),
+        "database_replicas": replica_set.stats(),
+    }, status=200)
+
+
+def readiness_check(request):
+    """
+    503 until every database answers a query. Replicas are left out, since
+    reads skip them when down. A pool with every connection in use is
+    reported right away, since a checkout would wait up to DB_POOL_TIMEOUT,
+    longer than a probe waits for its answer.
+    """
+    pools = pool_stats()
+    try:
+        for alias in connections:
+            if alias in settings.DATABASE_REPLICAS:
+                continue
+            if alias in pools and pools[alias]["saturation"] >= 1 and connections[alias].connection is None:
+                return JsonResponse({"status": "Not Ready", "database": f"{alias} pool is saturated"}, status=503)
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1")
+    except DatabaseError as exc:
+        return JsonResponse({"status": "Not Ready", "database": str(exc)}, status=503)
+    return JsonResponse({"status": "Ready"}, status=200)
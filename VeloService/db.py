@@ -0,0 +1,23 @@
+from django.db import connections
+
+
+def pool_stats():
+    """
+    Connection pool counters for every database alias that uses pooling,
+    plus the derived checkout wait and saturation figures.
+    """
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is None:
+            continue
+        counters = pool.get_stats()
+        in_use = counters.get("pool_size", 0) - counters.get("pool_available", 0)
+        requests = counters.get("requests_num", 0)
+        stats[alias] = {
+            **counters,
+            "connections_in_use": in_use,
+            "saturation": in_use / pool.max_size,
+            "avg_wait_ms": counters.get("requests_wait_ms", 0) / requests if requests else 0,
+        }
+    return stats
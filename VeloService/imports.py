@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .parsers import FastJSONParser, NDJSONParser
+
+
+class ImportQuerySerializer(serializers.Serializer):
+    chunk_size = serializers.IntegerField(required=False, min_value=1, max_value=10000)
+
+
+class ImportMixin:
+    """
+    Adds a ``POST import/`` action that creates many rows at once from a JSON
+    list or an NDJSON body (``Content-Type: application/x-ndjson``).
+
+    Rows are validated ``chunk_size`` at a time (``?chunk_size=``, default
+    ``BULK_IMPORT_CHUNK_SIZE``) with ``import_serializer_class``; the
+    viewset's ``build_import_objects`` turns each validated chunk into
+    unsaved model instances, resolving foreign keys for the whole chunk in
+    one query. Nothing is written unless every row is valid: otherwise the
+    response is a 400 listing the errors of each failing row by its
+    position in the upload. Valid uploads are inserted with ``bulk_create``
+    in chunks of the same size inside one transaction, followed by
+    ``after_import`` for work that ``bulk_create`` skips, such as signals.
+    """
+    import_serializer_class = None
+
+    def build_import_objects(self, rows):
+        """
+        ``rows`` is a list of ``(position, validated_data)``. Returns the
+        model instances and a list of ``{"row": position, "errors": ...}``.
+        """
+        model = self.import_serializer_class.Meta.model
+        return [model(**data) for _, data in rows], []
+
+    def after_import(self, objects):
+        pass
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[FastJSONParser, NDJSONParser])
+    def bulk_import(self, request, *args, **kwargs):
+        query = ImportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        chunk_size = query.validated_data.get('chunk_size', settings.BULK_IMPORT_CHUNK_SIZE)
+
+        rows = request.data
+        if not isinstance(rows, list):
+            raise serializers.ValidationError({"non_field_errors": ["Expected a list of rows."]})
+
+        serializer = self.import_serializer_class()
+        objects, errors = [], []
+        for offset in range(0, len(rows), chunk_size):
+            valid = []
+            for position, row in enumerate(rows[offset:offset + chunk_size], start=offset):
+                try:
+                    valid.append((position, serializer.run_validation(row)))
+                except serializers.ValidationError as exc:
+                    errors.append({"row": position, "errors": exc.detail})
+            chunk_objects, chunk_errors = self.build_import_objects(valid)
+            objects.extend(chunk_objects)
+            errors.extend(chunk_errors)
+
+        if errors:
+            errors.sort(key=lambda error: error["row"])
+            return Response({"created": 0, "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.import_serializer_class.Meta.model
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=chunk_size)
+            self.after_import(objects)
+        return Response({"created": len(objects)}, status=status.HTTP_201_CREATED)
@@ -0,0 +1,316 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from .db import pool_stats
+
+# Upper bounds of the latency histogram, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METHODS = {"GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE"}
+# Seconds between two refreshes of a worker's gauges.
+GAUGE_INTERVAL = 1.0
+
+# Name to (type, help) of every family /metrics exposes.
+FAMILIES = {
+    "velo_http_requests_total": ("counter", "Requests handled, by route, method and response status."),
+    "velo_http_request_duration_seconds": ("histogram", "Time until the response was returned, by route and method."),
+    "velo_http_requests_in_flight": ("gauge", "Requests being handled right now."),
+    "velo_db_pool_connections": ("gauge", "Open pooled database connections, by state."),
+    "velo_db_pool_max_connections": ("gauge", "Connections the pools may open."),
+    "velo_db_pool_requests_waiting": ("gauge", "Threads waiting for a pooled connection."),
+    "velo_db_pool_requests_total": ("counter", "Connections handed out by the pools."),
+    "velo_db_pool_wait_seconds_total": ("counter", "Time spent waiting for a pooled connection."),
+}
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+
+_collectors = []
+
+
+def register_collector(collect, families):
+    """
+    ``collect()`` returns ``(name, labels, value)`` samples of this worker;
+    ``families`` gives the ``(type, help)`` of each name. Counter samples are
+    the worker's running totals and outlive it like the request counters.
+    Collectors run at most once every ``GAUGE_INTERVAL`` seconds per worker.
+    """
+    FAMILIES.update(families)
+    _collectors.append(collect)
+
+
+def pool_metrics():
+    for alias, stats in pool_stats().items():
+        yield "velo_db_pool_connections", {"alias": alias, "state": "in_use"}, stats["connections_in_use"]
+        yield "velo_db_pool_connections", {"alias": alias, "state": "idle"}, stats.get("pool_available", 0)
+        yield "velo_db_pool_max_connections", {"alias": alias}, stats.get("pool_max", 0)
+        yield "velo_db_pool_requests_waiting", {"alias": alias}, stats.get("requests_waiting", 0)
+        yield "velo_db_pool_requests_total", {"alias": alias}, stats.get("requests_num", 0)
+        yield "velo_db_pool_wait_seconds_total", {"alias": alias}, stats.get("requests_wait_ms", 0) / 1000
+
+
+register_collector(pool_metrics, {})
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def sample_key(name, labels):
+    if not labels:
+        return name
+    pairs = ",".join(f'{label}="{escape(value)}"' for label, value in labels.items())
+    return f"{name}{{{pairs}}}"
+
+
+class MetricFile:
+    """
+    Float values by sample key in a memory mapped file that only one process
+    writes. The header holds the number of bytes in use, followed by entries
+    of a key length, the key padded to 8 bytes and the value. An entry is
+    complete before the header counts it, so readers in other processes
+    never see half of one.
+    """
+    initial_size = 1 << 16
+
+    def __init__(self, path):
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self.fd).st_size
+        if size == 0:
+            size = self.initial_size
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        self.used = struct.unpack_from("i", self.map, 0)[0] or 8
+        self.positions = {key: position for key, _, position in read_entries(self.map, self.used)}
+
+    def position(self, key):
+        position = self.positions.get(key)
+        if position is None:
+            encoded = key.encode()
+            position = self.used + 4 + len(encoded) + (-(4 + len(encoded)) % 8)
+            end = position + 8
+            if end > len(self.map):
+                size = len(self.map)
+                while size < end:
+                    size *= 2
+                os.ftruncate(self.fd, size)
+                self.map.close()
+                self.map = mmap.mmap(self.fd, size)
+            struct.pack_into(f"i{len(encoded)}s", self.map, self.used, len(encoded), encoded)
+            struct.pack_into("d", self.map, position, 0.0)
+            self.used = end
+            struct.pack_into("i", self.map, 0, end)
+            self.positions[key] = position
+        return position
+
+    def add(self, key, amount):
+        position = self.position(key)
+        struct.pack_into("d", self.map, position, struct.unpack_from("d", self.map, position)[0] + amount)
+
+    def set(self, key, value):
+        struct.pack_into("d", self.map, self.position(key), value)
+
+
+def read_entries(data, used):
+    """``(key, value, value position)`` of the entries of a metric file's contents."""
+    offset = 8
+    while offset < used:
+        length = struct.unpack_from("i", data, offset)[0]
+        end = offset + 4 + length
+        position = end + (-end % 8)
+        yield bytes(data[offset + 4:end]).decode(), struct.unpack_from("d", data, position)[0], position
+        offset = position + 8
+
+
+class MetricStore:
+    """
+    This process's metric files in ``directory``: ``counter_<pid>.db`` for
+    counters and histograms, which are kept after the process exits, and
+    ``live_<pid>.db`` for gauges, which only count while it runs.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.counters = MetricFile(os.path.join(directory, f"counter_{self.pid}.db"))
+        self.live = MetricFile(os.path.join(directory, f"live_{self.pid}.db"))
+        self.gauges_at = 0.0
+        self.routes = set()
+
+    def observe_request(self, route, method, status, seconds):
+        route_method = f'route="{escape(route)}",method="{method}"'
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        with self.lock:
+            if route_method not in self.routes:
+                # A histogram lists every bucket, empty ones included.
+                for bound in LATENCY_BUCKETS:
+                    self.counters.position(f'velo_http_request_duration_seconds_bucket{{{route_method},le="{bound}"}}')
+                self.routes.add(route_method)
+            self.counters.add(f'velo_http_requests_total{{{route_method},status="{status}"}}', 1)
+            for bound in LATENCY_BUCKETS[bucket:]:
+                self.counters.add(f'velo_http_request_duration_seconds_bucket{{{route_method},le="{bound}"}}', 1)
+            self.counters.add(f'velo_http_request_duration_seconds_bucket{{{route_method},le="+Inf"}}', 1)
+            self.counters.add(f"velo_http_request_duration_seconds_count{{{route_method}}}", 1)
+            self.counters.add(f"velo_http_request_duration_seconds_sum{{{route_method}}}", seconds)
+
+    def add_live(self, key, amount):
+        with self.lock:
+            self.live.add(key, amount)
+
+    def refresh_gauges(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.gauges_at < GAUGE_INTERVAL:
+            return
+        self.gauges_at = now
+        samples = [sample for collect in _collectors for sample in collect()]
+        with self.lock:
+            for name, labels, value in samples:
+                target = self.counters if FAMILIES.get(name, ("",))[0] == "counter" else self.live
+                target.set(sample_key(name, labels), value)
+
+
+_store = None
+
+
+def metric_store():
+    """The store of this process, reopened after a fork or a METRICS_DIR change."""
+    global _store
+    store = _store
+    if store is None or store.pid != os.getpid() or store.directory != settings.METRICS_DIR:
+        store = _store = MetricStore(settings.METRICS_DIR)
+    return store
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect(directory):
+    """Every process's samples in ``directory`` summed by key."""
+    samples = {}
+    for filename in os.listdir(directory):
+        kind, _, pid = filename.removesuffix(".db").partition("_")
+        if kind not in ("counter", "live") or not pid.isdigit():
+            continue
+        if kind == "live" and not process_alive(int(pid)):
+            continue
+        with open(os.path.join(directory, filename), "rb") as metric_file:
+            data = metric_file.read()
+        if len(data) < 8:
+            continue
+        for key, value, _ in read_entries(data, struct.unpack_from("i", data, 0)[0]):
+            samples[key] = samples.get(key, 0.0) + value
+    return samples
+
+
+def family_of(name):
+    if name not in FAMILIES:
+        for suffix in HISTOGRAM_SUFFIXES:
+            if name.endswith(suffix) and FAMILIES.get(name.removesuffix(suffix), ("",))[0] == "histogram":
+                return name.removesuffix(suffix)
+    return name
+
+
+def sort_key(key):
+    # Buckets in ascending order of ``le``, before the _count and _sum lines.
+    head, _, bound = key.partition('le="')
+    name = head.partition("{")[0]
+    order = HISTOGRAM_SUFFIXES.index(name[name.rfind("_"):]) if name.endswith(HISTOGRAM_SUFFIXES) else 0
+    return order, head, float(bound.partition('"')[0]) if bound else 0.0
+
+
+def format_value(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render(samples):
+    """The Prometheus text exposition format (0.0.4) of ``samples``."""
+    families = {}
+    for key, value in samples.items():
+        families.setdefault(family_of(key.partition("{")[0]), []).append((key, value))
+    lines = []
+    for family in sorted(families):
+        kind, description = FAMILIES.get(family, ("untyped", ""))
+        lines += [f"# HELP {family} {description}", f"# TYPE {family} {kind}"]
+        lines += [f"{key} {format_value(value)}" for key, value in sorted(families[family], key=lambda item: sort_key(item[0]))]
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    store = metric_store()
+    store.refresh_gauges(force=True)
+    return HttpResponse(render(collect(store.directory)), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class MetricsMiddleware:
+    """
+    Counts every request by route (the URL name, e.g. ``services-list``),
+    method and status, records its latency in a histogram and keeps an
+    in-flight gauge. Each worker process writes its own files in
+    ``METRICS_DIR``, and ``/metrics`` adds up the files of all of them, so
+    the numbers are right whichever worker is scraped. Worker gauges such as
+    pool usage are refreshed at most once a second.
+
+    Latency ends when the response is returned, before a streamed body is
+    sent. The middleware removes itself at startup unless ``METRICS`` is set.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        store, started = self.start()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+        finally:
+            self.finish(store, request, status, started)
+        return response
+
+    async def __acall__(self, request):
+        store, started = self.start()
+        status = 500
+        try:
+            response = await self.get_response(request)
+            status = response.status_code
+        finally:
+            self.finish(store, request, status, started)
+        return response
+
+    @staticmethod
+    def start():
+        store = metric_store()
+        store.add_live("velo_http_requests_in_flight", 1)
+        return store, time.perf_counter()
+
+    @staticmethod
+    def finish(store, request, status, started):
+        seconds = time.perf_counter() - started
+        store.add_live("velo_http_requests_in_flight", -1)
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        method = request.method if request.method in METHODS else "other"
+        store.observe_request(route, method, status, seconds)
+        store.refresh_gauges()
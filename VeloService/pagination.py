@@ -0,0 +1,164 @@
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the primary key.
+
+    The cursor encodes the last seen ordering value, so every page is a
+    ``WHERE id > cursor ORDER BY id LIMIT n`` and deep pages cost the same
+    as the first one. Clients may only change the page size with
+    ``?page_size=`` on viewsets that opt in by setting ``max_page_size``.
+
+    ``apaginate_queryset`` is the same algorithm for async views; both share
+    DRF's cursor format, so a cursor from one can be used with the other.
+    """
+    ordering = "id"
+    page_size = 50
+    page_size_query_param = "page_size"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.build_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.build_page([obj async for obj in queryset])
+
+    def get_page_size(self, request):
+        if self.max_page_size is None:
+            return self.page_size
+        return super().get_page_size(request)
+
+    def get_paginated_data(self, data):
+        return {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+    def get_page_queryset(self, queryset, request, view=None):
+        # First half of CursorPagination.paginate_queryset: everything up to
+        # evaluating the page slice.
+        self.max_page_size = getattr(view, "max_page_size", None)
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (self.offset, self.reverse, self.current_position) = (0, False, None)
+        else:
+            (self.offset, self.reverse, self.current_position) = self.cursor
+
+        if self.reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.current_position is not None:
+            queryset = self.filter_after_position(queryset)
+
+        return queryset[self.offset:self.offset + self.page_size + 1]
+
+    def filter_after_position(self, queryset):
+        order = self.ordering[0]
+        is_reversed = order.startswith("-")
+        order_attr = order.lstrip("-")
+        if self.cursor.reverse != is_reversed:
+            kwargs = {order_attr + "__lt": self.current_position}
+        else:
+            kwargs = {order_attr + "__gt": self.current_position}
+        return queryset.filter(**kwargs)
+
+    def build_page(self, results):
+        # Second half of CursorPagination.paginate_queryset: work out the
+        # neighbouring cursors from the evaluated slice.
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if self.reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (self.current_position is not None) or (self.offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = self.current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (self.current_position is not None) or (self.offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = self.current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class CompositeCursorPagination(IdCursorPagination):
+    """
+    Keyset pagination over several ordering fields, ending with a unique one.
+
+    DRF's cursor filters on the first field only and skips ties with an
+    offset, which turns deep pages of a low-cardinality column back into
+    OFFSET scans. Here the cursor holds every field of the last row, and
+    the page is ``WHERE a > x OR (a = x AND b > y) ...`` so ties never need
+    an offset.
+    """
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip("-")
+            value = instance[field_name] if isinstance(instance, dict) else getattr(instance, field_name)
+            values.append(str(value))
+        return json.dumps(values, separators=(",", ":"))
+
+    def filter_after_position(self, queryset):
+        try:
+            values = json.loads(self.current_position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        keyset, equal = Q(), {}
+        for order, value in zip(self.ordering, values):
+            order_attr = order.lstrip("-")
+            lookup = "lt" if self.cursor.reverse != order.startswith("-") else "gt"
+            keyset |= Q(**equal, **{f"{order_attr}__{lookup}": value})
+            equal[order_attr] = value
+        try:
+            return queryset.filter(keyset)
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class ServiceCursorPagination(CompositeCursorPagination):
+    ordering = ("-date", "-id")
+
+
+class DueDateCursorPagination(CompositeCursorPagination):
+    ordering = ("due_date", "id")
@@ -0,0 +1,140 @@
+import csv
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def export_value(value):
+    """Flat, lossless representation of a database value for export files."""
+    if isinstance(value, datetime):
+        return (timezone.localtime(value) if timezone.is_aware(value) else value).isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+# Spreadsheets run a cell starting with one of these as a formula.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def neutralize_formula(value):
+    """Prefix text that a spreadsheet would evaluate with ``'``, so it stays text."""
+    return f"'{value}" if value.startswith(FORMULA_PREFIXES) else value
+
+
+def has_non_finite(value):
+    """Whether ``value`` holds a NaN or infinite float or decimal in its dicts, lists and tuples."""
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, Decimal):
+        return not value.is_finite()
+    if isinstance(value, dict):
+        return any(has_non_finite(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(has_non_finite(item) for item in value)
+    return False
+
+
+class Echo:
+    """File-like object whose ``write`` hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+class CSVStreamRenderer(BaseRenderer):
+    """
+    ``text/csv`` for export actions. ``stream`` turns a header and an
+    iterable of row tuples into an iterator of lines for
+    ``StreamingHttpResponse``; ``render`` only serves error payloads.
+    """
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def stream(self, header, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([self.cell(value) for value in row])
+
+    @classmethod
+    def cell(cls, value):
+        if value is None:
+            return ""
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, (list, tuple)):
+            return ";".join(str(cls.cell(item)) for item in value)
+        if isinstance(value, str):
+            # Free text (descriptions, plates, makes) is user controlled;
+            # numbers and dates are written as they are.
+            return neutralize_formula(value)
+        return export_value(value)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict):
+            data = {"detail": data}
+        return "".join(self.stream(list(data), [[str(value) for value in data.values()]]))
+
+
+class NDJSONStreamRenderer(BaseRenderer):
+    """``application/x-ndjson`` for export actions: one JSON object per row."""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def stream(self, header, rows):
+        for row in rows:
+            yield self.line(dict(zip(header, row)))
+
+    @staticmethod
+    def line(data):
+        return json.dumps(data, default=export_value, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return self.line(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` on orjson, with the same bytes as output.
+
+    Values orjson does not write itself (dates and times, decimals, lazy
+    strings, querysets) go through DRF's encoder, so they come out exactly
+    as before. Anything orjson refuses, such as integers beyond 64 bits or
+    non-string keys, and indented or ASCII-only output are rendered by
+    ``JSONRenderer``, which also takes over when orjson is not installed.
+    orjson spells floats below 1e-4 or from 1e16 up differently; serializers
+    render decimals as strings, so API payloads do not contain such floats.
+    orjson writes NaN and infinities as ``null``; output with a ``null`` in
+    it is checked for them and handed to ``JSONRenderer``, which refuses them.
+    """
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b"null" in ret and has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these so the output is also valid JavaScript.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
@@ -0,0 +1,192 @@
+import random
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+# Seconds between two lag checks of a replica, per worker process.
+LAG_CHECK_INTERVAL = 1.0
+# Replay lag of a standby; 0 on a primary and on a standby that has replayed
+# everything it received, which an idle primary would otherwise look like.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+# The replica ReplicaMiddleware picked for the reads of the current request.
+# Context variables follow the request into sync_to_async threads.
+replica_alias = ContextVar("replica_alias", default=None)
+
+
+def sticky_key(user_id):
+    return f"user:{user_id}:primary"
+
+
+class ReplicaSet:
+    """
+    Replication lag of the ``DATABASE_REPLICAS``, checked at most once every
+    ``LAG_CHECK_INTERVAL`` seconds. A replica that lags more than
+    ``DB_REPLICA_MAX_LAG`` seconds or does not answer is skipped until a
+    later check finds it caught up.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_at = {}
+        self.lag = {}
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            return None
+
+    def refresh(self, alias):
+        now = time.monotonic()
+        with self.lock:
+            due = now - self.checked_at.get(alias, float("-inf")) >= LAG_CHECK_INTERVAL
+            if due:
+                # Claimed here, so one thread runs the check while the others
+                # route on the previous result.
+                self.checked_at[alias] = now
+        if due:
+            self.lag[alias] = self.check(alias)
+
+    def usable(self, alias):
+        lag = self.lag.get(alias)
+        return lag is not None and lag <= settings.DB_REPLICA_MAX_LAG
+
+    def available(self):
+        for alias in settings.DATABASE_REPLICAS:
+            self.refresh(alias)
+        return [alias for alias in settings.DATABASE_REPLICAS if self.usable(alias)]
+
+    def stats(self):
+        """The result of each replica's last check; none until reads have used it."""
+        return {
+            alias: {"lag_seconds": self.lag.get(alias), "in_use": self.usable(alias)}
+            for alias in settings.DATABASE_REPLICAS if alias in self.lag
+        }
+
+    def metrics(self):
+        """Gauge samples for ``VeloService.metrics``."""
+        for alias, stats in self.stats().items():
+            lag = stats["lag_seconds"]
+            yield "velo_db_replica_lag_seconds", {"alias": alias}, -1 if lag is None else lag
+            yield "velo_db_replica_in_use", {"alias": alias}, int(stats["in_use"])
+
+
+replica_set = ReplicaSet()
+
+REPLICA_METRICS = {
+    "velo_db_replica_lag_seconds": ("gauge", "Replay lag of each read replica at its last check; -1 if it did not answer."),
+    "velo_db_replica_in_use": ("gauge", "1 while reads are sent to the replica, 0 while it is skipped."),
+}
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica in ``replica_alias`` and everything else to
+    the primary. Reads inside a transaction on the primary stay there, since
+    they must see what it has written.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """
+    Picks a random usable replica for the reads of each safe-method request
+    (GET, HEAD, OPTIONS), so one request reads one consistent copy. After a
+    user's write succeeds, their requests stay on the primary for
+    ``DB_REPLICA_STICKY_SECONDS``, so they read their own writes. Users are
+    told apart by the access token's user id, and the sticky marks live in
+    the default cache. The middleware removes itself at startup unless
+    replicas are configured.
+    """
+    sync_capable = True
+    async_capable = True
+    authentication = JWTAuthentication()
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        alias = replica_alias.set(self.choose_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_alias.reset(alias)
+        self.after_response(request, response)
+        return response
+
+    async def __acall__(self, request):
+        # The lag checks and the transaction state belong to the thread that
+        # runs the async ORM's queries.
+        alias = replica_alias.set(await sync_to_async(self.choose_replica)(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_alias.reset(alias)
+        self.after_response(request, response)
+        return response
+
+    def token_user_id(self, request):
+        header = self.authentication.get_header(request)
+        raw_token = header and self.authentication.get_raw_token(header)
+        if not raw_token:
+            return None
+        try:
+            return self.authentication.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+        except (InvalidToken, TokenError):
+            return None
+
+    def choose_replica(self, request):
+        if request.method not in SAFE_METHODS or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        user_id = self.token_user_id(request)
+        if user_id is not None and cache.get(sticky_key(user_id)):
+            return None
+        replicas = replica_set.available()
+        return random.choice(replicas) if replicas else None
+
+    def after_response(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        # DRF sets the user it authenticated on the Django request.
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            cache.set(sticky_key(user.pk), True, settings.DB_REPLICA_STICKY_SECONDS)
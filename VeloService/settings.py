@@ -9,7 +9,9 @@ https://docs.djangoproject.com/en/5.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
+import copy
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -39,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "User",
     "rest_framework",
     "rest_framework_simplejwt",
@@ -47,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "VeloService.metrics.MetricsMiddleware",
+    "VeloService.timing.RequestTimingMiddleware",
+    "VeloService.replicas.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -89,9 +95,52 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD", "velo_password"),
         "HOST": os.getenv("DB_HOST", "db"),
         "PORT": os.getenv("DB_PORT", 5434),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
     }
 }
 
+# Connections come from a psycopg pool shared by the threads of a worker:
+# DB_POOL_SIZE connections are kept open, up to DB_POOL_MAX_OVERFLOW more are
+# opened under load and closed again after DB_POOL_IDLE_TIMEOUT seconds, and
+# a checkout waits at most DB_POOL_TIMEOUT seconds. Connections are checked
+# before they are handed out. With DB_POOL=0 each thread keeps one
+# persistent connection for DB_CONN_MAX_AGE seconds instead.
+if os.getenv("DB_POOL", "1") == "1":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_SIZE", 4)),
+        "max_size": int(os.getenv("DB_POOL_SIZE", 4)) + int(os.getenv("DB_POOL_MAX_OVERFLOW", 6)),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        "max_idle": float(os.getenv("DB_POOL_IDLE_TIMEOUT", 300)),
+        "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", 60))
+
+# Read replicas, as space-separated host:port[/name] entries (the name
+# defaults to DB_NAME), become the aliases replica1, replica2, ... with the
+# primary's credentials and pool settings. Reads of safe-method requests go
+# to a replica that lags at most DB_REPLICA_MAX_LAG seconds; a user whose
+# write succeeded reads from the primary for DB_REPLICA_STICKY_SECONDS. In
+# tests the replicas mirror the test database.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(os.getenv("DB_REPLICAS", "").split(), start=1):
+    host, _, port_and_name = replica.rpartition(":")
+    port, _, name = port_and_name.partition("/")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port,
+        "NAME": name or DATABASES["default"]["NAME"],
+        "OPTIONS": copy.deepcopy(DATABASES["default"]["OPTIONS"]),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+DATABASE_ROUTERS = ["VeloService.replicas.ReplicaRouter"]
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 5))
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -114,8 +163,41 @@ AUTH_PASSWORD_VALIDATORS = [
 AUTH_USER_MODEL = 'User.CustomUser'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'User.authentication.ClaimsJWTAuthentication',
+    ),
+    # orjson versions of DRF's JSON renderer and parser with identical
+    # output; both fall back to the stdlib ones without orjson.
+    'DEFAULT_RENDERER_CLASSES': (
+        'VeloService.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'VeloService.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'VeloService.throttling.TokenBucketThrottle',
+    ),
+}
+
+# Token buckets per throttle scope (a view's throttle_scope; "write" for
+# writes to other views) and identity: (refill rate, bucket size). "ip" is
+# the client address, "account" the email a login or registration names and
+# "user" the authenticated user. THROTTLE_STORE is redis (shared by every
+# worker, at THROTTLE_REDIS_URL or else CACHE_REDIS_URL), the default when
+# either is set, or local (per worker process, so each worker allows the full
+# rate; only for a single-process server such as runserver).
+THROTTLE = os.getenv('THROTTLE', '1') == '1'
+THROTTLE_REDIS_URL = os.getenv('THROTTLE_REDIS_URL') or os.getenv('CACHE_REDIS_URL')
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', 'redis' if THROTTLE_REDIS_URL else 'local')
+THROTTLE_BUCKETS = {
+    'user_token': {'ip': ('30/min', 10), 'account': ('10/min', 5)},
+    'owner_token': {'ip': ('30/min', 10), 'account': ('10/min', 5)},
+    'token_refresh': {'ip': ('120/min', 30)},
+    'user_register': {'ip': ('10/min', 5), 'account': ('5/hour', 3)},
+    'owner_register': {'ip': ('10/min', 5), 'account': ('5/hour', 3)},
+    'write': {'user': ('600/min', 120), 'ip': ('1200/min', 240)},
 }
 
 AUTHENTICATION_BACKENDS = [
@@ -138,6 +220,80 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# How long a worker trusts its cached copy of a user's token version (and
+# the full user object) before re-reading it from the database.
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 30))
+
+# PREFIX may use {year} and {shop}; each distinct prefix gets its own counter.
+INVOICE_NUMBERING = {
+    'PREFIX': os.getenv('INVOICE_PREFIX', 'INV-'),
+    'SHOP_CODE': os.getenv('INVOICE_SHOP_CODE', ''),
+    'PADDING': int(os.getenv('INVOICE_NUMBER_PADDING', 4)),
+    'GAPLESS': os.getenv('INVOICE_GAPLESS', '1') == '1',
+}
+
+# Maximum number of Component rows each worker keeps in VeloCare.catalog.
+COMPONENT_CATALOG_SIZE = int(os.getenv('COMPONENT_CATALOG_SIZE', 10000))
+# Seconds a version check holds outside a request; each request checks anew.
+COMPONENT_CATALOG_CHECK_INTERVAL = float(os.getenv('COMPONENT_CATALOG_CHECK_INTERVAL', 5))
+
+# Rows validated and inserted per batch by the bulk import endpoints.
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', 1000))
+
+# REQUEST_TIMING=1 adds Server-Timing headers (SQL, serializer, auth and view
+# time) to every response and logs requests slower than SLOW_REQUEST_MS to
+# the velo.requests logger with their SLOW_REQUEST_STATEMENTS slowest
+# queries. When it is off the middleware is not loaded at all.
+REQUEST_TIMING = os.getenv('REQUEST_TIMING', '0') == '1'
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_STATEMENTS = int(os.getenv('SLOW_REQUEST_STATEMENTS', 5))
+
+# Request counts, latency histograms and pool/cache gauges served at
+# /metrics. Every worker process writes its own files in METRICS_DIR, which
+# all workers of a deployment share; empty it before starting them.
+METRICS = os.getenv('METRICS', '1') == '1'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'velo-metrics'))
+
+# RESPONSE_CACHE=1 keeps rendered VeloCare list and detail responses in the
+# "responses" cache for RESPONSE_CACHE_TTL seconds. Keys include the
+# TableVersion counters of the tables a payload reads, so writes make older
+# entries unreachable. RESPONSE_CACHE_BACKEND is locmem (per worker), file
+# (shared by the workers of a host) or redis (needs the redis package).
+RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', '0') == '1'
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'locmem')
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'velo-responses',
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1000))},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'velo-responses')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1000))},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'redis://localhost:6379/1'),
+    },
+}
+# The default cache holds state all workers must see, such as which users
+# read from the primary after a write; give it CACHE_REDIS_URL when running
+# more than one.
+DEFAULT_CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+CACHES = {
+    'default': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': DEFAULT_CACHE_REDIS_URL}
+        if DEFAULT_CACHE_REDIS_URL else {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    ),
+    'responses': {**RESPONSE_CACHE_BACKENDS[RESPONSE_CACHE_BACKEND], 'TIMEOUT': RESPONSE_CACHE_TTL},
+}
+
+# Responses to create requests with an Idempotency-Key header are replayed to
+# retries for this many seconds; purge_idempotency_keys deletes older ones.
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 86400))
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000"
 ]
@@ -0,0 +1,202 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_paths(value):
+    """
+    ``"id,service.total_cost,service.vehicle"`` becomes
+    ``{"id": {}, "service": {"total_cost": {}, "vehicle": {}}}``.
+    """
+    tree = {}
+    for path in (value or "").split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def sparse_params(request):
+    """
+    The ``(fields, expand)`` trees of a request's query string. ``fields`` is
+    ``None`` when every field was asked for.
+    """
+    if request is None:
+        return None, {}
+    params = getattr(request, "query_params", None) or request.GET
+    return parse_paths(params.get("fields")) or None, parse_paths(params.get("expand"))
+
+
+def lookup_plan(model, lookup, prefix):
+    """``only``, ``select_related`` and ``prefetch_related`` arguments that load ``lookup`` at ``prefix``."""
+    only, select, prefetch = set(), set(), []
+    parts = lookup.split("__")
+    for position, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            break
+        if field.many_to_many or field.one_to_many:
+            # Rendered as a list of ids.
+            related = field.related_model
+            prefetch.append(Prefetch(prefix + part, queryset=related._default_manager.only(related._meta.pk.name)))
+            break
+        only.add(prefix + part)
+        if not field.is_relation or position == len(parts) - 1:
+            break
+        select.add(prefix + part)
+        model, prefix = field.related_model, f"{prefix}{part}__"
+    return only, select, prefetch
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=`` and ``?expand=`` for model serializers.
+
+    Relations are rendered as ids unless they are named in ``expand``, which
+    renders them with the serializer given in ``expandable_fields``. Both
+    parameters take comma separated paths: ``expand=service.vehicle`` also
+    expands the vehicle of the expanded service, and
+    ``fields=id,service.total_cost`` keeps only those fields of the row and
+    of its service. Unknown names are ignored.
+
+    ``setup_eager_loading`` turns the same trees into ``only``,
+    ``select_related`` and ``prefetch_related`` so that columns and relations
+    nobody asked for are not read. Fields rendered from the whole instance,
+    such as method fields, list the lookups they read in ``field_lookups``.
+
+    Only the output is trimmed; input is validated against every field.
+    """
+    expandable_fields = {}
+    field_lookups = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        # Nested serializers are handed their part of the trees; the root
+        # reads them from the request once its context is known.
+        self._sparse = None if fields is None and expand is None else (fields, expand or {})
+        super().__init__(*args, **kwargs)
+
+    @property
+    def sparse(self):
+        if self._sparse is None:
+            self._sparse = sparse_params(self.context.get("request"))
+        return self._sparse
+
+    def renders(self, name):
+        fields, _ = self.sparse
+        return fields is None or name in fields
+
+    @cached_property
+    def expanded_fields(self):
+        fields, expand = self.sparse
+        expanded = {}
+        for name, subtree in expand.items():
+            if name not in self.expandable_fields or not self.renders(name):
+                continue
+            relation = self.Meta.model._meta.get_field(name)
+            field = self.expandable_fields[name](
+                many=relation.many_to_many or relation.one_to_many,
+                read_only=True,
+                fields=fields and fields[name] or None,
+                expand=subtree,
+            )
+            field.bind(name, self)
+            expanded[name] = field
+        return expanded
+
+    @property
+    def _readable_fields(self):
+        for field in super()._readable_fields:
+            if self.renders(field.field_name):
+                yield self.expanded_fields.get(field.field_name, field)
+
+    @classmethod
+    def readable_sources(cls):
+        # Field name to model lookup, or None for fields that read the whole
+        # instance. Built once per class.
+        if "_readable_sources" not in cls.__dict__:
+            cls._readable_sources = {
+                name: None if field.source == "*" else "__".join(field.source_attrs)
+                for name, field in cls().fields.items() if not field.write_only
+            }
+        return cls._readable_sources
+
+    @classmethod
+    def eager_loading(cls, fields, expand, prefix, **options):
+        """
+        ``only``, ``select_related`` and ``prefetch_related`` arguments for
+        rendering this serializer's model at ``prefix``.
+        """
+        model = cls.Meta.model
+        only, select, prefetch = {prefix + model._meta.pk.name}, set(), []
+        for name, source in cls.readable_sources().items():
+            if fields is not None and name not in fields:
+                continue
+            if name in expand and name in cls.expandable_fields:
+                relation = model._meta.get_field(name)
+                child = cls.expandable_fields[name]
+                subfields = fields and fields[name] or None
+                if relation.many_to_many or relation.one_to_many:
+                    queryset = child.setup_eager_loading(
+                        relation.related_model._default_manager.all(), subfields, expand[name], **options
+                    )
+                    prefetch.append(Prefetch(prefix + name, queryset=queryset))
+                else:
+                    only.add(prefix + name)
+                    select.add(prefix + name)
+                    child_only, child_select, child_prefetch = child.eager_loading(
+                        subfields, expand[name], f"{prefix}{name}__", **options
+                    )
+                    only |= child_only
+                    select |= child_select
+                    prefetch += child_prefetch
+                continue
+            lookups = cls.field_lookups.get(name, () if source is None else (source,))
+            for lookup in lookups:
+                lookup_only, lookup_select, lookup_prefetch = lookup_plan(model, lookup, prefix)
+                only |= lookup_only
+                select |= lookup_select
+                prefetch += lookup_prefetch
+        return only, select, prefetch
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=None, required=(), **options):
+        """
+        Loads what rendering ``queryset`` with ``fields`` and ``expand`` needs.
+        ``required`` lookups are loaded regardless, e.g. the ordering that a
+        cursor paginator reads from the last row.
+        """
+        only, select, prefetch = cls.eager_loading(fields, expand or {}, "", **options)
+        for lookup in required:
+            only |= lookup_plan(cls.Meta.model, lookup, "")[0]
+        queryset = queryset.only(*only)
+        if select:
+            # select_related() without arguments would follow every foreign key.
+            queryset = queryset.select_related(*select)
+        return queryset.prefetch_related(*prefetch)
+
+
+def sparse_queryset(serializer_class, queryset, request, pagination_class=None, **options):
+    """
+    ``serializer_class.setup_eager_loading`` for the request's ``fields`` and
+    ``expand``, keeping the columns the cursor paginator orders by. Writes
+    load whole rows, since saving a partly loaded instance would skip the
+    columns left out, but still expand what the response shows.
+    """
+    fields, expand = sparse_params(request)
+    if request.method not in SAFE_METHODS:
+        fields = None
+    ordering = getattr(pagination_class, "ordering", ())
+    ordering = (ordering,) if isinstance(ordering, str) else ordering
+    return serializer_class.setup_eager_loading(
+        queryset, fields, expand, required=[name.lstrip("-") for name in ordering], **options
+    )
+
+
+class SparseQuerysetMixin:
+    """For viewsets whose serializer uses ``SparseFieldsMixin``."""
+
+    def get_sparse_queryset(self, queryset, **options):
+        return sparse_queryset(self.get_serializer_class(), queryset, self.request, self.pagination_class, **options)
@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """Seconds between two tokens of a ``"<tokens>/<s|min|hour|day>"`` rate."""
+    tokens, _, period = rate.partition("/")
+    return PERIODS[period[0]] / int(tokens)
+
+
+class LocalBucketStore:
+    """
+    Buckets of this process, shared by its threads. Each worker process of a
+    multi-process server counts on its own.
+    """
+    # Full buckets carry no state; they are dropped every this many takes.
+    sweep_every = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tats = {}
+        self.takes = 0
+
+    def take(self, buckets):
+        with self.lock:
+            now = time.monotonic()
+            tats, wait = gcra(buckets, [self.tats.get(key, now) for key, _, _ in buckets], now)
+            if not wait:
+                self.tats.update(zip((key for key, _, _ in buckets), tats))
+            self.takes += 1
+            if self.takes % self.sweep_every == 0:
+                self.tats = {key: tat for key, tat in self.tats.items() if tat > now}
+            return wait
+
+    def clear(self):
+        with self.lock:
+            self.tats.clear()
+
+
+def gcra(buckets, tats, now):
+    """
+    New theoretical arrival times of ``buckets`` (key, interval, burst) and
+    the seconds until all of them have a token, 0 if they have one now.
+    """
+    new_tats = [max(tat, now) + interval for tat, (_, interval, _) in zip(tats, buckets)]
+    wait = max(tat - interval * burst - now for tat, (_, interval, burst) in zip(new_tats, buckets))
+    return new_tats, max(wait, 0)
+
+
+class RedisBucketStore:
+    """
+    Buckets in Redis, shared by every worker and host. The script takes a
+    token from all buckets of a request or from none, atomically, on the
+    server's clock.
+    """
+    script = """
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local tats, wait = {}, 0
+    for i, key in ipairs(KEYS) do
+        local interval, burst = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+        tats[i] = math.max(tonumber(redis.call('GET', key) or now), now) + interval
+        wait = math.max(wait, tats[i] - interval * burst - now)
+    end
+    if wait > 0 then
+        return tostring(wait)
+    end
+    for i, key in ipairs(KEYS) do
+        redis.call('SET', key, string.format('%.6f', tats[i]), 'PX', math.ceil((tats[i] - now) * 1000))
+    end
+    return '0'
+    """
+
+    def __init__(self, url):
+        if redis is None:
+            raise ImproperlyConfigured("THROTTLE_STORE=redis needs the redis package.")
+        if not url:
+            raise ImproperlyConfigured("THROTTLE_STORE=redis needs THROTTLE_REDIS_URL or CACHE_REDIS_URL.")
+        self.client = redis.Redis.from_url(url)
+        self.take_script = self.client.register_script(self.script)
+
+    def take(self, buckets):
+        args = [value for _, interval, burst in buckets for value in (interval, burst)]
+        return float(self.take_script(keys=[key for key, _, _ in buckets], args=args))
+
+    def clear(self):
+        for key in self.client.scan_iter("velo:throttle:*"):
+            self.client.delete(key)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def make_store():
+    """The store ``THROTTLE_STORE`` names; ImproperlyConfigured if it cannot be built."""
+    if settings.THROTTLE_STORE == "redis":
+        return RedisBucketStore(settings.THROTTLE_REDIS_URL)
+    if settings.THROTTLE_STORE == "local":
+        return LocalBucketStore()
+    raise ImproperlyConfigured(f"Unknown THROTTLE_STORE {settings.THROTTLE_STORE!r}; use local or redis.")
+
+
+def bucket_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = make_store()
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token buckets per client IP, account (the ``email`` of the request body)
+    and authenticated user. A view picks its buckets with ``throttle_scope``;
+    ``THROTTLE_BUCKETS[scope]`` gives the ``(rate, burst)`` of each kind of
+    identity it limits. Writes to views without a scope use the ``write``
+    buckets.
+
+    The check runs in ``APIView.initial``, before the handler, so a rejected
+    login never reaches the password hash or the database. A request takes a
+    token from all of its buckets or from none, and a rejected one gets a
+    429 with ``Retry-After``.
+    """
+
+    def get_scope(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope is None and request.method not in SAFE_METHODS:
+            return "write"
+        return scope
+
+    def get_identity(self, request, kind):
+        if kind == "ip":
+            return self.get_ident(request)
+        if kind == "user":
+            return str(request.user.pk) if request.user and request.user.is_authenticated else None
+        if kind == "account":
+            # Only scopes that limit accounts parse the body here.
+            email = request.data.get("email") if hasattr(request.data, "get") else None
+            if isinstance(email, str) and email.strip():
+                return hashlib.md5(email.strip().lower().encode(), usedforsecurity=False).hexdigest()
+        return None
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        limits = settings.THROTTLE_BUCKETS.get(scope) if settings.THROTTLE else None
+        if not limits:
+            return True
+        buckets = []
+        for kind, (rate, burst) in limits.items():
+            ident = self.get_identity(request, kind)
+            if ident:
+                buckets.append((f"velo:throttle:{scope}:{kind}:{ident}", parse_rate(rate), burst))
+        self.retry_after = bucket_store().take(buckets) if buckets else 0
+        return not self.retry_after
+
+    def wait(self):
+        return self.retry_after
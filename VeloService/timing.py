@@ -0,0 +1,180 @@
+import heapq
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger("velo.requests")
+
+# Timings of the request being handled. Context variables follow the request
+# into sync_to_async threads, so async views are measured as well.
+current_timings = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """SQL, serializer and other span durations of one request, in milliseconds."""
+
+    def __init__(self, keep_statements):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.spans = {}
+        self.depth = {}
+        self.keep_statements = keep_statements
+        # Min-heap of the slowest (ms, sequence, sql) seen so far.
+        self.statements = []
+
+    def add_query(self, sql, ms):
+        self.queries += 1
+        self.sql_ms += ms
+        entry = (ms, self.queries, sql)
+        if len(self.statements) < self.keep_statements:
+            heapq.heappush(self.statements, entry)
+        elif self.statements and ms > self.statements[0][0]:
+            heapq.heapreplace(self.statements, entry)
+
+    def slowest_statements(self):
+        return [
+            {"ms": round(ms, 2), "sql": sql[:2000]}
+            for ms, _, sql in sorted(self.statements, reverse=True)
+        ]
+
+
+@contextmanager
+def span(name):
+    """
+    Adds the time spent in the block to the ``name`` span of the current
+    request. Nested spans of the same name are counted once. Costs a context
+    variable lookup when timing is off.
+    """
+    timings = current_timings.get()
+    if timings is None or timings.depth.get(name):
+        yield
+        return
+    timings.depth[name] = 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.depth[name] = 0
+        timings.spans[name] = timings.spans.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+
+def record_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, (time.perf_counter() - started) * 1000)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed_data(data):
+    def fget(serializer):
+        with span("serialize"):
+            return data.fget(serializer)
+    return property(fget)
+
+
+class RequestTimingMiddleware:
+    """
+    Measures every request and reports it in a ``Server-Timing`` header:
+    ``db`` (total SQL time, with the query count), ``serialize`` (DRF
+    serializers building ``.data``), ``auth`` (token authentication) and
+    ``view`` (everything below this middleware, the others included). Requests
+    slower than ``SLOW_REQUEST_MS`` are logged to ``velo.requests`` as one
+    JSON object that includes the ``SLOW_REQUEST_STATEMENTS`` slowest SQL
+    statements.
+
+    The middleware removes itself at startup unless ``REQUEST_TIMING`` is
+    set, in which case requests pay nothing at all. Queries and serializer
+    work of a streamed response body happen after the headers are sent and
+    are not included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.installed = False
+        # Connections opened later get the recorder from the signal.
+        connection_created.connect(install_query_recorder, dispatch_uid="request_timing")
+        # Serializer.data and ListSerializer.data both end in BaseSerializer.data.
+        if not getattr(BaseSerializer, "_timed", False):
+            BaseSerializer.data = timed_data(BaseSerializer.data)
+            BaseSerializer._timed = True
+
+    @staticmethod
+    def install_on_open_connections():
+        # For connections opened before this middleware was loaded.
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        self.install_on_open_connections()
+        timings = RequestTimings(settings.SLOW_REQUEST_STATEMENTS)
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self.installed:
+            # The async ORM runs queries in the thread sync_to_async uses.
+            await sync_to_async(self.install_on_open_connections)()
+            self.installed = True
+        timings = RequestTimings(settings.SLOW_REQUEST_STATEMENTS)
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        view = (time.perf_counter() - timings.started) * 1000
+        metrics = [f'db;dur={timings.sql_ms:.1f};desc="{timings.queries} queries"']
+        metrics += [f"{name};dur={ms:.1f}" for name, ms in timings.spans.items()]
+        metrics.append(f"view;dur={view:.1f}")
+        response["Server-Timing"] = ", ".join(metrics)
+        # Lets the frontend's origin read the timings in the browser.
+        response["Timing-Allow-Origin"] = ", ".join(settings.CORS_ALLOWED_ORIGINS)
+
+        if view >= settings.SLOW_REQUEST_MS:
+            match = request.resolver_match
+            record = {
+                "method": request.method,
+                "path": request.path,
+                "route": match.view_name if match else None,
+                "status": response.status_code,
+                "view_ms": round(view, 1),
+                "db_ms": round(timings.sql_ms, 1),
+                "queries": timings.queries,
+                **{f"{name}_ms": round(ms, 1) for name, ms in timings.spans.items()},
+                "statements": timings.slowest_statements(),
+            }
+            logger.warning("slow request %s", json.dumps(record), extra={"timing": record})
+        return response
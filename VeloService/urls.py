@@ -16,11 +16,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from VeloCare.views import health_check
+from VeloCare.views import health_check, readiness_check
+from VeloService.metrics import metrics_view
 
 urlpatterns = [
     path("", health_check, name="health-check"),
+    path("ready/", readiness_check, name="readiness-check"),
+    path("metrics", metrics_view, name="metrics"),
     path("admin/", admin.site.urls),
+    path("api/v1/velocare/async/", include("VeloCare.async_urls")),
     path("api/v1/velocare/", include("VeloCare.urls")),
     path("api/v1/user/", include("User.urls"))
 ]
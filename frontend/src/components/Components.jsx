@@ -1,11 +1,13 @@
 import React, { useEffect, useState } from 'react';
 import axios from 'axios';
 import { Trash2, Edit } from 'lucide-react';
+import { fetchAllPages, fetchPage } from '../utils/pagination';
 
 const API_BASE_URL = 'http://localhost:8000/api/v1/velocare/components/';
 
 const Components = () => {
   const [components, setComponents] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [newComponent, setNewComponent] = useState({ name: '', description: '', repair_price: '', new_price: '' });
   const [error, setError] = useState('');
   const [isEditing, setIsEditing] = useState(false);
@@ -16,12 +18,13 @@ const Components = () => {
     const fetchComponents = async () => {
       const accessToken = localStorage.getItem('accessToken');
       try {
-        const response = await axios.get(API_BASE_URL, {
+        const page = await fetchPage(API_BASE_URL, {
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
         });
-        setComponents(response.data);
+        setComponents(page.results);
+        setNextPage(page.next);
       } catch {
         setError('Failed to fetch components');
       }
@@ -29,6 +32,22 @@ const Components = () => {
     fetchComponents();
   }, []);
 
+  // Append the next page of components
+  const loadMore = async () => {
+    const accessToken = localStorage.getItem('accessToken');
+    try {
+      const page = await fetchPage(nextPage, {
+        headers: {
+          Authorization: `Bearer ${accessToken}`,
+        },
+      });
+      setComponents((rows) => [...rows, ...page.results]);
+      setNextPage(page.next);
+    } catch {
+      setError('Failed to fetch components');
+    }
+  };
+
   // Add or Update Component
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -172,6 +191,11 @@ const Components = () => {
           ))}
         </tbody>
       </table>
+      {nextPage && (
+        <button onClick={loadMore} className="btn-primary max-w-xs mb-6">
+          Load more
+        </button>
+      )}
     </div>
   );
 };
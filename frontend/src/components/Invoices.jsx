@@ -1,46 +1,106 @@
 import React, { useEffect, useState } from 'react';
 import axios from 'axios';
 import { Trash2, Edit, CheckCircle } from 'lucide-react';
+import { fetchPage } from '../utils/pagination';
 
 const API_SERVICES_URL = 'http://localhost:8000/api/v1/velocare/services/';
+const API_RECEIVABLES_URL = 'http://localhost:8000/api/v1/velocare/receivables/';
 
 const Invoices = () => {
   const [invoices, setInvoices] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [services, setServices] = useState([]); // Fetch services for dropdown
+  const [nextServices, setNextServices] = useState(null);
+  const [aging, setAging] = useState(null);
   const [newInvoice, setNewInvoice] = useState({ service: '', total_amount: '', paid: false });
   const [error, setError] = useState('');
   const [isEditing, setIsEditing] = useState(false);
   const [editInvoice, setEditInvoice] = useState(null);
 
-  // Fetch Services
+  // Fetch the newest services for the dropdown; older ones are loaded on demand
   useEffect(() => {
     const fetchServices = async () => {
       const accessToken = localStorage.getItem('accessToken');
       try {
-        const response = await axios.get(API_SERVICES_URL, {
+        const page = await fetchPage(API_SERVICES_URL, {
+          params: { expand: 'vehicle' },
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
         });
-        setServices(response.data);
+        setServices(page.results);
+        setNextServices(page.next);
       } catch {
         setError('Failed to fetch services');
       }
     };
 
     fetchServices();
+    fetchReceivables();
   }, []);
 
+  // Append the next page of services to the dropdown
+  const loadMoreServices = async () => {
+    const accessToken = localStorage.getItem('accessToken');
+    try {
+      const page = await fetchPage(nextServices, {
+        headers: {
+          Authorization: `Bearer ${accessToken}`,
+        },
+      });
+      setServices((rows) => [...rows, ...page.results]);
+      setNextServices(page.next);
+    } catch {
+      setError('Failed to fetch services');
+    }
+  };
+
+  // Unpaid invoices of every service, with their aging buckets
+  const fetchReceivables = async () => {
+    const accessToken = localStorage.getItem('accessToken');
+    try {
+      const page = await fetchPage(API_RECEIVABLES_URL, {
+        params: { expand: 'service.vehicle' },
+        headers: {
+          Authorization: `Bearer ${accessToken}`,
+        },
+      });
+      setAging(page.data.aging);
+      setInvoices(page.results);
+      setNextPage(page.next);
+    } catch {
+      setError('Failed to fetch receivables');
+    }
+  };
+
+  // Append the next page of unpaid invoices
+  const loadMore = async () => {
+    const accessToken = localStorage.getItem('accessToken');
+    try {
+      const page = await fetchPage(nextPage, {
+        headers: {
+          Authorization: `Bearer ${accessToken}`,
+        },
+      });
+      setInvoices((rows) => [...rows, ...page.results]);
+      setNextPage(page.next);
+    } catch {
+      setError('Failed to fetch receivables');
+    }
+  };
+
   // Fetch Invoices for a specific service
   const fetchInvoices = async (serviceId) => {
     const accessToken = localStorage.getItem('accessToken');
     try {
       const response = await axios.get(`${API_SERVICES_URL}${serviceId}/invoices/`, {
+        params: { expand: 'service.vehicle' },
         headers: {
           Authorization: `Bearer ${accessToken}`,
         },
       });
-      setInvoices(response.data);
+      setInvoices(response.data); // A service's invoices come in one response
+      setNextPage(null);
     } catch {
       setError('Failed to fetch invoices');
     }
@@ -59,7 +119,7 @@ const Invoices = () => {
     if (selectedService) {
       fetchInvoices(serviceId);
     } else {
-      setInvoices([]); // Clear invoices if no service is selected
+      fetchReceivables(); // Show all unpaid invoices if no service is selected
     }
   };
 
@@ -72,6 +132,7 @@ const Invoices = () => {
       // Update existing invoice
       try {
         const response = await axios.put(`${API_SERVICES_URL}${newInvoice.service}/invoices/${editInvoice.id}/`, newInvoice, {
+          params: { expand: 'service.vehicle' },
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
@@ -88,6 +149,7 @@ const Invoices = () => {
       // Add a new invoice
       try {
         const response = await axios.post(`${API_SERVICES_URL}${newInvoice.service}/invoices/`, newInvoice, {
+          params: { expand: 'service.vehicle' },
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
@@ -101,10 +163,11 @@ const Invoices = () => {
   };
 
   // Delete Invoice
-  const handleDeleteInvoice = async (id) => {
+  const handleDeleteInvoice = async (invoice) => {
     const accessToken = localStorage.getItem('accessToken');
+    const id = invoice.id;
     try {
-      await axios.delete(`${API_SERVICES_URL}${newInvoice.service}/invoices/${id}/`, {
+      await axios.delete(`${API_SERVICES_URL}${invoice.service.id}/invoices/${id}/`, {
         headers: {
           Authorization: `Bearer ${accessToken}`,
         },
@@ -116,10 +179,11 @@ const Invoices = () => {
   };
 
   // Mark Invoice as Paid
-  const markAsPaid = async (id) => {
+  const markAsPaid = async (invoice) => {
     const accessToken = localStorage.getItem('accessToken');
+    const id = invoice.id;
     try {
-      await axios.post(`${API_SERVICES_URL}${newInvoice.service}/invoices/${id}/mark_as_paid/`, null, {
+      await axios.post(`${API_SERVICES_URL}${invoice.service.id}/invoices/${id}/mark_as_paid/`, null, {
         headers: {
           Authorization: `Bearer ${accessToken}`,
         },
@@ -165,6 +229,11 @@ const Invoices = () => {
                 </option>
               ))}
             </select>
+            {nextServices && (
+              <button type="button" onClick={loadMoreServices} className="text-blue-500 underline text-sm">
+                Load older services
+              </button>
+            )}
           </div>
 
           <div className="space-y-2">
@@ -194,6 +263,24 @@ const Invoices = () => {
         </div>
       </form>
 
+      {/* Outstanding amounts by days past due */}
+      {aging && (
+        <div className="w-full max-w-2xl grid grid-cols-5 gap-4 mb-6">
+          {aging.buckets.map(bucket => (
+            <div key={bucket.days} className="bg-white rounded-2xl shadow-xl p-4 text-center">
+              <p className="text-sm text-gray-500">{bucket.days} days</p>
+              <p className="text-lg font-semibold">{bucket.total}</p>
+              <p className="text-xs text-gray-500">{bucket.count} invoices</p>
+            </div>
+          ))}
+          <div className="bg-white rounded-2xl shadow-xl p-4 text-center">
+            <p className="text-sm text-gray-500">Outstanding</p>
+            <p className="text-lg font-semibold">{aging.total}</p>
+            <p className="text-xs text-gray-500">{aging.count} invoices</p>
+          </div>
+        </div>
+      )}
+
       {/* Table to display invoices */}
       <table className="min-w-full border border-gray-300 mb-6 bg-white shadow-xl">
         <thead style={{ backgroundColor: '#7c3aed', color: 'white' }}>
@@ -222,7 +309,7 @@ const Invoices = () => {
                   {invoice.paid ? (
                     <CheckCircle className="text-green-500 w-5 h-5" />
                   ) : (
-                    <button onClick={() => markAsPaid(invoice.id)} className="text-blue-500 underline">
+                    <button onClick={() => markAsPaid(invoice)} className="text-blue-500 underline">
                       Mark as Paid
                     </button>
                   )}
@@ -231,7 +318,7 @@ const Invoices = () => {
                   <button onClick={() => startEditing(invoice)} className="text-yellow-500 underline">
                     <Edit />
                   </button>
-                  <button onClick={() => handleDeleteInvoice(invoice.id)} className="text-red-500 underline">
+                  <button onClick={() => handleDeleteInvoice(invoice)} className="text-red-500 underline">
                     <Trash2 />
                   </button>
                 </td>
@@ -246,6 +333,11 @@ const Invoices = () => {
           )}
         </tbody>
       </table>
+      {nextPage && (
+        <button onClick={loadMore} className="btn-primary max-w-xs mb-6">
+          Load more
+        </button>
+      )}
     </div>
   );
 };
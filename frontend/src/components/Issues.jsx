@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import axios from 'axios';
 import { Trash2, Edit } from 'lucide-react';
+import { fetchAllPages, fetchPage } from '../utils/pagination';
 
 const API_VEHICLES_URL = 'http://localhost:8000/api/v1/velocare/vehicles/';
 const API_COMPONENTS_URL = 'http://localhost:8000/api/v1/velocare/components/';
@@ -8,6 +9,7 @@ const API_ALL_ISSUES_URL = 'http://localhost:8000/api/v1/velocare/all_issues/';
 
 const Issues = () => {
   const [issues, setIssues] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [vehicles, setVehicles] = useState([]);
   const [components, setComponents] = useState([]);
   const [newIssue, setNewIssue] = useState({ vehicle: '', description: '', component: '', is_repair: true });
@@ -20,12 +22,12 @@ const Issues = () => {
     const fetchVehicles = async () => {
       const accessToken = localStorage.getItem('accessToken');
       try {
-        const response = await axios.get(API_VEHICLES_URL, {
+        const vehicles = await fetchAllPages(API_VEHICLES_URL, {
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
         });
-        setVehicles(response.data);
+        setVehicles(vehicles);
       } catch {
         setError('Failed to fetch vehicles');
       }
@@ -34,12 +36,12 @@ const Issues = () => {
     const fetchComponents = async () => {
       const accessToken = localStorage.getItem('accessToken');
       try {
-        const response = await axios.get(API_COMPONENTS_URL, {
+        const components = await fetchAllPages(API_COMPONENTS_URL, {
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
         });
-        setComponents(response.data);
+        setComponents(components);
       } catch {
         setError('Failed to fetch components');
       }
@@ -55,27 +57,47 @@ const Issues = () => {
   const fetchAllIssues = async () => {
     const accessToken = localStorage.getItem('accessToken');
     try {
-      const response = await axios.get(API_ALL_ISSUES_URL, {
+      const page = await fetchPage(API_ALL_ISSUES_URL, {
+        params: { expand: 'vehicle' },
         headers: {
           Authorization: `Bearer ${accessToken}`,
         },
       });
-      setIssues(response.data);
+      setIssues(page.results);
+      setNextPage(page.next);
     } catch {
       setError('Failed to fetch all issues');
     }
   };
 
+  // Append the next page of issues
+  const loadMore = async () => {
+    const accessToken = localStorage.getItem('accessToken');
+    try {
+      const page = await fetchPage(nextPage, {
+        headers: {
+          Authorization: `Bearer ${accessToken}`,
+        },
+      });
+      setIssues((rows) => [...rows, ...page.results]);
+      setNextPage(page.next);
+    } catch {
+      setError('Failed to fetch issues');
+    }
+  };
+
   // Fetch Issues for Selected Vehicle
   const fetchIssues = async (vehicleId) => {
     const accessToken = localStorage.getItem('accessToken');
     try {
       const response = await axios.get(`http://localhost:8000/api/v1/velocare/vehicles/${vehicleId}/issues/`, {
+        params: { expand: 'vehicle' },
         headers: {
           Authorization: `Bearer ${accessToken}`,
         },
       });
-      setIssues(response.data);
+      setIssues(response.data); // A vehicle's issues come in one response
+      setNextPage(null);
     } catch {
       setError('Failed to fetch issues');
     }
@@ -115,6 +137,7 @@ const Issues = () => {
           ...newIssue,
           component: newIssue.component
         }, {
+          params: { expand: 'vehicle' },
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
@@ -255,6 +278,11 @@ const Issues = () => {
           ))}
         </tbody>
       </table>
+      {nextPage && (
+        <button onClick={loadMore} className="btn-primary max-w-xs mb-6">
+          Load more
+        </button>
+      )}
     </div>
   );
 };
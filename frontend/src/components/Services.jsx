@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import axios from 'axios';
 import { Trash2, Edit } from 'lucide-react';
+import { fetchAllPages, fetchPage } from '../utils/pagination';
 
 const API_VEHICLES_URL = 'http://localhost:8000/api/v1/velocare/vehicles/';
 const API_SERVICES_URL = 'http://localhost:8000/api/v1/velocare/services/';
@@ -8,6 +9,7 @@ const API_ISSUES_URL = (vehicleId) => `http://localhost:8000/api/v1/velocare/veh
 
 const Services = () => {
   const [services, setServices] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [vehicles, setVehicles] = useState([]);
   const [issues, setIssues] = useState([]);
   const [newService, setNewService] = useState({ vehicle: '', selectedIssues: [] });
@@ -20,12 +22,12 @@ const Services = () => {
     const fetchVehicles = async () => {
       const accessToken = localStorage.getItem('accessToken');
       try {
-        const response = await axios.get(API_VEHICLES_URL, {
+        const vehicles = await fetchAllPages(API_VEHICLES_URL, {
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
         });
-        setVehicles(response.data);
+        setVehicles(vehicles);
       } catch {
         setError('Failed to fetch vehicles');
       }
@@ -39,12 +41,30 @@ const Services = () => {
   const fetchAllServices = async () => {
     const accessToken = localStorage.getItem('accessToken');
     try {
-      const response = await axios.get(API_SERVICES_URL, {
+      const page = await fetchPage(API_SERVICES_URL, {
+        params: { expand: 'vehicle,issues' },
         headers: {
           Authorization: `Bearer ${accessToken}`,
         },
       });
-      setServices(response.data);
+      setServices(page.results);
+      setNextPage(page.next);
+    } catch {
+      setError('Failed to fetch services');
+    }
+  };
+
+  // Append the next page of services
+  const loadMore = async () => {
+    const accessToken = localStorage.getItem('accessToken');
+    try {
+      const page = await fetchPage(nextPage, {
+        headers: {
+          Authorization: `Bearer ${accessToken}`,
+        },
+      });
+      setServices((rows) => [...rows, ...page.results]);
+      setNextPage(page.next);
     } catch {
       setError('Failed to fetch services');
     }
@@ -92,6 +112,7 @@ const Services = () => {
         setEditService(null);
       } else {
         const response = await axios.post(API_SERVICES_URL, serviceData, {
+          params: { expand: 'vehicle,issues' },
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
@@ -221,6 +242,11 @@ const Services = () => {
           ))}
         </tbody>
       </table>
+      {nextPage && (
+        <button onClick={loadMore} className="btn-primary max-w-xs mb-6">
+          Load more
+        </button>
+      )}
     </div>
   );
 };
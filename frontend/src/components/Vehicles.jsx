@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import axios from 'axios';
 import { Trash2, Edit } from 'lucide-react';
+import { fetchAllPages, fetchPage } from '../utils/pagination';
 
 const API_BASE_URL = 'http://localhost:8000/api/v1/velocare/vehicles/';
 const USERS_API_URL = 'http://localhost:8000/api/v1/user/'; // Adjust based on your users endpoint
@@ -8,6 +9,7 @@ const USERS_API_URL = 'http://localhost:8000/api/v1/user/'; // Adjust based on y
 const Vehicles = () => {
   const [vehicles, setVehicles] = useState([]);
   const [users, setUsers] = useState([]); // New state for users
+  const [nextPage, setNextPage] = useState(null);
   const [newVehicle, setNewVehicle] = useState({ owner: '', make: '', license_plate: '', model: '', year: '' });
   const [error, setError] = useState('');
   const [isEditing, setIsEditing] = useState(false);
@@ -18,12 +20,13 @@ const Vehicles = () => {
     const fetchVehicles = async () => {
       const accessToken = localStorage.getItem('accessToken');
       try {
-        const response = await axios.get(API_BASE_URL, {
+        const page = await fetchPage(API_BASE_URL, {
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
         });
-        setVehicles(response.data);
+        setVehicles(page.results);
+        setNextPage(page.next);
       } catch {
         setError('Failed to fetch vehicles');
       }
@@ -32,12 +35,12 @@ const Vehicles = () => {
     const fetchUsers = async () => { // New function to fetch users
       const accessToken = localStorage.getItem('accessToken');
       try {
-        const response = await axios.get(USERS_API_URL, {
+        const users = await fetchAllPages(USERS_API_URL, {
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
         });
-        setUsers(response.data); // Store the fetched users
+        setUsers(users); // Every user, so any of them can be picked as owner
       } catch {
         setError('Failed to fetch users');
       }
@@ -47,6 +50,22 @@ const Vehicles = () => {
     fetchUsers(); // Call the fetchUsers function
   }, []);
 
+  // Append the next page of vehicles
+  const loadMore = async () => {
+    const accessToken = localStorage.getItem('accessToken');
+    try {
+      const page = await fetchPage(nextPage, {
+        headers: {
+          Authorization: `Bearer ${accessToken}`,
+        },
+      });
+      setVehicles((rows) => [...rows, ...page.results]);
+      setNextPage(page.next);
+    } catch {
+      setError('Failed to fetch vehicles');
+    }
+  };
+
   // Add or Update Vehicle
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -206,6 +225,11 @@ const Vehicles = () => {
           ))}
         </tbody>
       </table>
+      {nextPage && (
+        <button onClick={loadMore} className="btn-primary max-w-xs mb-6">
+          Load more
+        </button>
+      )}
     </div>
   );
 };
@@ -0,0 +1,21 @@
+// src/utils/pagination.js
+import axios from 'axios';
+
+// One page of a cursor-paginated list: its rows and the URL of the next page
+// (null on the last one). The next URL already carries the query parameters.
+export const fetchPage = async (url, config = {}) => {
+  const response = await axios.get(url, config);
+  return { results: response.data.results, next: response.data.next, data: response.data };
+};
+
+// Every row of a cursor-paginated list, following `next` until the last page.
+// For pickers, which must offer all rows, not only the first page.
+export const fetchAllPages = async (url, config = {}) => {
+  let page = await fetchPage(url, config);
+  let results = page.results;
+  while (page.next) {
+    page = await fetchPage(page.next, { headers: config.headers });
+    results = results.concat(page.results);
+  }
+  return results;
+};